@@ -0,0 +1,87 @@
+"""A module for representing the chords of a guitar tab
+"""
+
+import re
+
+
+# a chord in compact notation: its entries written together, with fret numbers
+# of more than one digit in brackets, optionally followed by '*' and the number
+# of times to repeat the chord. Compiled once, as every chord typed in the
+# shell may be matched against it
+compact_chord = re.compile(r'((?:\([0-9]+\)|[-hpx0-9])+)(?:\*([0-9]+))?')
+compact_entry = re.compile(r'\(([0-9]+)\)|([-hpx0-9])')
+
+"""The most times that a chord in compact notation can be repeated"""
+MAX_REPEAT = 10000
+
+
+class Chord(tuple):
+    """Immutable, interned chord of a guitar tab.
+
+    A 'Chord' is a tuple of fret entries (str), one per string of the
+    instrument. Creating a chord with the same entries as an existing one
+    returns the existing instance, so each distinct chord shape is held in
+    memory once however many times it is used, and chords can be compared by
+    identity.
+    """
+
+    __slots__ = ()
+
+    # every chord created so far, keyed by its entries
+    _registry = {}
+
+    def __new__(cls, entries=()):
+        """Return the chord with the given entries, creating it if necessary
+
+        Parameters
+        ----------
+        entries : iterable of str
+            The fret entries of the chord, one per string
+        """
+        entries = tuple(entries)
+        chord = cls._registry.get(entries)
+        if chord is None:
+            chord = super().__new__(cls, entries)
+            cls._registry[entries] = chord
+        return chord
+
+    def __repr__(self):
+        return 'Chord({})'.format(list(self))
+
+
+def parse_compact(text):
+    """Parse chords written in compact notation
+
+    Chords are separated by whitespace, and each chord lists its entries from
+    the first string without spaces, e.g. 'x32010'. Fret numbers of more than
+    one digit are put in brackets, as in '(10)(12)(12)(11)(10)(10)', and a
+    chord followed by '*4' is repeated 4 times.
+
+    Parameters
+    ----------
+    text : str
+        The chords in compact notation
+
+    Returns
+    -------
+    list of Chord or None
+        The chords, including repeats, or None if `text` is not in compact
+        notation. The number of entries of each chord is not checked.
+
+    Raises
+    ------
+    TypeError
+        If a chord is repeated more than `MAX_REPEAT` times
+    """
+
+    chords = []
+    for token in text.split():
+        match = compact_chord.fullmatch(token)
+        if match is None:
+            return None
+        count = int(match.group(2) or 1)
+        if count > MAX_REPEAT:
+            raise TypeError("Chord repeated too many times: {}. The most is {:d}".format(token, MAX_REPEAT))
+        chord = Chord(fret or entry for fret, entry in compact_entry.findall(match.group(1)))
+        chords.extend([chord] * count)
+    return chords
@@ -0,0 +1,295 @@
+"""A full-screen editor for guitar tabs
+
+The editor shows the rows of a tab around the current position, with a status
+line at the bottom of the screen, and edits the tab one keystroke at a time:
+
+* the left and right arrow keys move back and forward one chord, growing the
+  tab at its end, and page up and page down move a whole row
+* the up and down arrow keys choose the string to edit
+* typing an entry ('-', 'h', 'p', 'x' or a fret number) writes it to the chosen
+  string of the current chord; a second digit typed straight after the first
+  makes a two digit fret number where the tab allows it
+* 'u' and 'r' undo and redo, 'q' quits, and ':' reads a command of the
+  interactive shell, such as ``:save song.txt``
+
+The editor follows the change events of the tab (see `guitab.events`) to find
+the rows of the screen that changed, and only draws those, so the work done for
+each keystroke does not depend on the length of the tab. Curses only comes with
+Python on Unix-like systems; elsewhere it can be installed as the
+``windows-curses`` package.
+"""
+
+import io
+
+try:
+    import curses
+except ImportError:
+    curses = None
+
+from . import events
+
+
+class Editor(object):
+    """Full-screen editor of a `guitab.tab.Tab` on a curses window."""
+
+    def __init__(self, tab, screen, shell=None):
+        """Constructor for Editor class object
+
+        Parameters
+        ----------
+        tab : guitab.tab.Tab
+            The tab to edit
+        screen : curses.window
+            The window to draw on and read keys from
+        shell : guitab.guitab.GuitabShell, optional
+            The shell that runs the commands typed after ':'. Without a shell,
+            ':' is not available.
+        """
+
+        self.tab = tab
+        self.screen = screen
+        self.shell = shell
+        # the string that typed entries are written to, counting from the
+        # first (highest) string
+        self.string = 0
+        # the first digit of a fret number that may be followed by a second,
+        # and the position it was typed at
+        self.pending = None
+        self.message = ''
+        # whether a shell command such as BYE asked for the shell to stop
+        self.stop_shell = False
+        # the first tab row on the screen, and the rows that must be drawn
+        # again: the rows in `dirty`, every row from `dirty_from` onwards,
+        # or every row if `full` is set
+        self.top = 0
+        self.dirty = set()
+        self.dirty_from = None
+        self.full = True
+
+    # ----- drawing -----
+    @property
+    def row_height(self):
+        """The number of screen lines taken by a row of the tab"""
+        return self.tab.clength + 2
+
+    @property
+    def visible(self):
+        """The number of tab rows that fit on the screen above the status
+        line"""
+        height, width = self.screen.getmaxyx()
+        return max(1, (height - 1) // self.row_height)
+
+    def changed(self, event):
+        """Mark the rows of the screen that a change event of the tab affects"""
+        chords = self.tab._MAX
+        if isinstance(event, events.Written):
+            # only the rows on the screen are kept, since a write to a
+            # repeated section may mark the whole tab
+            first = max(event.start // chords, self.top)
+            self.dirty.update(range(first, min((event.end - 1) // chords + 1, self.top + self.visible)))
+        elif isinstance(event, (events.Inserted, events.Deleted)):
+            row = event.index // chords
+            self.dirty_from = row if self.dirty_from is None else min(self.dirty_from, row)
+        elif isinstance(event, events.Moved):
+            self.dirty.update((event.old // chords, event.new // chords))
+        elif isinstance(event, events.Loaded):
+            self.full = True
+
+    def scroll(self):
+        """Move the rows on the screen so that the current position is on
+        it"""
+        row = self.tab.i // self.tab._MAX
+        visible = self.visible
+        if row < self.top:
+            self.top = row
+            self.full = True
+        elif row >= self.top + visible:
+            self.top = row - visible + 1
+            self.full = True
+
+    def draw(self):
+        """Draw the rows of the screen that changed, the status line and the
+        cursor"""
+        self.scroll()
+        height, width = self.screen.getmaxyx()
+        num_rows = self.tab.num_rows
+        for n, row in enumerate(range(self.top, self.top + self.visible)):
+            if not (self.full or row in self.dirty or (self.dirty_from is not None and row >= self.dirty_from)):
+                continue
+            y = n * self.row_height
+            lines = list(self.tab.iter_lines(row, row + 1)) if row < num_rows else []
+            for k in range(self.row_height):
+                self.screen.move(y + k, 0)
+                self.screen.clrtoeol()
+                if k < len(lines):
+                    self.screen.addnstr(y + k, 0, lines[k].rstrip('\n'), width - 1)
+        self.dirty = set()
+        self.dirty_from = None
+        self.full = False
+        self.draw_status(height, width)
+
+        # place the terminal cursor on the chosen string of the current chord
+        start = (self.tab.i // self.tab._MAX) * self.tab._MAX
+        x = 2 + sum(len(self.tab.read(index)[self.string]) for index in range(start, self.tab.i))
+        y = ((self.tab.i // self.tab._MAX) - self.top) * self.row_height + self.string
+        self.screen.move(y, min(x, width - 1))
+        self.screen.refresh()
+
+    def draw_status(self, height, width):
+        """Draw the status line at the bottom of the screen"""
+        status = '{} | chord {:d}/{:d} | bar {:d} | string {:d} | {}'.format(
+            self.tab.info['title'], self.tab.i, self.tab.imax, self.tab.bar_number(), self.string + 1,
+            self.message)
+        self.screen.move(height - 1, 0)
+        self.screen.clrtoeol()
+        self.screen.addnstr(height - 1, 0, status, width - 1, curses.A_REVERSE)
+
+    # ----- editing -----
+    def handle(self, key):
+        """Carry out the action of a key read with `getch`
+
+        Returns
+        -------
+        bool
+            True if the editor should stop, otherwise False
+        """
+
+        tab = self.tab
+        char = chr(key) if 0 <= key < 256 else ''
+        self.message = ''
+        pending, self.pending = self.pending, None
+        if key == curses.KEY_RIGHT:
+            tab.forward()
+        elif key == curses.KEY_LEFT:
+            if tab.i > 0:
+                tab.backward()
+        elif key == curses.KEY_NPAGE:
+            tab.forward(tab._MAX)
+        elif key == curses.KEY_PPAGE:
+            tab.goto(max(0, tab.i - tab._MAX))
+        elif key == curses.KEY_HOME:
+            tab.goto(0)
+        elif key == curses.KEY_END:
+            tab.goto(tab.imax)
+        elif key in (curses.KEY_UP, curses.KEY_DOWN):
+            self.string = max(0, min(tab.clength - 1, self.string + (1 if key == curses.KEY_DOWN else -1)))
+        elif key == curses.KEY_RESIZE:
+            self.full = True
+        elif char.isdigit():
+            entry = char
+            if pending is not None and pending[1:] == (tab.i, self.string) and pending[0] + char in tab.allowed:
+                entry = pending[0] + char
+            elif char + '0' in tab.allowed:
+                self.pending = (char, tab.i, self.string)
+            self.put(entry)
+        elif char in ('-', 'h', 'p', 'x'):
+            self.put(char)
+        elif char in ('u', 'r'):
+            try:
+                if char == 'u':
+                    tab.undo()
+                else:
+                    tab.redo()
+            except IndexError as e:
+                self.message = str(e)
+        elif char == ':':
+            return self.command()
+        elif char == 'q':
+            return True
+        else:
+            self.message = 'Unknown key. Use the arrow keys, an entry, u, r, : or q'
+        return False
+
+    def put(self, entry):
+        """Write an entry to the chosen string of the current chord"""
+        chord = list(self.tab.read())
+        chord[self.string] = entry
+        self.tab.write(chord)
+
+    def read_line(self, prompt):
+        """Read a line of text typed on the status line, or None if it is
+        cancelled with Escape"""
+        height, width = self.screen.getmaxyx()
+        text = ''
+        while True:
+            self.screen.move(height - 1, 0)
+            self.screen.clrtoeol()
+            self.screen.addnstr(height - 1, 0, prompt + text, width - 1)
+            self.screen.refresh()
+            key = self.screen.getch()
+            if key in (10, 13, curses.KEY_ENTER):
+                return text
+            if key == 27:
+                return None
+            if key in (8, 127, curses.KEY_BACKSPACE):
+                text = text[:-1]
+            elif 32 <= key < 127:
+                text += chr(key)
+
+    def command(self):
+        """Read and run a command of the shell, showing its last line of
+        output on the status line
+
+        Returns
+        -------
+        bool
+            True if the command stops the shell, otherwise False
+        """
+
+        if self.shell is None:
+            self.message = 'No shell to run commands'
+            return False
+        line = self.read_line(':')
+        if not line:
+            return False
+
+        # the shell draws nothing itself while the editor owns the screen
+        output = io.StringIO()
+        stdout, deferred = self.shell.stdout, self.shell.deferred
+        self.shell.stdout, self.shell.deferred = output, True
+        try:
+            stop = self.shell.onecmd(self.shell.precmd(line))
+        finally:
+            self.shell.stdout, self.shell.deferred = stdout, deferred
+            self.shell.redraw_due = False
+        lines = output.getvalue().splitlines()
+        self.message = lines[-1] if lines else ''
+        self.stop_shell = bool(stop)
+        return self.stop_shell
+
+    def run(self):
+        """Edit the tab until the user quits
+
+        Returns
+        -------
+        bool
+            True if the editor was stopped by a shell command such as BYE
+        """
+
+        self.tab.subscribe(self.changed)
+        try:
+            while True:
+                self.draw()
+                if self.handle(self.screen.getch()):
+                    return self.stop_shell
+        finally:
+            self.tab.unsubscribe(self.changed)
+
+
+def edit(tab, shell=None):
+    """Edit a tab in a full-screen editor on the terminal, see `Editor`
+
+    Returns
+    -------
+    bool
+        True if the editor was stopped by a shell command such as BYE
+    """
+
+    if curses is None:
+        raise ImportError("The editor requires the curses module, which could not be imported")
+
+    def main(screen):
+        screen.keypad(True)
+        return Editor(tab, screen, shell).run()
+
+    return curses.wrapper(main)
@@ -0,0 +1,100 @@
+"""Change events sent by a guitar tab to its observers
+
+Every change to a `guitab.tab.Tab` is described by one or more events, which
+are passed in order to each callback registered with `Tab.subscribe`. Column
+indices in an event refer to the tab as it is after the events before it, so
+an observer can keep its own per-column state up to date by applying the
+events one at a time, in time proportional to the size of the change.
+"""
+
+from collections import namedtuple
+
+from . import history
+
+
+"""The chords `start` to `end - 1` were overwritten"""
+Written = namedtuple('Written', ['start', 'end'])
+
+"""`count` chords were inserted before the chord at `index`"""
+Inserted = namedtuple('Inserted', ['index', 'count'])
+
+"""The `count` chords from `index` onwards were removed"""
+Deleted = namedtuple('Deleted', ['index', 'count'])
+
+"""The current position moved from index `old` to index `new`"""
+Moved = namedtuple('Moved', ['old', 'new'])
+
+"""The tab information changed; `old` and `new` hold the changed keys only"""
+InfoChanged = namedtuple('InfoChanged', ['old', 'new'])
+
+"""The whole of the tab data was replaced, and is now `length` chords long"""
+Loaded = namedtuple('Loaded', ['length'])
+
+
+def from_delta(delta, undo, storage):
+    """Return the events of a change recorded in the history
+
+    Parameters
+    ----------
+    delta : bytes or tuple
+        A delta of `guitab.history`
+    undo : bool
+        True if the delta was undone rather than made or redone
+    storage : guitab.storage.Storage
+        The storage of the tab after the change, used to tell whether written
+        chords are in a repeated section
+
+    Returns
+    -------
+    list
+        The events, in the order in which they apply
+    """
+
+    kind = delta[0]
+    if kind == history.INFO:
+        kind, old, new = delta
+        return [InfoChanged(new, old) if undo else InfoChanged(old, new)]
+    if kind == history.LOAD:
+        old_i, new_i, old_info, new_info = delta[1], delta[2], delta[5], delta[6]
+        if undo:
+            old_i, new_i, old_info, new_info = new_i, old_i, new_info, old_info
+        events = [Loaded(len(storage))]
+        if new_info:
+            events.append(InfoChanged(old_info, new_info))
+        if old_i != new_i:
+            events.append(Moved(old_i, new_i))
+        return events
+
+    kind, old_i, new_i, old_length, new_length, index, count, payload = history.unpack(delta)
+    if undo:
+        old_i, new_i, old_length, new_length = new_i, old_i, new_length, old_length
+
+    # the main change, given as it was made
+    if kind in (history.WRITE, history.REMAP, history.REMAP_ROWS):
+        # undoing a write that grew the tab also removes the written chords
+        # past the old end, so only those that are left can be linked
+        if storage.linked(min(index, len(storage)), min(index + count, len(storage))):
+            change = [Written(0, new_length)]
+        else:
+            change = [Written(index, index + count)]
+        added = 0
+    elif kind in (history.INSERT, history.DELETE, history.REPEAT):
+        inserted = (kind == history.DELETE) == undo
+        change = [Inserted(index, count) if inserted else Deleted(index, count)]
+        added = count if inserted else -count
+    else:
+        change = []
+        added = 0
+
+    # the tab also grows at its end when the position or a write goes past
+    # it, and shrinks again when that is undone
+    events = []
+    resized = new_length - old_length - added
+    if resized > 0:
+        events.append(Inserted(old_length, resized))
+    events += change
+    if resized < 0:
+        events.append(Deleted(new_length, -resized))
+    if old_i != new_i:
+        events.append(Moved(old_i, new_i))
+    return events
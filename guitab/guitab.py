@@ -6,11 +6,15 @@ The user enters chords/fingering count by count with the final
 result being written to a text file.
 """
 
-import os
+import sys
 import cmd
+import time
+import select
+import argparse
 from datetime import datetime as dt
 
-from . import tab
+from . import editor, pager, tab
+from .chord import parse_compact
 
 
 class GuitabShell(cmd.Cmd):
@@ -19,6 +23,9 @@ class GuitabShell(cmd.Cmd):
         "that accelerates the tab writing process. Type help or ? to list "\
         "commands."
     prompt = '(guitab) '
+    # the shortest time between redraws of the tab while more commands are
+    # already waiting to be run, in seconds
+    redraw_interval = 0.1
 
     # ----- initialise ---------
     def __init__(self, completekey='tab', stdin=None, stdout=None) -> None:
@@ -26,6 +33,60 @@ class GuitabShell(cmd.Cmd):
         self.user_tab = tab.Tab()
         # TODO tidy up how this file parameter is used below and how the file name in general is retained
         self.file = None
+        # the snapshots of the tab taken with SNAPSHOT, by name
+        self.snapshots = {}
+        # the number of the script line being run by run_script, or None when
+        # running interactively, and the number of errors in the script
+        self.line_number = None
+        self.errors = 0
+        # whether redraws are put off until the commands waiting to be run
+        # are done, which is the case inside cmdloop, whether one is due, and
+        # when the tab was last drawn
+        self.deferred = False
+        self.redraw_due = False
+        self.last_redraw = 0.0
+
+    # ----- output -----
+    def show(self):
+        """Print the rows of the tab around the current position, unless a
+        script is being run. Inside cmdloop the redraw is left to `postcmd`."""
+        if self.line_number is not None:
+            return
+        if self.deferred:
+            self.redraw_due = True
+        else:
+            self.user_tab.print()
+
+    def redraw(self):
+        """Print the rows of the tab around the current position now"""
+        self.redraw_due = False
+        self.last_redraw = time.monotonic()
+        try:
+            self.user_tab.print()
+        except RuntimeError as e:
+            # a row block of a lazily loaded file that can no longer be read
+            self.error(e)
+
+    def input_waiting(self):
+        """Whether more commands are waiting to be run, such as the rest of a
+        block of pasted text"""
+        if self.cmdqueue:
+            return True
+        try:
+            ready, _, _ = select.select([self.stdin], [], [], 0)
+        except (OSError, ValueError, TypeError):
+            # stdin cannot be polled, e.g. on Windows, so redraw every time
+            return False
+        return bool(ready)
+
+    def error(self, message):
+        """Report a problem with a command, giving its line number when a
+        script is being run"""
+        if self.line_number is None:
+            print(message, file=self.stdout)
+        else:
+            self.errors += 1
+            print("Line {:d}: {}".format(self.line_number, message), file=self.stdout)
 
     # ----- functional commands -----
     def move(self, direction, arg):
@@ -34,12 +95,12 @@ class GuitabShell(cmd.Cmd):
                 num = int(arg)
                 self.user_tab.__getattribute__(direction.lower())(num=num)
             except ValueError:
-                print(direction.upper() + " requires a single integer input. Given: " + arg, file=self.stdout)
+                self.error(direction.upper() + " requires a single integer input. Given: " + arg)
                 return
         else:
             self.user_tab.__getattribute__(direction.lower())(num=1)
 
-        self.user_tab.print()
+        self.show()
 
     def do_forward(self, arg):
         """The number of counts to go forward in the tab:  FORWARD 10
@@ -55,22 +116,220 @@ class GuitabShell(cmd.Cmd):
         """
         self.move("backward", arg)
 
+    def edit_columns(self, command, method, arg):
+        """Call a column editing method of the tab with the integer argument
+        of a command, which defaults to 1"""
+        try:
+            num = int(arg) if arg != '' else 1
+        except ValueError:
+            self.error(command.upper() + " requires a single integer input. Given: " + arg)
+            return
+        try:
+            method(num)
+        except TypeError as e:
+            self.error(e)
+            return
+
+        self.show()
+
+    def do_insert(self, arg):
+        """The number of blank counts to insert at the current position in the tab:  INSERT 4
+
+        Later counts are moved forward. The default is to insert 1 count if no input is given to the command.
+        """
+        self.edit_columns("insert", self.user_tab.insert_columns, arg)
+
+    def do_delete(self, arg):
+        """The number of counts to delete from the current position in the tab:  DELETE 4
+
+        Later counts are moved back. The default is to delete 1 count if no input is given to the command.
+        """
+        self.edit_columns("delete", self.user_tab.delete_columns, arg)
+
+    def parse_chords(self, arg):
+        """Split the argument of CHORD or CHORDS into chords
+
+        The chords are either in compact notation (see `guitab.chord.parse_compact`), or given as entries
+        separated by spaces, with chords separated by commas. An argument is only read as compact notation if it
+        has no commas and is not simply a list of entries.
+        """
+        if ',' not in arg and not all(entry in self.user_tab.allowed for entry in arg.split()):
+            chords = parse_compact(arg)
+            if chords is not None:
+                return chords
+        return [chord.split() for chord in arg.split(',')]
+
     # TODO extend this to take single letter chord names
     def do_chord(self, arg):
         """The chord (i.e. finger positions) to write to the current position in the tab:  CHORD x 3 2 0 1 0
 
-        The input order of strings runs from high E to low E.
+        The input order of strings runs from high E to low E. The chord can also be given in compact notation, with
+        fret numbers of two digits in brackets:  CHORD x32010, CHORD (10)(12)(12)(11)(10)(10)
+        """
+        try:
+            chords = self.parse_chords(arg)
+            if len(chords) != 1:
+                self.error("ERROR: CHORD writes a single chord; use CHORDS for more. Given: " + arg)
+                return
+            self.user_tab.write(chords[0])
+            self.show()
+        except TypeError as e:
+            self.error(e)
+
+    def do_chords(self, arg):
+        """Several chords to write from the current position in the tab, separated by commas:
+        CHORDS x 3 2 0 1 0, 3 2 0 0 0 3
+
+        The position moves forward past the last chord written, as if each chord were followed by FORWARD. In
+        compact notation the chords are separated by spaces, and '*' repeats a chord:  CHORDS x32010*2 320003
+        """
+        try:
+            self.user_tab.write_many(self.parse_chords(arg))
+        except TypeError as e:
+            self.error(e)
+            return
+        self.show()
+
+    def do_transpose(self, arg):
+        """The number of frets to shift every note in the tab by:  TRANSPOSE -2
+
+        Notes that would leave the fret range are an error, unless FOLD is given to move them by octaves instead:
+        TRANSPOSE 5 FOLD
         """
+        args = arg.split()
         try:
-            arg = arg.split()
-        except Exception:
-            print("ERROR: Invalid argument string to CHORD", file=self.stdout)
+            semitones = int(args[0])
+            if args[1:] not in ([], ['fold']):
+                raise ValueError
+        except (IndexError, ValueError):
+            self.error("TRANSPOSE requires an integer input and an optional FOLD. Given: " + arg)
             return
         try:
-            self.user_tab.write(arg)
-            self.user_tab.print()
+            self.user_tab.transpose(semitones, fold=bool(args[1:]))
+        except IndexError as e:
+            self.error(e)
+            return
+        self.show()
+
+    def do_find(self, arg):
+        """Move to the next occurrence of one or more chords, separated by commas:  FIND - 1 - 2 3 x, 3 3 - - 2 3
+
+        A '-' matches any entry on its string. The search wraps around to the beginning of the tab.
+        """
+        pattern = [chord.split() for chord in arg.split(',')]
+        try:
+            match = self.user_tab.find(pattern, start=self.user_tab.i + 1)
+            if match is None:
+                match = self.user_tab.find(pattern)
+        except TypeError as e:
+            self.error(e)
+            return
+        if match is None:
+            self.error("No match found")
+            return
+        self.user_tab.goto(match)
+        self.show()
+
+    def do_section(self, arg):
+        """Name the counts from START up to, but not including, END as a section that can be repeated:
+        SECTION verse 0 64
+
+        Changing a chord in any repeat of the section changes every repeat of it.
+        """
+        args = arg.split()
+        try:
+            name, start, end = args[0], int(args[1]), int(args[2])
+            if len(args) != 3:
+                raise ValueError
+        except (IndexError, ValueError):
+            self.error("SECTION requires a name and two integer inputs. Given: " + arg)
+            return
+        try:
+            self.user_tab.define_section(name, start, end)
         except TypeError as e:
-            print(e, file=self.stdout)
+            self.error(e)
+
+    def do_repeat(self, arg):
+        """Insert a repeat of a section at the current position in the tab:  REPEAT verse
+
+        Later counts are moved forward.
+        """
+        try:
+            self.user_tab.repeat_section(arg)
+        except TypeError as e:
+            self.error(e)
+            return
+        self.show()
+
+    def do_bar(self, arg):
+        """Add a bar line before the current position in the tab:  BAR
+
+        Bar lines are shown with '|' under the first count of each bar, and move with the counts after them.
+        """
+        self.user_tab.add_bar()
+        self.show()
+
+    def do_unbar(self, arg):
+        """Remove the bar line before the current position in the tab:  UNBAR"""
+        self.user_tab.remove_bar()
+        self.show()
+
+    def do_mark(self, arg):
+        """Name the current position in the tab, to return to it with GOTO:  MARK chorus"""
+        if arg == '':
+            self.error("ERROR: The MARK command requires an argument")
+            return
+        self.user_tab.bookmark(arg)
+
+    def do_goto(self, arg):
+        """Move to a count, the start of a bar or a position named with MARK:  GOTO 120, GOTO BAR 12, GOTO chorus
+
+        Counts and bars are numbered from 0 and 1 respectively.
+        """
+        args = arg.split()
+        try:
+            if len(args) == 2 and args[0] == 'bar':
+                index = self.user_tab.bar_index(int(args[1]))
+            elif len(args) == 1 and args[0] in self.user_tab.bookmarks:
+                index = self.user_tab.bookmarks[args[0]]
+            else:
+                index = int(arg)
+        except ValueError:
+            self.error("GOTO requires an integer, BAR and an integer, or a bookmark name. Given: " + arg)
+            return
+        self.user_tab.goto(index)
+        self.show()
+
+    def do_undo(self, arg):
+        """Undo the last change to the tab:  UNDO"""
+        self.user_tab.undo()
+        self.show()
+
+    def do_redo(self, arg):
+        """Redo the last change to the tab that was undone:  REDO"""
+        self.user_tab.redo()
+        self.show()
+
+    def do_snapshot(self, arg):
+        """Save the current state of the tab under a name, to return to later with CHECKOUT:  SNAPSHOT verse1
+
+        Snapshots share the unchanged parts of the tab, so they are cheap to take.
+        """
+        if arg == '':
+            self.error("ERROR: The SNAPSHOT command requires an argument")
+            return
+        self.snapshots[arg] = self.user_tab.snapshot()
+
+    def do_checkout(self, arg):
+        """Replace the tab with a snapshot taken with SNAPSHOT:  CHECKOUT verse1
+
+        The snapshot itself is kept unchanged, and the checkout can be reverted with UNDO.
+        """
+        if arg not in self.snapshots:
+            self.error("ERROR: No snapshot named: " + arg)
+            return
+        self.user_tab.restore(self.snapshots[arg])
+        self.show()
 
     def do_author(self, arg: str):
         """Set the author for the tab
@@ -115,13 +374,13 @@ class GuitabShell(cmd.Cmd):
         try:
             dt.strptime(arg, '%Y-%m-%d')
         except ValueError:
-            print("ERROR: Incorrect date string. Must be of format YYYY-MM-DD.", file=self.stdout)
+            self.error("ERROR: Incorrect date string. Must be of format YYYY-MM-DD.")
         else:
             self.set_info(key='date', value=arg)
 
     def set_info(self, key: str, value: str):
         if value == '':
-            print("ERROR: The {key.upper()} command requires an argument", file=self.stdout)
+            self.error("ERROR: The {key.upper()} command requires an argument")
             return
         else:
             self.user_tab.set_info(**{key: value})
@@ -132,15 +391,36 @@ class GuitabShell(cmd.Cmd):
 
         The current tab is saved to a file if one has been previously specified by RECORD.
         """
-        print('Thank you for using guitab', file=self.stdout)
+        if self.line_number is None:
+            print('Thank you for using guitab', file=self.stdout)
         return True
 
-    # TODO this is OS dependent and should be extended for mac and Windows
     def do_print(self, arg):
-        """Print the entirety of the tab: PRINT"""
-        pipe = os.popen('less', mode='w')
-        print(self.user_tab, file=pipe)
-        pipe.close()
+        """Page through the entirety of the tab: PRINT
+
+        Only the page being viewed is drawn. After each page, press Enter or F for the next page, B for the
+        previous page, G or SHIFT+G for the first or last page, C for the page with the current position, /TEXT
+        to search for TEXT on the strings, N to repeat the search and Q to quit.
+        """
+        if self.line_number is not None:
+            self.stdout.writelines(self.user_tab.iter_lines(cache=False))
+            return
+        pager.Pager(self.user_tab, stdin=self.stdin, stdout=self.stdout).run()
+
+    def do_edit(self, arg):
+        """Edit the tab in a full-screen editor:  EDIT
+
+        Use the arrow keys to move and to choose a string, type an entry to write it to the chosen string, U and R
+        to undo and redo, : to run one of these commands and Q to return to the prompt.
+        """
+        try:
+            stop = editor.edit(self.user_tab, self)
+        except ImportError as e:
+            self.error(e)
+            return
+        if stop:
+            return True
+        self.show()
 
     # ----- file handling -----
     def do_load(self, arg: str):
@@ -156,10 +436,13 @@ class GuitabShell(cmd.Cmd):
         None
         """
         if arg == '':
-            print("ERROR: The LOAD command requires an argument", file=self.stdout)
+            self.error("ERROR: The LOAD command requires an argument")
             return
         else:
-            self.user_tab.get_tab(arg, overwrite_info=False)
+            try:
+                self.user_tab.get_tab(arg, overwrite_info=False, lazy=True)
+            except (OSError, RuntimeError, EOFError) as e:
+                self.error(e)
 
     def do_loadall(self, arg: str):
         """Load tab data and metadata from specified file
@@ -174,10 +457,13 @@ class GuitabShell(cmd.Cmd):
         None
         """
         if arg == '':
-            print("ERROR: The LOADALL command requires an argument", file=self.stdout)
+            self.error("ERROR: The LOADALL command requires an argument")
             return
         else:
-            self.user_tab.get_tab(arg, overwrite_info=True)
+            try:
+                self.user_tab.get_tab(arg, overwrite_info=True, lazy=True)
+            except (OSError, RuntimeError, EOFError) as e:
+                self.error(e)
 
     def do_save(self, arg: str):
         """Save tab data and metadata to specified file
@@ -191,30 +477,182 @@ class GuitabShell(cmd.Cmd):
         -------
         None
         """
+        # a script has no one to answer the overwrite prompt, and the prompt
+        # would read the following lines of the script instead
+        overwrite = self.line_number is not None
         if arg == '':
             if self.file is None:
-                print("ERROR: The SAVE command requires an argument if a file hasn't been set previously",
-                      file=self.stdout)
+                self.error("ERROR: The SAVE command requires an argument if a file hasn't been set previously")
                 return
             else:
-                self.user_tab.save_tab(filename=self.file)
+                self.user_tab.save_tab(filename=self.file, overwrite=overwrite)
         else:
-            self.user_tab.save_tab(filename=arg)
+            self.user_tab.save_tab(filename=arg, overwrite=overwrite)
             self.file = arg
 
+    def do_loadbin(self, arg: str):
+        """Load tab data and metadata from specified binary tab file
+
+        Parameters
+        ----------
+        arg : str
+            File name for binary file to load tab data from
+
+        Returns
+        -------
+        None
+        """
+        if arg == '':
+            self.error("ERROR: The LOADBIN command requires an argument")
+            return
+        else:
+            try:
+                self.user_tab.load_binary(arg)
+            except (OSError, RuntimeError) as e:
+                self.error(e)
+
+    def do_savebin(self, arg: str):
+        """Save tab data and metadata to specified binary tab file
+
+        Parameters
+        ----------
+        arg : str
+            File name for binary file to save tab data to
+
+        Returns
+        -------
+        None
+        """
+        if arg == '':
+            self.error("ERROR: The SAVEBIN command requires an argument")
+            return
+        else:
+            try:
+                self.user_tab.save_binary(filename=arg)
+            except (OSError, RuntimeError) as e:
+                self.error(e)
+
     # ----- customisation -----
     def onecmd(self, line: str) -> bool:
-        """Catch acceptable exceptions caused by users"""
+        """Run the commands of a line, separated by ';', drawing the tab once
+        at the end, and catch acceptable exceptions caused by users"""
+        if ';' in line:
+            deferred, self.deferred = self.deferred, True
+            try:
+                for command in line.split(';'):
+                    if command.strip() != '' and self.onecmd(command.strip()):
+                        return True
+            finally:
+                self.deferred = deferred
+            if self.redraw_due and not deferred:
+                self.redraw()
+            return False
         try:
             val = super().onecmd(line)
-        except IndexError as e:
-            print(e, file=self.stdout)
+        except (IndexError, RuntimeError) as e:
+            self.error(e)
         else:
             return val
 
+    def preloop(self):
+        """Put off redraws until the commands waiting to be run are done"""
+        self.deferred = True
+        self.last_redraw = time.monotonic()
+
+    def postcmd(self, stop, line):
+        """Redraw the tab once the commands waiting to be run are done, or at
+        most every `redraw_interval` seconds while they are being run"""
+        if stop:
+            return stop
+        if self.last_redraw is None:
+            # the first command of a burst starts the redraw interval
+            self.last_redraw = time.monotonic()
+        waiting = self.input_waiting()
+        if self.redraw_due and (not waiting or time.monotonic() - self.last_redraw >= self.redraw_interval):
+            self.redraw()
+        if not waiting:
+            # the time spent waiting for the next command does not count
+            self.last_redraw = None
+        return stop
+
+    def postloop(self):
+        """Draw the tab after every command again"""
+        self.deferred = False
+        self.redraw_due = False
+
+    def default(self, line):
+        """Write chords given on their own in compact notation, as CHORDS
+        does, or report an unknown command"""
+        if not all(entry in self.user_tab.allowed for entry in line.split()):
+            try:
+                chords = parse_compact(line)
+            except TypeError as e:
+                self.error(e)
+                return
+            if chords:
+                self.do_chords(line)
+                return
+        self.error("*** Unknown syntax: " + line)
+
     def precmd(self, line):
         return line.lower()
 
+    def run_script(self, lines):
+        """Run the commands of a script without prompts or redraws
+
+        Empty lines and lines starting with '#' are skipped. Problems with a
+        command are reported with its line number, and the remaining commands
+        are still run. The tab is printed once at the end, and whenever the
+        script uses PRINT. The script stops early at BYE.
+
+        Parameters
+        ----------
+        lines : iterable of str
+            The lines of the script, such as an open file
+
+        Returns
+        -------
+        int
+            The number of commands that reported an error
+        """
+
+        self.errors = 0
+        try:
+            for number, line in enumerate(lines, 1):
+                self.line_number = number
+                line = line.strip()
+                if line == '' or line.startswith('#'):
+                    continue
+                try:
+                    if self.onecmd(self.precmd(line)):
+                        break
+                except (OSError, RuntimeError, TypeError, EOFError) as e:
+                    self.error(e)
+        finally:
+            self.line_number = None
+        self.show()
+        return self.errors
+
+
+def main(argv=None):
+    """Run guitab from the command line, interactively or on a script"""
+    parser = argparse.ArgumentParser(prog='guitab', description="An interactive command line program that "
+                                     "speeds up the process of writing guitar tabs.")
+    parser.add_argument('--script', metavar='FILE',
+                        help="run the commands in FILE ('-' for standard input) instead of prompting for them")
+    args = parser.parse_args(argv)
+
+    shell = GuitabShell()
+    if args.script is None and sys.stdin.isatty():
+        shell.cmdloop()
+        return 0
+    if args.script is None or args.script == '-':
+        errors = shell.run_script(sys.stdin)
+    else:
+        with open(args.script) as script:
+            errors = shell.run_script(script)
+    return 1 if errors else 0
+
 
 if __name__ == '__main__':
-    GuitabShell().cmdloop()
+    sys.exit(main())
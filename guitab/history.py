@@ -0,0 +1,287 @@
+"""Undo and redo history of the changes made to a guitar tab
+
+The history is a log of deltas rather than of copies of the tab, so its size
+depends on the number and size of the edits and not on the length of the tab.
+Most deltas are packed into a single bytes object: a header holding the kind of
+the change, the position and length of the tab before and after it, and the
+range of columns that it touched, followed by the codes needed to undo and redo
+it. The header fields are variable-length integers (see `pack_ints`), and all
+but the old position are stored relative to the position or length of the tab
+before the change, so the header of a small change takes a few bytes.
+Codes are laid out one string at a time, as returned by
+`guitab.storage.Storage.row`. Loading new tab data and changing the tab
+information are recorded as tuples instead, since they refer to storage
+objects and str values.
+"""
+
+from collections import deque
+
+
+"""The kinds of delta. WRITE holds the old and then the new codes of the
+columns that were written, INSERT and DELETE hold the codes of the columns that
+were inserted or deleted followed by the repeats of sections that the change
+turned into copies (see `pack_links`, and followed for DELETE by the columns of
+the bar lines in the deleted range, see `pack_bars`), and REMAP holds the
+translation table followed by its inverse. REMAP_ROWS is a REMAP whose table
+cannot be inverted, so the old codes of the columns are held in place of the
+inverse. SECTION holds the name of the section that was defined, and REPEAT the
+repeats that it turned into copies followed by the name of the section that
+was repeated. BAR records a bar line that was added (a count of 1) or removed
+(a count of 0) at a column."""
+WRITE, MOVE, INSERT, DELETE, REMAP, REMAP_ROWS, LOAD, INFO, SECTION, REPEAT, BAR = range(11)
+
+
+def pack_ints(values):
+    """Pack integers >= 0 into bytes, seven bits to a byte starting with the
+    lowest, with the top bit of each byte set if more bytes follow"""
+    data = bytearray()
+    for value in values:
+        while value > 0x7f:
+            data.append(value & 0x7f | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
+
+
+def unpack_ints(data, pos=0, count=None):
+    """Return a list of `count` integers packed by `pack_ints` from byte `pos`
+    of `data`, or of all the integers up to its end, and the byte offset after
+    them"""
+    values = []
+    end = len(data) if count is None else None
+    while pos < end if count is None else len(values) < count:
+        value = data[pos]
+        pos += 1
+        if value > 0x7f:
+            value &= 0x7f
+            shift = 7
+            while True:
+                byte = data[pos]
+                pos += 1
+                value |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+        values.append(value)
+    return values, pos
+
+
+def _signed(value):
+    """Map an integer to one >= 0, alternating between positive and negative
+    values so that those close to 0 stay small"""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unsigned(value):
+    """Undo `_signed`"""
+    return (value >> 1) ^ -(value & 1)
+
+
+def pack(kind, old_i, new_i, old_length, new_length, index=None, count=0, payload=b''):
+    """Pack a delta into a single bytes object, see the module docstring. The
+    first column defaults to the old position."""
+    if index is None:
+        index = old_i
+    return pack_ints((kind, old_i, _signed(new_i - old_i), _signed(old_length - old_i),
+                      _signed(new_length - old_length), _signed(index - old_i), count)) + payload
+
+
+def unpack(delta):
+    """Return the header fields of a packed delta followed by its payload"""
+    (kind, old_i, new_i, old_length, new_length, index, count), pos = unpack_ints(delta, 0, 7)
+    old_length = old_i + _unsigned(old_length)
+    return (kind, old_i, old_i + _unsigned(new_i), old_length, old_length + _unsigned(new_length),
+            old_i + _unsigned(index), count, memoryview(delta)[pos:])
+
+
+def pack_links(links):
+    """Pack a list of the section names and first columns of repeats, as
+    returned by `guitab.storage.Storage.repeats`, into bytes"""
+    parts = [pack_ints([len(links)])]
+    for name, start in links:
+        name = name.encode('utf-8')
+        parts.append(pack_ints((start, len(name))) + name)
+    return b''.join(parts)
+
+
+def unpack_links(data):
+    """Return the list of repeats packed by `pack_links` at the start of
+    `data`, and the rest of `data`"""
+    (count,), pos = unpack_ints(data, 0, 1)
+    links = []
+    for n in range(count):
+        (start, size), pos = unpack_ints(data, pos, 2)
+        links.append((bytes(data[pos:pos + size]).decode('utf-8'), start))
+        pos += size
+    return links, data[pos:]
+
+
+def pack_bars(bars):
+    """Pack a list of bar line columns into bytes"""
+    return pack_ints(bars)
+
+
+def unpack_bars(data):
+    """Return the list of bar line columns packed by `pack_bars`"""
+    return unpack_ints(data)[0]
+
+
+class Log(object):
+    """Sequence of deltas that can be added and taken at the end, and taken
+    at the start.
+
+    Packed deltas are kept end to end in a single buffer, so each costs only
+    its own bytes and not those of a Python object. Each is stored between
+    two copies of its size, the second with its bytes reversed, so that it can
+    be found from either end of the buffer. Tuples are kept in a deque, and
+    stand in the buffer as an entry of size 0.
+    """
+
+    def __init__(self, maxlen=None):
+        """Constructor for Log class object
+
+        Parameters
+        ----------
+        maxlen : int, optional
+            The largest number of deltas to keep. Once it is reached, adding a
+            delta drops the one at the start. Default is no limit.
+        """
+
+        self.maxlen = maxlen
+        self._buffer = bytearray()
+        self._objects = deque()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        objects = iter(self._objects)
+        buffer = self._buffer
+        pos = 0
+        while pos < len(buffer):
+            (size,), start = unpack_ints(buffer, pos, 1)
+            pos = 2 * start - pos + size
+            yield bytes(buffer[start:start + size]) if size else next(objects)
+
+    def append(self, delta):
+        """Add a delta at the end"""
+        if self._count == self.maxlen:
+            if not self._count:
+                return
+            self.popleft()
+        if isinstance(delta, bytes):
+            data = delta
+        else:
+            data = b''
+            self._objects.append(delta)
+        size = pack_ints((len(data),))
+        self._buffer += size
+        self._buffer += data
+        self._buffer += size[::-1]
+        self._count += 1
+
+    def pop(self):
+        """Remove and return the delta at the end"""
+        if not self._count:
+            raise IndexError('pop from an empty log')
+        buffer = self._buffer
+        (size,), end = unpack_ints(buffer[:-11:-1], 0, 1)
+        stop = len(buffer) - end
+        delta = bytes(buffer[stop - size:stop]) if size else self._objects.pop()
+        del buffer[stop - size - end:]
+        self._count -= 1
+        return delta
+
+    def popleft(self):
+        """Remove and return the delta at the start"""
+        if not self._count:
+            raise IndexError('pop from an empty log')
+        buffer = self._buffer
+        (size,), start = unpack_ints(buffer, 0, 1)
+        delta = bytes(buffer[start:start + size]) if size else self._objects.popleft()
+        del buffer[:2 * start + size]
+        self._count -= 1
+        return delta
+
+    def clear(self):
+        """Remove every delta"""
+        self._buffer = bytearray()
+        self._objects.clear()
+        self._count = 0
+
+    @property
+    def nbytes(self):
+        """The size of the buffer of packed deltas, in bytes"""
+        return len(self._buffer)
+
+
+class History(object):
+    """Bounded log of deltas for undoing and redoing changes.
+
+    The deltas that can be undone are held in a ring buffer, so once it is
+    full every new delta pushes out the oldest one. Undoing a delta moves it
+    to the redo list, which is emptied whenever a new delta is recorded.
+    """
+
+    def __init__(self, size):
+        """Constructor for History class object
+
+        Parameters
+        ----------
+        size : int
+            The largest number of deltas that can be undone
+        """
+
+        self._undo = Log(maxlen=size)
+        self._redo = Log()
+
+    @property
+    def size(self):
+        """The largest number of deltas that can be undone"""
+        return self._undo.maxlen
+
+    def __len__(self):
+        return len(self._undo)
+
+    def record(self, delta):
+        """Add the delta of a new change to the log"""
+        self._undo.append(delta)
+        self._redo.clear()
+
+    def undo(self):
+        """Return the most recent delta that can be undone, moving it to the
+        redo list"""
+        if not self._undo:
+            raise IndexError('Nothing to undo')
+        delta = self._undo.pop()
+        self._redo.append(delta)
+        return delta
+
+    def redo(self):
+        """Return the most recently undone delta, moving it back to the undo
+        log"""
+        if not self._redo:
+            raise IndexError('Nothing to redo')
+        delta = self._redo.pop()
+        self._undo.append(delta)
+        return delta
+
+    def replace_storage(self, old, new):
+        """Make the LOAD deltas that refer to the storage object `old` refer
+        to `new` instead, once the tab data has been moved into it"""
+        for log in (self._undo, self._redo):
+            objects = log._objects
+            for n, delta in enumerate(objects):
+                if delta[0] == LOAD and (delta[3] is old or delta[4] is old):
+                    objects[n] = delta[:3] + tuple(new if storage is old else storage
+                                                   for storage in delta[3:5]) + delta[5:]
+
+    def deltas(self):
+        """Iterate over every delta that can be undone or redone"""
+        yield from self._undo
+        yield from self._redo
+
+    def nbytes(self):
+        """The memory held by the packed deltas, in bytes"""
+        return self._undo.nbytes + self._redo.nbytes
@@ -0,0 +1,140 @@
+"""A pager for reading a whole guitar tab one screen at a time
+
+The pager takes the place of an external program such as ``less``. It renders
+only the rows of the tab on the page being viewed, pulling them from
+`guitab.tab.Tab.iter_lines`, so the first page of even a very long tab is shown
+straight away and the whole tab is never held as a single string.
+"""
+
+import shutil
+import sys
+from itertools import chain, islice
+
+
+class Pager(object):
+    """Show the rows of a tab a page at a time.
+
+    After each page the pager reads a command line:
+
+    * nothing or ``f``: the next page
+    * ``b``: the previous page
+    * ``g`` / ``G``: the first / last page
+    * ``c``: the page holding the current position of the tab
+    * ``/text``: the next row, after the top one, with ``text`` on a string
+    * ``n``: the next row with the text of the last search
+    * ``q``: quit
+
+    When the input or output is not a terminal, the whole tab is written
+    out instead, one line at a time.
+    """
+
+    help = "f b g G c /text n q"
+
+    def __init__(self, tab, stdin=None, stdout=None, height=None):
+        """Constructor for Pager class object
+
+        Parameters
+        ----------
+        tab : guitab.tab.Tab
+            The tab to show
+        stdin : file, optional
+            The stream to read commands from. Default is sys.stdin.
+        stdout : file, optional
+            The stream to show the tab on. Default is sys.stdout.
+        height : int, optional
+            The number of lines on the screen. Default is the height of the
+            terminal.
+        """
+
+        self.tab = tab
+        self.stdin = sys.stdin if stdin is None else stdin
+        self.stdout = sys.stdout if stdout is None else stdout
+        if height is None:
+            height = shutil.get_terminal_size().lines
+        # each row takes a line per string, the cursor line and a blank line,
+        # and one line is kept for the prompt
+        self.page_rows = max(1, (height - 1) // (tab.clength + 2))
+        self.top = 0
+        self.text = None
+
+    def run(self, interactive=None):
+        """Show the tab until the user quits
+
+        Parameters
+        ----------
+        interactive : bool, optional
+            If False, the whole tab is written out without reading any
+            commands. Default is to page only if both the input and the output
+            are terminals.
+        """
+
+        if interactive is None:
+            interactive = self.stdin.isatty() and self.stdout.isatty()
+        if not interactive:
+            self.stdout.writelines(self.tab.iter_lines(cache=False))
+            self.stdout.write('\n')
+            return
+
+        while True:
+            self.stdout.writelines(self.page())
+            self.stdout.write('rows {:d}-{:d} of {:d} ({}): '.format(
+                self.top + 1, min(self.top + self.page_rows, self.tab.num_rows), self.tab.num_rows, self.help))
+            self.stdout.flush()
+            line = self.stdin.readline()
+            if line == '' or not self.command(line.strip()):
+                break
+
+    def page(self):
+        """Generate the lines of the page that is being viewed"""
+        yield from self.tab.iter_lines(self.top, self.top + self.page_rows, cache=False)
+        yield '\n'
+
+    def command(self, line):
+        """Carry out a command read after a page, see the class docstring
+
+        Returns
+        -------
+        bool
+            False if the user quit, otherwise True
+        """
+
+        last = max(0, self.tab.num_rows - self.page_rows)
+        if line in ('', 'f'):
+            self.top = min(self.top + self.page_rows, last)
+        elif line == 'b':
+            self.top = max(self.top - self.page_rows, 0)
+        elif line == 'g':
+            self.top = 0
+        elif line == 'G':
+            self.top = last
+        elif line == 'c':
+            self.top = min(self.tab.window(1)[0], last)
+        elif line.startswith('/') or line == 'n':
+            if line != 'n':
+                self.text = line[1:]
+            if not self.text:
+                self.stdout.write('No previous search\n')
+                return True
+            row = self.find(self.text, self.top + 1)
+            if row is None:
+                self.stdout.write('Pattern not found: {}\n'.format(self.text))
+            else:
+                self.top = row
+        elif line == 'q':
+            return False
+        else:
+            self.stdout.write('Unknown pager command: {}. Use one of: {}\n'.format(line, self.help))
+        return True
+
+    def find(self, text, start):
+        """Return the first row, from row `start` onwards and then from the
+        start of the tab, that has `text` on one of its strings, or None.
+
+        Rows are rendered one at a time until a match is found, and a match
+        cannot span two rows."""
+        num_rows = self.tab.num_rows
+        for row in chain(range(start, num_rows), range(min(start, num_rows))):
+            strings = islice(self.tab.iter_lines(row, row + 1, cursor=False, cache=False), self.tab.clength)
+            if any(text in line[2:] for line in strings):
+                return row
+        return None
@@ -0,0 +1,129 @@
+"""Search index for finding chord sequences in a guitar tab
+"""
+
+import re
+from array import array
+from bisect import bisect_left, insort
+
+from .storage import BLANK
+
+
+class ChordIndex(object):
+    """Inverted index of the notes of a tab.
+
+    For every string and every code other than the blank code, the index holds
+    the sorted columns at which that code appears. A pattern is matched by
+    walking the columns of its rarest note and checking the rest of the
+    pattern at each of them, so a search costs time proportional to the number
+    of occurrences of that note rather than to the length of the tab. The index
+    is kept up to date one column at a time as chords are written.
+
+    When even the rarest note of a pattern is common, the strings of the tab
+    are scanned instead with one compiled regular expression per string, which
+    checks the whole pattern for that string in a single linear pass.
+    """
+
+    # the fraction of the columns of the tab above which walking the columns
+    # of a note is expected to be slower than scanning the strings
+    scan_ratio = 1 / 64
+
+    def __init__(self, storage):
+        """Constructor for ChordIndex class object
+
+        Parameters
+        ----------
+        storage : guitab.storage.Storage
+            The storage of the tab to index
+        """
+
+        self._storage = storage
+        self._columns = []
+        length = len(storage)
+        for j in range(storage.clength):
+            row = bytes(storage.row(j, 0, length))
+            columns = {}
+            for code in set(row) - {BLANK}:
+                columns[code] = array('l', (match.start() for match in re.finditer(re.escape(bytes([code])), row)))
+            self._columns.append(columns)
+
+    def update(self, index, old, new):
+        """Record that the codes of column `index` changed from `old` to
+        `new`"""
+        for columns, before, after in zip(self._columns, old, new):
+            if before == after:
+                continue
+            if before != BLANK:
+                found = columns[before]
+                del found[bisect_left(found, index)]
+            if after != BLANK:
+                insort(columns.setdefault(after, array('l')), index)
+
+    def find(self, pattern, start=0):
+        """Find the first occurrence of a pattern of chords
+
+        Parameters
+        ----------
+        pattern : sequence of sequence of int or None
+            The codes of each chord of the pattern, with None for any string
+            that may hold any entry
+        start : int, optional
+            The first column at which a match may begin. Default is 0.
+
+        Returns
+        -------
+        int or None
+            The column where the first match begins, or None if there is no
+            match
+        """
+
+        length = len(self._storage)
+        last = length - len(pattern)
+        notes = [(offset, j, code) for offset, codes in enumerate(pattern)
+                 for j, code in enumerate(codes) if code is not None]
+        if not notes:
+            return start if start <= last else None
+
+        # walk the columns of the rarest note of the pattern
+        rarest = min(notes, key=lambda note: len(self._columns[note[1]].get(note[2], ())))
+        offset, j, code = rarest
+        found = self._columns[j].get(code, ())
+        if len(found) * len(notes) > length * self.scan_ratio:
+            return self._scan(pattern, start, last)
+        get = self._storage.get
+        for n in range(bisect_left(found, start + offset), len(found)):
+            begin = found[n] - offset
+            if begin > last:
+                break
+            if all(get(begin + other_offset)[other_j] == other_code
+                   for other_offset, other_j, other_code in notes):
+                return begin
+        return None
+
+    def _scan(self, pattern, start, last):
+        """Find the first occurrence of a pattern by scanning the strings of
+        the tab, see `find`"""
+
+        length = len(self._storage)
+        # one regular expression per string that has notes in the pattern, with
+        # '.' for the wildcards. The string with the most notes is searched and
+        # the others are checked at each of its matches
+        regexes = []
+        for j in range(self._storage.clength):
+            codes = [chord[j] for chord in pattern]
+            if any(code is not None for code in codes):
+                expression = b''.join(b'.' if code is None else re.escape(bytes([code])) for code in codes)
+                regexes.append((sum(code is not None for code in codes), j, re.compile(expression, re.DOTALL)))
+        regexes.sort(reverse=True)
+        rows = [bytes(self._storage.row(j, 0, length)) for count, j, regex in regexes]
+
+        first = regexes[0][2]
+        begin = start
+        while begin <= last:
+            match = first.search(rows[0], begin)
+            if match is None or match.start() > last:
+                return None
+            begin = match.start()
+            if all(regex.match(row, begin) for (count, j, regex), row in zip(regexes[1:], rows[1:])):
+                return begin
+            begin += 1
+        return None
@@ -0,0 +1,951 @@
+"""Compact storage backends for the chord data of a guitar tab
+
+The chord data of a tab is a grid of fret entries with one column per count of
+the tab and one row per string of the instrument. The storage classes in this
+module hold that grid as small integer codes, where each code is an index into
+the list of allowed entries of the owning `Tab` object and code 0 is always the
+blank entry '-'. The storage knows nothing about the meaning of the codes; the
+translation to and from text is handled by the `Tab` class.
+
+Two backends are available: `ArrayStorage`, which only needs the standard
+library and is the default, and `NumpyStorage`, which holds the grid in a 2-D
+NumPy array and requires the optional numpy dependency. `SparseStorage` only
+stores the chords that are not blank, which suits long tabs with few notes. In
+addition, `LazyStorage` holds tab data that is decoded block by block from a
+file as it is accessed.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+"""The code of the blank entry, '-'"""
+BLANK = 0
+
+
+class Storage(object):
+    """Base class for the chord storage backends.
+
+    Subclasses must implement `__len__`, `get`, `set`, `resize`, `row`,
+    `load`, `insert` and `delete`. The bulk operations defined here work in terms of those methods
+    and should be overridden by backends that can do better.
+    """
+
+    def set_many(self, start, columns):
+        """Store a sequence of chords in consecutive columns
+
+        Parameters
+        ----------
+        start : int
+            The column of the first chord
+        columns : sequence of sequence of int
+            The codes of each chord, one code per string. The storage must
+            already be large enough to hold all of the chords.
+        """
+        for index, codes in enumerate(columns, start):
+            self.set(index, codes)
+
+    def blank_columns(self):
+        """Return the indices of the columns that hold a blank chord"""
+        blank = (BLANK,) * self.clength
+        return [index for index in range(len(self)) if self.get(index) == blank]
+
+    def remap(self, table, start=0, end=None):
+        """Replace every code in a range of columns by its entry in `table`
+
+        Parameters
+        ----------
+        table : bytes
+            A translation table of 256 codes, as used by `bytes.translate`
+        start : int, optional
+            The first column to remap. Default is 0.
+        end : int, optional
+            One past the final column to remap. Default is the end of the
+            storage.
+        """
+        if end is None:
+            end = len(self)
+        for index in range(start, end):
+            self.set(index, [table[code] for code in self.get(index)])
+
+    def detach(self):
+        """Release any external resource that the storage reads from, such as
+        the file it was loaded from, keeping all of its data in memory"""
+
+    def section_sizes(self):
+        """Return the number of columns of each named section, by name. Only
+        `LazyStorage` supports sections."""
+        return {}
+
+    def linked(self, start, end):
+        """Return whether any of the columns `start` to `end - 1` are in a
+        repeat of a section, so that writing to them changes other columns"""
+        return False
+
+    def repeats(self, start, end):
+        """Return the name and first column of each repeat of a section that
+        overlaps the columns `start` to `end - 1`. Only `LazyStorage` supports
+        sections."""
+        return []
+
+    def snapshot(self):
+        """Return a copy of the storage that can be changed independently of
+        it. The copy is a `LazyStorage`, whose own snapshots share its blocks,
+        and takes a pass over the data to make."""
+        return LazyStorage.from_storage(self)
+
+
+class ArrayStorage(Storage):
+    """Column-indexed chord storage backed by one `bytearray` per string.
+
+    Each string of the instrument is held in its own contiguous buffer of one
+    byte per column, so the whole of a tab row for a single string can be
+    extracted with at most two slices.
+
+    The buffers are gap buffers: they hold an unused gap, at the same position
+    in every string, which is moved to wherever columns are inserted or
+    deleted. Consecutive edits at the same place only move the gap once, and
+    the gap is grown in proportion to the size of the storage, so inserting k
+    columns costs amortised O(k) plus the distance the gap moves.
+    """
+
+    def __init__(self, clength, length=1):
+        """Constructor for ArrayStorage class object
+
+        Parameters
+        ----------
+        clength : int
+            The number of strings of the instrument
+        length : int, optional
+            The initial number of (blank) columns. Default is 1.
+        """
+
+        self.clength = clength
+        self._strings = [bytearray(length) for x in range(clength)]
+        # the gap occupies the buffer positions gap_start to gap_end - 1
+        self._gap_start = self._gap_end = length
+
+    def __len__(self):
+        return len(self._strings[0]) - (self._gap_end - self._gap_start)
+
+    def _physical(self, index):
+        """Return the buffer position of column `index`"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Column index out of range: {}'.format(index))
+        if index >= self._gap_start:
+            index += self._gap_end - self._gap_start
+        return index
+
+    def _spans(self, start, end):
+        """Return the buffer ranges, as (start, end) pairs, that hold the
+        columns `start` to `end - 1`"""
+        gap_start = self._gap_start
+        gap = self._gap_end - gap_start
+        end = min(end, len(self))
+        if end <= gap_start:
+            return [(start, end)]
+        elif start >= gap_start:
+            return [(start + gap, end + gap)]
+        return [(start, gap_start), (self._gap_end, end + gap)]
+
+    def _move_gap(self, index):
+        """Move the gap so that it starts before column `index`"""
+        gap_start, gap_end = self._gap_start, self._gap_end
+        gap = gap_end - gap_start
+        if index < gap_start:
+            for string in self._strings:
+                string[index + gap:gap_end] = string[index:gap_start]
+        elif index > gap_start:
+            for string in self._strings:
+                string[gap_start:index] = string[gap_end:index + gap]
+        self._gap_start, self._gap_end = index, index + gap
+
+    def get(self, index):
+        """Return the codes of the chord at column `index` as a tuple"""
+        index = self._physical(index)
+        return tuple(string[index] for string in self._strings)
+
+    def set(self, index, codes):
+        """Store the chord `codes` (one code per string) at column `index`"""
+        index = self._physical(index)
+        for string, code in zip(self._strings, codes):
+            string[index] = code
+
+    def resize(self, length):
+        """Grow the storage with blank columns, or truncate it, so that it
+        holds exactly `length` columns"""
+        extra = length - len(self)
+        if extra > 0:
+            for string in self._strings:
+                string.extend(bytes(extra))
+        elif length <= self._gap_start:
+            # the gap is discarded along with everything after it
+            for string in self._strings:
+                del string[length:]
+            self._gap_start = self._gap_end = length
+        else:
+            for string in self._strings:
+                del string[length + self._gap_end - self._gap_start:]
+
+    def row(self, string, start, end):
+        """Return the codes of one string for columns `start` to `end - 1`
+
+        Parameters
+        ----------
+        string : int
+            The index of the string (0 is the highest pitched string)
+        start : int
+            The first column of the row
+        end : int
+            One past the final column of the row
+
+        Returns
+        -------
+        bytearray
+            One code per column
+        """
+        buffer = self._strings[string]
+        spans = self._spans(start, end)
+        if len(spans) == 1:
+            return buffer[spans[0][0]:spans[0][1]]
+        return buffer[spans[0][0]:spans[0][1]] + buffer[spans[1][0]:spans[1][1]]
+
+    def load(self, strings):
+        """Replace the contents of the storage with the given per-string code
+        sequences, which must all have the same length"""
+        self._strings = [bytearray(string) for string in strings]
+        self._gap_start = self._gap_end = len(self._strings[0])
+
+    def insert(self, index, columns):
+        """Insert a sequence of chords before column `index`
+
+        Parameters
+        ----------
+        index : int
+            The column to insert before; `len(self)` appends the chords
+        columns : sequence of sequence of int
+            The codes of each chord, one code per string
+        """
+        count = len(columns)
+        self._move_gap(index)
+        if self._gap_end - self._gap_start < count:
+            grow = max(count, len(self) // 2, 64)
+            for string in self._strings:
+                string[self._gap_end:self._gap_end] = bytes(grow)
+            self._gap_end += grow
+        self._gap_start += count
+        self.set_many(index, columns)
+
+    def delete(self, index, count):
+        """Delete `count` columns starting at column `index`"""
+        self._move_gap(index)
+        self._gap_end += count
+
+    def set_many(self, start, columns):
+        offset = 0
+        for begin, end in self._spans(start, start + len(columns)):
+            part = columns[offset:offset + end - begin]
+            for string, codes in zip(self._strings, zip(*part)):
+                string[begin:end] = bytes(codes)
+            offset += end - begin
+
+    def blank_columns(self):
+        # OR all of the strings together as big integers; the bytes of the
+        # result are zero exactly where every string holds a blank
+        combined = 0
+        for j in range(self.clength):
+            combined |= int.from_bytes(self.row(j, 0, len(self)), 'big')
+        mask = combined.to_bytes(len(self), 'big')
+        return [match.start() for match in re.finditer(b'\x00', mask)]
+
+    def remap(self, table, start=0, end=None):
+        if end is None:
+            end = len(self)
+        for begin, finish in self._spans(start, end):
+            for string in self._strings:
+                string[begin:finish] = string[begin:finish].translate(table)
+
+
+class NumpyStorage(Storage):
+    """Column-indexed chord storage backed by a 2-D NumPy array.
+
+    The array has one row per column of the tab and one column per string,
+    with spare capacity kept at the end so that the tab can grow without a
+    reallocation on every step. Bulk operations act on the whole array at
+    once rather than chord by chord.
+    """
+
+    def __init__(self, clength, length=1):
+        """Constructor for NumpyStorage class object
+
+        Parameters
+        ----------
+        clength : int
+            The number of strings of the instrument
+        length : int, optional
+            The initial number of (blank) columns. Default is 1.
+
+        Raises
+        ------
+        ImportError
+            If numpy is not installed
+        """
+
+        if np is None:
+            raise ImportError("The numpy storage backend requires numpy, which could not be imported")
+
+        self.clength = clength
+        self._data = np.zeros((length, clength), dtype=np.uint8)
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def _index(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('Column index out of range: {}'.format(index))
+        return index
+
+    def get(self, index):
+        return tuple(self._data[self._index(index)].tolist())
+
+    def set(self, index, codes):
+        self._data[self._index(index)] = codes
+
+    def resize(self, length):
+        if length > len(self._data):
+            data = np.zeros((max(length, 2 * len(self._data)), self.clength), dtype=np.uint8)
+            data[:self._length] = self._data[:self._length]
+            self._data = data
+        elif length > self._length:
+            # clear anything left behind by an earlier truncation
+            self._data[self._length:length] = BLANK
+        self._length = length
+
+    def row(self, string, start, end):
+        end = min(end, self._length)
+        return self._data[start:end, string].tobytes()
+
+    def load(self, strings):
+        grid = np.frombuffer(b''.join(bytes(string) for string in strings), dtype=np.uint8)
+        self._data = grid.reshape(self.clength, -1).T.copy()
+        self._length = len(self._data)
+
+    def insert(self, index, columns):
+        columns = np.asarray(columns, dtype=np.uint8).reshape(-1, self.clength)
+        length = self._length
+        self.resize(length + len(columns))
+        self._data[index + len(columns):length + len(columns)] = self._data[index:length]
+        self._data[index:index + len(columns)] = columns
+
+    def delete(self, index, count):
+        length = self._length
+        self._data[index:length - count] = self._data[index + count:length]
+        self._length -= count
+
+    def set_many(self, start, columns):
+        columns = np.asarray(columns, dtype=np.uint8).reshape(-1, self.clength)
+        self._data[start:start + len(columns)] = columns
+
+    def blank_columns(self):
+        return np.flatnonzero(~self._data[:self._length].any(axis=1)).tolist()
+
+    def remap(self, table, start=0, end=None):
+        if end is None or end > self._length:
+            end = self._length
+        lookup = np.frombuffer(table, dtype=np.uint8)
+        self._data[start:end] = lookup[self._data[start:end]]
+
+
+class SparseStorage(Storage):
+    """Chord storage that only holds the chords that are not blank.
+
+    The non-blank chords are kept in a dictionary keyed by column, together
+    with a sorted list of their columns for range lookups. Runs of blank
+    columns take no memory, so extending the tab is free and the cost of most
+    operations depends on the number of notes rather than the number of
+    columns.
+    """
+
+    def __init__(self, clength, length=1):
+        """Constructor for SparseStorage class object
+
+        Parameters
+        ----------
+        clength : int
+            The number of strings of the instrument
+        length : int, optional
+            The initial number of (blank) columns. Default is 1.
+        """
+
+        self.clength = clength
+        self._blank = (BLANK,) * clength
+        self._length = length
+        self._chords = {}
+        self._columns = []
+        self._shapes = {}
+        # whether the chords are shared with a snapshot
+        self._shared = False
+
+    def __len__(self):
+        return self._length
+
+    def _unshare(self):
+        """Take private copies of the chords before they are changed, if they
+        are shared with a snapshot"""
+        if self._shared:
+            self._chords = dict(self._chords)
+            self._columns = list(self._columns)
+            self._shapes = dict(self._shapes)
+            self._shared = False
+
+    def _index(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('Column index out of range: {}'.format(index))
+        return index
+
+    def get(self, index):
+        return self._chords.get(self._index(index), self._blank)
+
+    def set(self, index, codes):
+        index = self._index(index)
+        self._unshare()
+        codes = tuple(codes)
+        codes = self._shapes.setdefault(codes, codes)
+        if codes == self._blank:
+            if self._chords.pop(index, None) is not None:
+                del self._columns[bisect_left(self._columns, index)]
+        else:
+            if index not in self._chords:
+                self._columns.insert(bisect_left(self._columns, index), index)
+            self._chords[index] = codes
+
+    def resize(self, length):
+        if length < self._length:
+            self._unshare()
+            cut = bisect_left(self._columns, length)
+            for index in self._columns[cut:]:
+                del self._chords[index]
+            del self._columns[cut:]
+        self._length = length
+
+    def row(self, string, start, end):
+        end = min(end, self._length)
+        codes = bytearray(max(end - start, 0))
+        columns = self._columns
+        for index in columns[bisect_left(columns, start):bisect_left(columns, end)]:
+            codes[index - start] = self._chords[index][string]
+        return codes
+
+    def load(self, strings):
+        # find the columns where any string is not blank, as in
+        # ArrayStorage.blank_columns
+        self._length = len(strings[0])
+        combined = 0
+        for string in strings:
+            combined |= int.from_bytes(string, 'big')
+        mask = combined.to_bytes(self._length, 'big')
+        self._columns = [match.start() for match in re.finditer(b'[^\x00]', mask)]
+        self._shapes = {}
+        self._chords = {}
+        self._shared = False
+        for index in self._columns:
+            codes = tuple(string[index] for string in strings)
+            self._chords[index] = self._shapes.setdefault(codes, codes)
+
+    def insert(self, index, columns):
+        count = len(columns)
+        self._unshare()
+        cut = bisect_left(self._columns, index)
+        moved = self._columns[cut:]
+        chords = [self._chords.pop(column) for column in moved]
+        self._columns[cut:] = [column + count for column in moved]
+        self._chords.update(zip(self._columns[cut:], chords))
+        self._length += count
+        for offset, codes in enumerate(columns):
+            self.set(index + offset, codes)
+
+    def delete(self, index, count):
+        self._unshare()
+        first = bisect_left(self._columns, index)
+        last = bisect_left(self._columns, index + count)
+        moved = self._columns[last:]
+        chords = [self._chords.pop(column) for column in self._columns[first:]][last - first:]
+        self._columns[first:] = [column - count for column in moved]
+        self._chords.update(zip(self._columns[first:], chords))
+        self._length -= count
+
+    def blank_columns(self):
+        columns = set(self._columns)
+        return [index for index in range(self._length) if index not in columns]
+
+    def remap(self, table, start=0, end=None):
+        if table[BLANK] != BLANK:
+            # blank columns would no longer be blank
+            return super().remap(table, start, end)
+        if end is None:
+            end = self._length
+        columns = self._columns
+        for index in columns[bisect_left(columns, start):bisect_left(columns, end)]:
+            self.set(index, [table[code] for code in self._chords[index]])
+
+    def snapshot(self):
+        """Return a copy of the storage that shares its chords until either
+        copy is changed. The copy takes constant time to make."""
+        copy = SparseStorage(self.clength, self._length)
+        copy._chords, copy._columns, copy._shapes = self._chords, self._columns, self._shapes
+        copy._shared = self._shared = True
+        return copy
+
+
+class Block(list):
+    """The per-string buffers of a block of columns of a `LazyStorage`.
+
+    The block records the storage that created it, which is the only one that
+    may edit it in place; any other storage holding the block shares it and
+    must copy it first.
+    """
+
+    __slots__ = ('owner',)
+
+
+class LazyStorage(Storage):
+    """Chord storage that is decoded from a source one block at a time.
+
+    The tab data is split into consecutive blocks of columns, whose sizes are
+    known up front. A block is only decoded, by calling `source.decode` with
+    its number, when a column in it is first accessed. Decoded blocks are kept
+    as one bytearray per string and edits are made to them in place, so memory
+    use is proportional to the part of the tab that has been touched.
+
+    The blocks can also be shared with snapshots of the storage. Shared blocks
+    are copied the first time that they are edited, so a snapshot only costs
+    the memory of the blocks that change afterwards.
+
+    A range of columns can be made into a named section, which can then be
+    repeated anywhere in the storage. Every repeat is a reference to the same
+    block, so writing a chord in any repeat changes them all. Inserting or
+    deleting columns inside a repeat turns that repeat back into a copy of the
+    section first, so the other repeats keep their length.
+    """
+
+    def __init__(self, clength, sizes, source):
+        """Constructor for LazyStorage class object
+
+        Parameters
+        ----------
+        clength : int
+            The number of strings of the instrument
+        sizes : sequence of int
+            The number of columns in each block of the source
+        source : object
+            The source of the blocks. `source.decode(n)` must return the codes
+            of block `n` as one bytes-like object per string, and
+            `source.close()` must release the source.
+        """
+
+        self.clength = clength
+        self._sizes = list(sizes)
+        self._restart()
+        self._source = source
+        # each block is a Block, the name of a section, or None if it has not
+        # been decoded yet
+        self._blocks = [None] * len(self._sizes)
+        self._sections = {}
+        # the token that marks the blocks this storage may edit in place, and
+        # whether the block lists are shared with a snapshot
+        self._token = object()
+        self._shared = False
+
+    @classmethod
+    def from_storage(cls, storage, block_size=4096):
+        """Copy the data of another storage into blocks of `block_size`
+        columns"""
+        length = len(storage)
+        blocks = cls(storage.clength, [min(block_size, length - start)
+                                       for start in range(0, length, block_size)], None)
+        blocks._blocks = [blocks._new(storage.row(j, start, start + size) for j in range(storage.clength))
+                          for start, size in zip(blocks._starts, blocks._sizes)]
+        return blocks
+
+    @classmethod
+    def from_layout(cls, clength, strings, sections, layout):
+        """Build a storage from the parts returned by `layout`"""
+        blocks = cls(clength, [], None)
+        blocks._sections = {name: blocks._new(section) for name, section in sections.items()}
+        pos = 0
+        for name, size in layout:
+            if name is None:
+                blocks._blocks.append(blocks._new(string[pos:pos + size] for string in strings))
+                pos += size
+            else:
+                blocks._blocks.append(name)
+            blocks._sizes.append(size)
+        blocks._restart()
+        return blocks
+
+    def __len__(self):
+        return self._length
+
+    def _restart(self):
+        """Recompute the first column of every block and the length"""
+        self._starts = [0] + list(accumulate(self._sizes))
+        self._length = self._starts.pop()
+
+    def _new(self, strings):
+        """Return a new block, that this storage may edit, holding a copy of
+        the per-string codes `strings`"""
+        block = Block(bytearray(string) for string in strings)
+        block.owner = self._token
+        return block
+
+    def _block(self, n):
+        """Return the per-string buffers of block `n`, decoding it first if
+        necessary"""
+        block = self._blocks[n]
+        if block is None:
+            block = self._blocks[n] = self._new(self._source.decode(n))
+        elif block.__class__ is str:
+            block = self._sections[block]
+        return block
+
+    def _unshare(self):
+        """Take private copies of the block lists before they are changed,
+        if they are shared with a snapshot"""
+        if self._shared:
+            self._sizes = list(self._sizes)
+            self._starts = list(self._starts)
+            self._blocks = list(self._blocks)
+            self._sections = dict(self._sections)
+            self._shared = False
+
+    def _writable(self, n):
+        """Return the per-string buffers of block `n` for editing, copying
+        the block first if it is shared with a snapshot"""
+        if self._blocks[n].__class__ is str:
+            return self._writable_section(self._blocks[n])
+        block = self._block(n)
+        if block.owner is not self._token:
+            self._unshare()
+            block = self._blocks[n] = self._new(block)
+        return block
+
+    def _writable_section(self, name):
+        """Return the per-string buffers of a section for editing, copying
+        the section first if it is shared with a snapshot"""
+        block = self._sections[name]
+        if block.owner is not self._token:
+            self._unshare()
+            block = self._sections[name] = self._new(block)
+        return block
+
+    def _unlink(self, n):
+        """Replace block `n`, if it is a repeat of a section, by a copy of the
+        section"""
+        if self._blocks[n].__class__ is str:
+            self._unshare()
+            self._blocks[n] = self._new(self._block(n))
+
+    def _split(self, index):
+        """Make column `index` the first column of a block, and return the
+        number of that block. Requires that the storage has no source."""
+        if index == self._length:
+            return len(self._sizes)
+        n, offset = self._locate(index)
+        if offset > 0:
+            self._unlink(n)
+            block = self._writable(n)
+            tail = self._new(string[offset:] for string in block)
+            for string in block:
+                del string[offset:]
+            self._blocks.insert(n + 1, tail)
+            self._sizes[n:n + 1] = [offset, self._sizes[n] - offset]
+            self._starts.insert(n + 1, index)
+            n += 1
+        return n
+
+    def snapshot(self):
+        """Return a copy of the storage that shares all of its blocks.
+
+        The copy takes constant time to make, except that the storage is first
+        detached from its source, if it has one, so that the snapshot does not
+        depend on the source staying open.
+        """
+        self.detach()
+        copy = LazyStorage(self.clength, [], None)
+        copy._sizes, copy._starts, copy._blocks = self._sizes, self._starts, self._blocks
+        copy._sections = self._sections
+        copy._length = self._length
+        copy._shared = self._shared = True
+        self._token = object()
+        return copy
+
+    def section_sizes(self):
+        return {name: len(block[0]) for name, block in self._sections.items()}
+
+    def linked(self, start, end):
+        if not self._sections or start >= end:
+            return False
+        first, offset = self._locate(start)
+        last, offset = self._locate(end - 1)
+        return any(self._blocks[n].__class__ is str for n in range(first, last + 1))
+
+    def repeats(self, start, end):
+        end = min(end, self._length)
+        if not self._sections or start >= end:
+            return []
+        first, offset = self._locate(start)
+        last, offset = self._locate(end - 1)
+        return [(self._blocks[n], self._starts[n]) for n in range(first, last + 1)
+                if self._blocks[n].__class__ is str]
+
+    def define_section(self, name, start, end):
+        """Make the columns `start` to `end - 1` into a section called `name`,
+        of which they become the first repeat
+
+        The storage is detached from its source first. The columns must not
+        overlap a repeat of another section.
+        """
+        if name in self._sections:
+            raise TypeError('A section is already defined with the name: {}'.format(name))
+        if not 0 <= start < end <= self._length:
+            raise IndexError('Requested section is out of range. start = {}, end = {}, and length = '
+                             '{:d}'.format(start, end, self._length))
+        if self.linked(start, end):
+            raise TypeError('A section cannot overlap a repeat of another section')
+        self.detach()
+        self._unshare()
+        self._sections[name] = self._new(self.row(j, start, end) for j in range(self.clength))
+        self.link(name, start)
+
+    def link(self, name, index):
+        """Make the columns from `index` onwards, which must hold the codes of
+        a section, into a repeat of it. This undoes the copy made when
+        columns are inserted into or deleted from a repeat."""
+        self._unshare()
+        end = index + len(self._sections[name][0])
+        n = self._split(index)
+        m = self._split(end)
+        self._blocks[n:m] = [name]
+        self._sizes[n:m] = [end - index]
+        self._starts[n:m] = [index]
+
+    def remove_section(self, name):
+        """Replace every repeat of a section by a copy of it, and forget the
+        section"""
+        for n, block in enumerate(self._blocks):
+            if block == name:
+                self._unlink(n)
+        self._unshare()
+        del self._sections[name]
+
+    def repeat(self, name, index):
+        """Insert a repeat of a section so that it starts at column `index`,
+        and return the number of columns inserted"""
+        if name not in self._sections:
+            raise TypeError('No section is defined with the name: {}'.format(name))
+        self._unshare()
+        n = self._split(index)
+        size = len(self._sections[name][0])
+        self._blocks.insert(n, name)
+        self._sizes.insert(n, size)
+        self._restart()
+        return size
+
+    def layout(self):
+        """Return the data as separate parts that can be put back together
+        with `from_layout`
+
+        Returns
+        -------
+        strings : list of bytes
+            The codes of every column that is not in a repeat of a section,
+            one bytes object per string
+        sections : dict
+            The codes of each section, as one bytes object per string, by name
+        layout : list of tuple
+            The name of the section of each consecutive run of columns, or
+            None for columns taken in turn from `strings`, and the number of
+            columns in the run
+        """
+        self.detach()
+        parts = [[] for x in range(self.clength)]
+        layout = []
+        for block, size in zip(self._blocks, self._sizes):
+            name = block if block.__class__ is str else None
+            if size == 0:
+                continue
+            if name is None:
+                for part, string in zip(parts, block):
+                    part.append(string)
+            if layout and name is None and layout[-1][0] is None:
+                layout[-1] = (None, layout[-1][1] + size)
+            else:
+                layout.append((name, size))
+        sections = {name: [bytes(string) for string in block] for name, block in self._sections.items()}
+        return [b''.join(part) for part in parts], sections, layout
+
+    def _locate(self, index):
+        """Return the block number of column `index` and its offset in the
+        block"""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('Column index out of range: {}'.format(index))
+        n = bisect_right(self._starts, index) - 1
+        return n, index - self._starts[n]
+
+    def get(self, index):
+        n, offset = self._locate(index)
+        return tuple(string[offset] for string in self._block(n))
+
+    def set(self, index, codes):
+        n, offset = self._locate(index)
+        for string, code in zip(self._writable(n), codes):
+            string[offset] = code
+
+    def resize(self, length):
+        if length > self._length:
+            extra = length - self._length
+            if self._sizes and self._blocks[-1].__class__ is not str:
+                # grow the final block rather than adding a block per call
+                for string in self._writable(len(self._sizes) - 1):
+                    string.extend(bytes(extra))
+                self._sizes[-1] += extra
+            else:
+                self._unshare()
+                self._blocks.append(self._new(bytes(extra) for x in range(self.clength)))
+                self._sizes.append(extra)
+                self._starts.append(self._length)
+        elif length < self._length:
+            self._unshare()
+            if length == 0:
+                n = 0
+            else:
+                n, offset = self._locate(length - 1)
+                if offset + 1 < self._sizes[n]:
+                    self._unlink(n)
+                    for string in self._writable(n):
+                        del string[offset + 1:]
+                    self._sizes[n] = offset + 1
+                n += 1
+            del self._blocks[n:]
+            del self._sizes[n:]
+            del self._starts[n:]
+        self._length = length
+
+    def row(self, string, start, end):
+        end = min(end, self._length)
+        parts = []
+        if start < end:
+            n, offset = self._locate(start)
+            while start < end:
+                take = min(end - start, self._sizes[n] - offset)
+                parts.append(self._block(n)[string][offset:offset + take])
+                start += take
+                n += 1
+                offset = 0
+        return b''.join(parts)
+
+    def insert(self, index, columns):
+        count = len(columns)
+        if index == self._length:
+            # append to the final block
+            self.resize(self._length + count)
+            self.set_many(index, columns)
+        elif count > 0:
+            n, offset = self._locate(index)
+            self._unshare()
+            if offset == 0 and self._blocks[n].__class__ is str:
+                # insert before a repeat of a section, rather than into it
+                self._blocks.insert(n, self._new(bytes(codes) for codes in zip(*columns)))
+                self._sizes.insert(n, count)
+                self._starts.insert(n, index)
+            else:
+                self._unlink(n)
+                for string, codes in zip(self._writable(n), zip(*columns)):
+                    string[offset:offset] = bytes(codes)
+                self._sizes[n] += count
+            self._starts[n + 1:] = [start + count for start in self._starts[n + 1:]]
+            self._length += count
+
+    def delete(self, index, count):
+        self._length -= count
+        self._unshare()
+        while count > 0:
+            n = bisect_right(self._starts, index) - 1
+            offset = index - self._starts[n]
+            take = min(count, self._sizes[n] - offset)
+            if take == self._sizes[n] and self._blocks[n].__class__ is str:
+                # drop the whole repeat, leaving the section itself alone
+                self._blocks[n] = self._new(b'' for x in range(self.clength))
+            else:
+                self._unlink(n)
+                for string in self._writable(n):
+                    del string[offset:offset + take]
+            self._sizes[n] -= take
+            self._starts[n + 1:] = [start - take for start in self._starts[n + 1:]]
+            count -= take
+
+    def load(self, strings):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        self._blocks = [self._new(strings)]
+        self._sections = {}
+        self._shared = False
+        self._sizes = [len(self._blocks[0][0])]
+        self._restart()
+
+    def remap(self, table, start=0, end=None):
+        if end is None or end > self._length:
+            end = self._length
+        if start >= end:
+            return
+        # the parts of each section to remap. A section is remapped once,
+        # however many of its repeats are in the range
+        sections = {}
+        n, offset = self._locate(start)
+        while start < end:
+            take = min(end - start, self._sizes[n] - offset)
+            if self._blocks[n].__class__ is str:
+                sections.setdefault(self._blocks[n], []).append((offset, offset + take))
+            else:
+                for string in self._writable(n):
+                    string[offset:offset + take] = string[offset:offset + take].translate(table)
+            start += take
+            n += 1
+            offset = 0
+
+        for name, spans in sections.items():
+            block = self._writable_section(name)
+            done = 0
+            for first, last in sorted(spans):
+                first = max(first, done)
+                if first < last:
+                    for string in block:
+                        string[first:last] = string[first:last].translate(table)
+                    done = last
+
+    def detach(self):
+        if self._source is not None:
+            for n in range(len(self._sizes)):
+                self._block(n)
+            self._source.close()
+            self._source = None
+
+
+"""The available storage backends, by name"""
+BACKENDS = {'array': ArrayStorage, 'numpy': NumpyStorage, 'sparse': SparseStorage}
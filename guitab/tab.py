@@ -1,23 +1,16 @@
 """A module for representing guitar tablature
 """
 
+import copy
 import datetime as dt
-import warnings
 import re
+import warnings
+from bisect import bisect_left, bisect_right
 
-
-"""Compiled regex search to remove position cursor in tab"""
-rm_position = re.compile(r'(^\s+)\*(\s*$)', flags=re.MULTILINE)
-"""Compiled regex search to find title field in tab text file"""
-title = re.compile(r'^title\s*:\s*(.*)\s*$', flags=re.IGNORECASE)
-"""Compiled regex search to find author field in tab text file"""
-author = re.compile(r'^author\s*:\s*(.*)\s*$', flags=re.IGNORECASE)
-"""Compiled regex search to find date field in tab text file"""
-date = re.compile(r'^date\s*:\s*(.*)\s*$', flags=re.IGNORECASE)
-
-info_tests = {'title': title, 'author': author, 'date': date}
-"""Define the order for reading metadata from a tab file"""
-info_order = ['title', 'author', 'date']
+from . import events, history, tabio
+from .chord import Chord
+from .search import ChordIndex
+from .storage import BACKENDS, BLANK, LazyStorage
 
 
 class Tab(object):
@@ -27,7 +20,7 @@ class Tab(object):
     display of a guitar tab in Python.
     """
 
-    def __init__(self, clength=6):
+    def __init__(self, clength=6, backend='array', frets=24, history_size=10000):
         """Constructor for Tab class object
 
 
@@ -37,131 +30,478 @@ class Tab(object):
             The "length" of a chord, i.e. the number of strings of the guitar.
             The default is 6 which corresponds to the usual 6-string guitar.
             WIP not yet implemented
+        backend : str, optional
+            The storage backend for the chord data, one of the keys of
+            `guitab.storage.BACKENDS`. The default, 'array', only needs the
+            standard library; 'numpy' holds the chords in a NumPy array and
+            requires numpy to be installed; 'sparse' only stores the chords
+            that are not blank.
+        frets : int, optional
+            The highest fret number that can be entered in a chord. The default
+            is 24; extended-range instruments may need more.
+        history_size : int, optional
+            The number of changes to the tab that can be undone. The default
+            is 10000.
         """
 
+        if backend not in BACKENDS:
+            raise TypeError("Unknown storage backend: {}. Expected one of: {}".format(
+                backend, ', '.join(sorted(BACKENDS))))
+        if type(frets) != int or not 0 <= frets <= 250:
+            raise TypeError('frets argument must be an integer between 0 and 250. frets = '
+                            '{}'.format(frets))
+
         # the maximum length of a line in the tab
         self._MAX = 78
 
         # the number of strings for a chord, default 6
         self.clength = clength
 
-        # a blank chord
-        self._blank = ['-' for x in range(self.clength)]
-
-        # the list that will hold the chords which form the tab
-        self.tab_data = [self._blank]
-
         # string tuning indicator to be printed at the beginning of each tab
         # line
         self._leader = ('e|', 'B|', 'G|', 'D|', 'A|', 'E|')
 
-        # allowed entries for a chord list
-        self.allowed = ['-', 'h', 'p', 'x'] + [str(x) for x in range(25)]
+        # allowed entries for a chord list; an entry is stored as its index in
+        # this list, so the blank entry '-' must come first
+        self.allowed = ['-', 'h', 'p', 'x'] + [str(x) for x in range(frets + 1)]
+
+        # lookup table from allowed entries to their codes, used to check and
+        # translate chords
+        self._codes = {entry: code for code, entry in enumerate(self.allowed)}
+
+        # translation table from codes to the characters used for rendering.
+        # Entries that are wider than one character translate to a null byte
+        # so that rows containing them can be detected and rendered the slow
+        # way
+        glyphs = bytearray(256)
+        for code, entry in enumerate(self.allowed):
+            if len(entry) == 1:
+                glyphs[code] = ord(entry)
+        self._glyphs = bytes(glyphs)
+
+        # translation table from the characters of a tab text file to codes.
+        # Characters that are not allowed entries translate to 255, which is
+        # never a valid code
+        text_codes = bytearray(b'\xff' * 256)
+        for code, entry in enumerate(self.allowed):
+            if len(entry) == 1:
+                text_codes[ord(entry)] = code
+        self._text_codes = bytes(text_codes)
+
+        # the validated codes of every chord shape written to the tab, keyed
+        # by interned chord, and the reverse mapping for reading chords back
+        self._chord_codes = {}
+        self._code_chords = {}
+
+        # the compact column storage that holds the chords which form the tab,
+        # starting with a single blank chord
+        self._backend = BACKENDS[backend]
+        self._storage = self._backend(self.clength)
+
+        # the rendered string lines of the rows of the tab, by row number. Rows
+        # are removed when they change. The cursor line is not cached since it
+        # is drawn over the rows on every render. Renders of the whole tab do
+        # not add to the cache, so it only holds rows that have been viewed
+        self._row_cache = {}
+
+        # the search index of the notes of the tab, built by the first search
+        # and then kept up to date by writes. Other edits discard it
+        self._search = None
+
+        # the index of the first chord after each bar line, in increasing
+        # order, and the index of each named bookmark. Both are replaced
+        # rather than changed in place, so that snapshots can share them
+        self._bars = []
+        self._bookmarks = {}
+
+        # the log of the changes made to the tab, for undo and redo
+        self._history = history.History(history_size)
+
+        # the callbacks that are sent the events of each change, see
+        # `subscribe`
+        self._observers = []
 
         # the index for the current position in the tab
         self.i = 0
 
-        # the current size of the tab (i.e. largest index attained so far)
-        self.imax = 0
-
         # the dictionary that holds the information about the tab; set defaults
         today = str(dt.date.today())
         self.info = {'filename': 'myTab.txt', 'title': 'My Tab', 'author':
                      'Me', 'date': today}
 
+    @property
+    def imax(self):
+        """The current size of the tab (i.e. largest index attained so far)"""
+        return len(self._storage) - 1
+
+    @property
+    def num_rows(self):
+        """The number of rows that the tab is rendered in"""
+        return (self.imax // self._MAX) + 1
+
+    @property
+    def tab_data(self):
+        """The chords of the tab as a list of lists of str
+
+        This is a copy of the data held in the internal storage of the tab, so
+        modifying it has no effect on the tab. Assigning a list of chords
+        replaces the whole of the tab data.
+        """
+        strings = (self._storage.row(j, 0, len(self._storage)) for j in range(self.clength))
+        return [[self.allowed[code] for code in chord] for chord in zip(*strings)]
+
+    @tab_data.setter
+    def tab_data(self, data):
+        codes = self._codes
+        self._load([bytes(codes[entry] for entry in string) for string in zip(*data)])
+
+    def _load(self, strings, info=None, bars=()):
+        """Replace the whole of the tab data with the given per-string codes,
+        and update the tab information with `info`, as a single change"""
+        if not strings:
+            strings = [b'' for x in range(self.clength)]
+        storage = self._backend(self.clength)
+        storage.load(strings)
+        self._replace(storage, info, bars=bars)
+
+    def _replace(self, storage, info=None, i=None, bars=()):
+        """Hold the tab data in a new storage object, and update the tab
+        information with `info`, the current index to `i` and the bar lines
+        to `bars`, as a single change"""
+        old_info, new_info = self._update_info(info or {})
+        old_i = self.i
+        if i is not None:
+            self.i = i
+        old_bars = self._bars
+        self._bars = sorted({bar for bar in bars if 0 < bar < len(storage)})
+        old = self._storage
+        self._use(storage)
+        self._record((history.LOAD, old_i, self.i, old, storage, old_info, new_info, old_bars, self._bars))
+
+    def _record(self, delta):
+        """Add the delta of a change to the history and send its events to
+        the observers"""
+        self._history.record(delta)
+        if self._observers:
+            self._notify(delta, undo=False)
+
+    def _notify(self, delta, undo):
+        """Send the events of a change that was made, undone or redone to the
+        observers"""
+        for event in events.from_delta(delta, undo, self._storage):
+            for callback in list(self._observers):
+                callback(event)
+
+    def subscribe(self, callback):
+        """Call a function with every change event of the Tab object
+
+        The events are the tuples of `guitab.events`, and describe each
+        change as it is made, undone or redone, so that an observer can
+        follow the tab in time proportional to the size of each change rather
+        than to the length of the tab. A tab without observers does no work to
+        create events.
+
+        Parameters
+        ----------
+        callback : callable
+            The function to call with each event, which should not change the
+            tab
+
+        Returns
+        -------
+        None
+        """
+
+        if not callable(callback):
+            raise TypeError('callback argument must be callable. callback = {}'.format(callback))
+        self._observers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stop calling a function that was passed to `subscribe`"""
+        self._observers.remove(callback)
+
+    def _shift(self, index, count):
+        """Move the bar lines and bookmarks after index `index` by `count`,
+        for the insertion (count > 0) or deletion (count < 0) of chords at
+        `index`, once the storage has changed. Those in deleted chords move to
+        `index`, and bar lines that end up past the final chord are dropped
+        while bookmarks move back to it."""
+        k = bisect_right(self._bars, index)
+        moved = list(dict.fromkeys(max(index, bar + count) for bar in self._bars[k:]))
+        if moved and moved[0] == index and (index == 0 or self._bars[k - 1:k] == [index]):
+            del moved[0]
+        bars = self._bars[:k] + moved
+        length = len(self._storage)
+        self._bars = bars[:bisect_left(bars, length)]
+        last = max(0, length - 1)
+        self._bookmarks = {name: min(last, max(index, mark + count)) if mark > index else min(last, mark)
+                           for name, mark in self._bookmarks.items()}
+
+    def _block_storage(self):
+        """Move the tab data into a `LazyStorage`, which can share its blocks
+        and hold sections, if it is not held in one already"""
+        if not isinstance(self._storage, LazyStorage):
+            storage = LazyStorage.from_storage(self._storage)
+            self._history.replace_storage(self._storage, storage)
+            self._storage = storage
+            self._search = None
+        return self._storage
+
+    def _unlinked(self, index, count=0):
+        """Return the repeats of sections that inserting chords at `index`,
+        or deleting `count` chords from it, turns into copies, packed by
+        `history.pack_links`"""
+        links = self._storage.repeats(index, index + max(count, 1))
+        if count == 0:
+            # chords inserted at the start of a repeat go before it
+            links = [link for link in links if link[1] < index]
+        return history.pack_links(links)
+
+    def _relink(self, links):
+        """Make the repeats that a change turned into copies into repeats
+        again once it is undone, and return the rest of the payload"""
+        links, rest = history.unpack_links(links)
+        for name, start in links:
+            self._storage.link(name, start)
+        return rest
+
+    def _shared_storage(self):
+        """Return a copy of the tab data that the tab and the copy can change
+        independently, see `snapshot`"""
+        return self._storage.snapshot()
+
+    def _changed(self, start, end):
+        """Discard the rendering and search index of the tab data that changed
+        when the chords `start` to `end - 1` were written"""
+        if self._storage.linked(start, end):
+            # the chords are in a repeat of a section, so every repeat of it
+            # has changed
+            self._invalidate(0)
+            self._search = None
+        else:
+            self._invalidate(start, end)
+
+    def _use(self, storage):
+        """Switch to holding the tab data in `storage`"""
+        self._storage = storage
+        self._row_cache = {}
+        self._search = None
+
+    def _detach(self):
+        """Make the tab data, and any earlier tab data that is kept for undo,
+        independent of the files that it was loaded from"""
+        self._storage.detach()
+        for delta in self._history.deltas():
+            if delta[0] == history.LOAD:
+                delta[3].detach()
+                delta[4].detach()
+
+    def _resize(self, length):
+        """Grow or truncate the tab data to `length` chords"""
+        if length != len(self._storage):
+            self._invalidate(max(0, min(length, len(self._storage)) - 1))
+            self._storage.resize(length)
+
+    def _rows(self, start, end):
+        """The codes of the chords `start` to `end - 1`, one string at a
+        time"""
+        return b''.join(self._storage.row(j, start, end) for j in range(self.clength))
+
+    def _columns(self, rows, count):
+        """Split codes laid out one string at a time, as returned by `_rows`,
+        into the codes of `count` chords"""
+        return list(zip(*[rows[j * count:(j + 1) * count] for j in range(self.clength)]))
+
+    def _put(self, start, columns):
+        """Store the codes of chords from index `start`, keeping the search
+        index and the render cache up to date"""
+        if self._search is not None:
+            for index, codes in enumerate(columns, start):
+                self._search.update(index, self._storage.get(index), codes)
+        self._storage.set_many(start, columns)
+        self._changed(start, start + len(columns))
+
+    def blank_columns(self):
+        """Return the indices of all of the blank chords in the tab
+
+        Returns
+        -------
+        list of int
+            The indices of the chords that only contain '-' entries
+        """
+        return self._storage.blank_columns()
+
+    def _render(self, codes):
+        """Convert a sequence of codes for one string into its text"""
+        text = codes.translate(self._glyphs)
+        if 0 in text:
+            return ''.join([self.allowed[code] for code in codes])
+        return text.decode('ascii')
+
+    def _invalidate(self, start, end=None):
+        """Discard the cached rendering of the rows that hold the columns
+        `start` to `end - 1`, or all rows from column `start` onwards if `end`
+        is not given"""
+        first = start // self._MAX
+        if end is None:
+            for row in [row for row in self._row_cache if row >= first]:
+                del self._row_cache[row]
+        else:
+            for row in range(first, (end - 1) // self._MAX + 1):
+                self._row_cache.pop(row, None)
+
+    def _row_lines(self, row, cache=True):
+        """Return the rendered string lines of a row, using the cache if the
+        row is unchanged since it was last rendered, and adding the row to the
+        cache if `cache` is True"""
+        lines = self._row_cache.get(row)
+        if lines is None:
+            start = row * self._MAX
+            end = min(start + self._MAX, self.imax + 1)
+            lines = tuple(self._leader[j] + self._render(self._storage.row(j, start, end)) + '\n'
+                          for j in range(self.clength))
+            if cache:
+                self._row_cache[row] = lines
+        return lines
+
     def __str__(self):
         """Formatted string of the Tab object data
         """
 
-        num_loops = (self.imax // self._MAX) + 1
-        pos_loop = self.i // self._MAX
-        tab_string = ''
+        return ''.join(self.iter_lines(cache=False))
 
-        # loop through the rows of tabs that will be created by breaking them
-        # into suitable line lengths
-        for i in range(num_loops):
+    def iter_lines(self, start_row=0, end_row=None, cursor=True, cache=True):
+        """Generate the formatted lines of the tab one at a time.
 
-            start = i * self._MAX
-            if i == num_loops - 1:
-                end = self.imax + 1
-            else:
-                end = start + self._MAX
+        The tab is broken into rows of at most `self._MAX` chords. Each row is
+        rendered as one line per string, followed by a line holding the
+        position cursor (or an empty line if the cursor is not in that row).
+        Consecutive rows are separated by a blank line. Every line is built
+        with a single join over the chords of its row, so the cost of
+        rendering is linear in the length of the tab. Rendered rows are cached,
+        unless `cache` is False, until the chords in them change. The first chord of each bar is marked
+        with a '|' character on the cursor line.
 
-            for j in range(self.clength):
+        Parameters
+        ----------
+        start_row : int, optional
+            The first row of the tab to render. Default is 0.
+        end_row : int, optional
+            One past the last row of the tab to render. Default is to render
+            up to and including the final row.
+        cursor : bool, optional
+            If True (default), the current position is marked with a '*'
+            character. Otherwise the marker is replaced by a space, which is
+            the layout used in tab files.
+        cache : bool, optional
+            If True (default), the rendered rows are kept for later renders.
+            Renders of the whole tab should pass False, so that the cache only
+            holds the rows that are viewed.
+
+        Yields
+        ------
+        str
+            A single line of the formatted tab, terminated by a newline
+        """
 
-                tab_string = tab_string + self._leader[j]
-                for k in range(start, end):
-                    tab_string = tab_string + self.tab_data[k][j]
-                tab_string = tab_string + '\n'
+        num_rows = self.num_rows
+        pos_row = self.i // self._MAX
+        if end_row is None or end_row > num_rows:
+            end_row = num_rows
+        marker = '*' if cursor else ' '
+        bars = self._bars
+
+        for row in range(start_row, end_row):
+
+            yield from self._row_lines(row, cache)
+
+            start = row * self._MAX
+            marks = bars[bisect_left(bars, start):bisect_left(bars, start + self._MAX)]
+            if marks:
+                # mark the first chord of each bar, under the cursor marker
+                width = max(marks[-1], self.i if row == pos_row and cursor else 0) - start + 3
+                chars = [' '] * width
+                for bar in marks:
+                    chars[bar - start + 2] = '|'
+                if row == pos_row and cursor:
+                    chars[self.i - start + 2] = marker
+                yield ''.join(chars) + '\n'
+            elif row == pos_row:
+                yield ' ' * (self.i - start + 2) + marker + '\n'
+            else:
+                yield '\n'
 
-            if i == pos_loop:
-                pad = self.i - start + 2
-                tab_string = tab_string + ' ' * pad + '*'
+            if row != end_row - 1:
+                yield '\n'
 
-            if i == num_loops - 1:
-                tab_string = tab_string + '\n'
-            else:
-                tab_string = tab_string + '\n\n'
+    def window(self, rows=3):
+        """Find the rows of the tab that are visible around the cursor.
 
-        return tab_string
+        The window is centred on the row that the current chord position falls
+        in where possible, and is shifted at the beginning and end of the tab
+        so that it always holds `rows` rows if the tab has that many.
 
-    def print(self):
-        """Format Tab object data for limited printing.
+        Parameters
+        ----------
+        rows : int, optional
+            The number of rows in the window. Default is 3.
 
-        This routine prints the tab object with the same formatting as calling
-        `print(tab_instance)` but only three tab rows are printed: the row that
-        the current chord position falls in and the two encapsulating rows
-        (i.e. preceding and following rows).
+        Returns
+        -------
+        tuple of int
+            The first row of the window and one past its final row
         """
 
-        num_loops = (self.imax // self._MAX)
-        pos_loop = self.i // self._MAX
-        tab_string = ''
+        num_rows = self.num_rows
+        start = (self.i // self._MAX) - (rows - 1) // 2
+        start = max(0, min(start, num_rows - rows))
+        return start, min(num_rows, start + rows)
 
-        start_out = pos_loop - 1
-        end_out = pos_loop + 2
+    def view(self, rows=3):
+        """Formatted string of the rows of the tab visible around the cursor.
 
-        # TODO amend this so that it always prints 3 rows if they are
-        # available
-        if pos_loop == 0:
-            start_out = 0
-        if pos_loop == num_loops:
-            end_out = num_loops + 1
+        Only the rows in the window are rendered, so the cost does not depend
+        on the total length of the tab.
 
-        # loop through the rows of tabs that will be created by breaking them
-        # into suitable line lengths
-        for i in range(start_out, end_out):
+        Parameters
+        ----------
+        rows : int, optional
+            The number of rows in the window. Default is 3.
 
-            start = i * self._MAX
-            if i == num_loops:
-                end = self.imax + 1
-            else:
-                end = start + self._MAX
+        Returns
+        -------
+        str
+            The rows of the window, formatted as for `str(tab_instance)`
+        """
 
-            for j in range(self.clength):
+        return ''.join(self.iter_lines(*self.window(rows)))
 
-                tab_string = tab_string + self._leader[j]
-                for k in range(start, end):
-                    tab_string = tab_string + self.tab_data[k][j]
-                tab_string = tab_string + '\n'
+    def print(self, rows=3):
+        """Format Tab object data for limited printing.
 
-            if i == pos_loop:
-                pad = self.i - start + 2
-                tab_string = tab_string + ' ' * pad + '*'
+        This routine prints the tab object with the same formatting as calling
+        `print(tab_instance)` but only three tab rows are printed: the row that
+        the current chord position falls in and the two encapsulating rows
+        (i.e. preceding and following rows). At the beginning and end of the
+        tab, the three rows nearest the current position are printed instead.
 
-            if i == end_out - 1:
-                tab_string = tab_string + '\n'
-            else:
-                tab_string = tab_string + '\n\n'
+        Parameters
+        ----------
+        rows : int, optional
+            The number of rows to print. Default is 3.
+        """
 
-        print(tab_string)
+        print(self.view(rows))
 
     def write(self, chord, index=None):
         """Writes the input chord to an index of the Tab object
 
+        Each distinct chord shape is only checked the first time it is
+        written; its codes are then looked up from the interned chord.
+
         Parameters
         ----------
-        chord : list of str
+        chord : list of str or Chord
             A list of single string characters of length self.clength that
             represents the chord
         index : int, optional
@@ -174,12 +514,8 @@ class Tab(object):
         """
         # TODO I need to handle double digit fret numbers!!!
 
-        # Check that the chord has the correct format
-        if len(chord) != self.clength:
-            raise TypeError(f"Invalid number of finger positions provided: {len(chord)}. Expected {self.clength}.")
-        for i in chord:
-            if i not in self.allowed:
-                raise TypeError(f"Invalid finger position provided: {i}")
+        codes = self._encode(chord)
+        length = len(self._storage)
 
         # If the index is unset, then use the default value of the current
         # self.i index
@@ -190,11 +526,545 @@ class Tab(object):
         # TODO need to check that the index is positive and an integer!!!
         else:
             if index > self.imax:
-                self.tab_data += [self._blank for x in range(index - self.imax)]
-                self.imax = index
+                # the final row grows, and new rows may be added after it
+                self._invalidate(self.imax)
+                self._storage.resize(index + 1)
+            elif index < 0:
+                index += len(self._storage)
+
+        # Add the chord to the tab data
+        old = self._storage.get(index)
+        if self._search is not None:
+            self._search.update(index, old, codes)
+        self._storage.set(index, codes)
+        self._changed(index, index + 1)
+        self._record(history.pack(history.WRITE, self.i, self.i, length,
+                                  len(self._storage), index, 1, bytes(old) + bytes(codes)))
+
+    def write_many(self, chords, start=None, advance=True):
+        """Writes a sequence of chords to consecutive indices of the Tab object
+
+        This is equivalent to writing each chord in turn and moving forward
+        after each one, but the chords are all checked before anything is
+        written, the tab is grown at most once and the chords are stored in a
+        single bulk operation. The problems with every invalid chord are
+        reported together in a single TypeError.
+
+        Parameters
+        ----------
+        chords : sequence of list of str
+            The chords to write, each in the format accepted by `write`
+        start : int, optional
+            The index where the first chord will be written. Default is the
+            current index, self.i
+        advance : bool, optional
+            If True (default), the current index is moved to the index after
+            the last chord written, expanding the tab if necessary.
+
+        Returns
+        -------
+        None
+        """
+
+        columns = self._encode_many(chords)
+        if start is None:
+            start = self.i
+        elif start < 0:
+            raise IndexError('Requested start index is out of range: {}'.format(start))
+
+        end = start + len(columns)
+        size = end + 1 if advance else end
+        length = len(self._storage)
+        if size > length:
+            self._invalidate(self.imax)
+            self._storage.resize(size)
+
+        old = self._rows(start, end)
+        self._put(start, columns)
+        new = b''.join(bytes(string) for string in zip(*columns))
+        i = self.i
+        if advance:
+            self.i = end
+        self._record(history.pack(history.WRITE, i, self.i, length, len(self._storage),
+                                  start, len(columns), old + new))
+
+    def _check(self, chord):
+        """Translate a chord to codes with the lookup table, returning the
+        codes and a description of every problem with the chord (or None)"""
+
+        if len(chord) != self.clength:
+            return None, (f"Invalid number of finger positions provided: {len(chord)}. "
+                          f"Expected {self.clength}.")
+        codes = tuple(map(self._codes.get, chord))
+        if None in codes:
+            invalid = ', '.join(f"{entry} (string {j})"
+                                for j, (entry, code) in enumerate(zip(chord, codes), 1) if code is None)
+            return None, f"Invalid finger position provided: {invalid}"
+        return codes, None
+
+    def _encode(self, chord):
+        """Check a chord and return its codes, interning the chord the first
+        time that its shape is seen"""
+
+        codes = self._chord_codes.get(tuple(chord))
+        if codes is None:
+            codes, error = self._check(chord)
+            if error is not None:
+                raise TypeError(error)
+            chord = Chord(chord)
+            self._chord_codes[chord] = codes
+            self._code_chords[codes] = chord
+        return codes
+
+    def _encode_many(self, chords):
+        """Check a sequence of chords and return their codes, reporting the
+        problems with all of the chords at once"""
+
+        columns = []
+        errors = []
+        for n, chord in enumerate(chords, 1):
+            try:
+                columns.append(self._encode(chord))
+            except TypeError as e:
+                errors.append(f"Chord {n}: {e}")
+        if errors:
+            raise TypeError('\n'.join(errors))
+        return columns
+
+    def insert_columns(self, chords=1, index=None):
+        """Insert chords into the Tab object, moving later chords forward
+
+        Parameters
+        ----------
+        chords : int or sequence of list of str, optional
+            The chords to insert, each in the format accepted by `write`, or
+            the number of blank chords to insert. Default is 1 blank chord.
+        index : int, optional
+            The index that the first inserted chord will have. Default is the
+            current index, self.i. The current index is unchanged by an
+            insertion at it, so it then points at the first inserted chord.
+
+        Returns
+        -------
+        None
+        """
+
+        if type(chords) == int:
+            if chords < 0:
+                raise TypeError('chords argument must be an integer >= 0 or a sequence of chords. '
+                                'chords = {}'.format(chords))
+            columns = [(0,) * self.clength] * chords
+        else:
+            columns = self._encode_many(chords)
+        if index is None:
+            index = self.i
+        if not 0 <= index <= self.imax + 1:
+            raise IndexError('Requested insertion is out of range. Index = {}, and imax = {:d}'.format(
+                index, self.imax))
+
+        length = len(self._storage)
+        i = self.i
+        links = self._unlinked(index)
+        self._invalidate(index)
+        self._storage.insert(index, columns)
+        self._search = None
+        self._shift(index, len(columns))
+        if index < self.i:
+            self.i += len(columns)
+        self._record(history.pack(history.INSERT, i, self.i, length, len(self._storage), index,
+                                  len(columns), b''.join(bytes(string) for string in zip(*columns)) + links))
+
+    def delete_columns(self, num=1, index=None):
+        """Delete chords from the Tab object, moving later chords back
+
+        The tab always keeps at least one (blank) chord.
+
+        Parameters
+        ----------
+        num : int, optional
+            The number of chords to delete. Must be an integer > 0. Default is
+            1.
+        index : int, optional
+            The index of the first chord to delete. Default is the current
+            index, self.i.
+
+        Returns
+        -------
+        None
+        """
+
+        if num < 0 or type(num) != int:
+            raise TypeError('num argument must be an integer and > 0. num = '
+                            '{}'.format(num))
+        if index is None:
+            index = self.i
+        if index < 0 or index + num > self.imax + 1:
+            raise IndexError('Requested deletion is out of range. Index = {}, num = {:d}, and imax = '
+                             '{:d}'.format(index, num, self.imax))
+
+        length = len(self._storage)
+        i = self.i
+        old = self._rows(index, index + num)
+        bars = self._bars[bisect_left(self._bars, index):bisect_right(self._bars, index + num)]
+        links = self._unlinked(index, num)
+        self._invalidate(index)
+        self._storage.delete(index, num)
+        self._search = None
+        self._shift(index, -num)
+        if len(self._storage) == 0:
+            self._storage.resize(1)
+
+        # keep the current position on the same chord if it was after the
+        # deleted chords, otherwise move it to the first chord after them
+        if self.i >= index + num:
+            self.i -= num
+        elif self.i > index:
+            self.i = index
+        self.i = min(self.i, self.imax)
+        self._record(history.pack(history.DELETE, i, self.i, length, len(self._storage), index,
+                                  num, old + links + history.pack_bars(bars)))
+
+    def transpose(self, semitones, start=None, end=None, fold=False):
+        """Shift every fret number in a range of the Tab object
+
+        The shift is made by translating the stored codes through a single
+        lookup table, so it runs over the whole range at once rather than
+        chord by chord. Entries that are not fret numbers ('-', 'h', 'p' and
+        'x') are unchanged.
+
+        Parameters
+        ----------
+        semitones : int
+            The number of frets (semitones) to move each note by; negative
+            values move notes down
+        start : int, optional
+            The index of the first chord to transpose. Default is 0.
+        end : int, optional
+            One past the index of the final chord to transpose. Default is the
+            end of the tab.
+        fold : bool, optional
+            If True, notes that would fall outside of the allowed fret range
+            are moved by whole octaves (12 frets) until they are inside it. If
+            False (default), such notes are an error and the tab is left
+            unchanged.
+
+        Returns
+        -------
+        None
+        """
+
+        if type(semitones) != int:
+            raise TypeError('semitones argument must be an integer. semitones = {}'.format(semitones))
+        if start is None:
+            start = 0
+        if end is None:
+            end = self.imax + 1
+        if not 0 <= start <= end <= self.imax + 1:
+            raise IndexError('Requested transposition range is out of range. start = {}, end = {}, and '
+                             'imax = {:d}'.format(start, end, self.imax))
+
+        # build the translation table for the codes of the fret numbers,
+        # marking notes that cannot be moved with 255
+        first = self._codes['0']
+        frets = len(self.allowed) - first - 1
+        table = bytearray(range(256))
+        for fret in range(frets + 1):
+            shifted = fret + semitones
+            if fold and frets >= 11:
+                while shifted < 0:
+                    shifted += 12
+                while shifted > frets:
+                    shifted -= 12
+            table[first + fret] = first + shifted if 0 <= shifted <= frets else 255
+
+        # find any notes that would fall outside of the fret range
+        bad = bytes(code for code in range(first, first + frets + 1) if table[code] == 255)
+        if bad:
+            pattern = re.compile(b'[' + re.escape(bad) + b']')
+            columns = sorted({start + match.start() for j in range(self.clength)
+                              for match in pattern.finditer(self._storage.row(j, start, end))})
+            if columns:
+                raise IndexError('Transposing by {:d} moves notes outside of the fret range 0-{:d} at '
+                                 'indices: {}'.format(semitones, frets, ', '.join(map(str, columns))))
+
+        # the change can be undone with the inverse of the table, unless two
+        # notes were moved to the same fret
+        moved = [code for code in table[first:first + frets + 1] if code != 255]
+        if len(set(moved)) == len(moved):
+            inverse = bytearray(range(256))
+            for code in range(first, first + frets + 1):
+                if table[code] != 255:
+                    inverse[table[code]] = code
+            kind, undo = history.REMAP, bytes(inverse)
+        else:
+            kind, undo = history.REMAP_ROWS, self._rows(start, end)
+
+        self._storage.remap(bytes(table), start, end)
+        self._search = None
+        self._changed(start, end)
+        self._record(history.pack(kind, self.i, self.i, len(self._storage), len(self._storage),
+                                  start, end - start, bytes(table) + undo))
+
+    @property
+    def sections(self):
+        """The number of chords in each named section of the tab, by name"""
+        return self._storage.section_sizes()
+
+    def define_section(self, name, start, end):
+        """Make a range of the Tab object into a named section that can be
+        repeated with `repeat_section`
+
+        The chords in the range become the first repeat of the section. Every
+        repeat refers to the same chords, so writing or transposing a chord in
+        any repeat changes all of them, while inserting or deleting chords
+        inside a repeat turns that repeat into an ordinary copy of the
+        section. The tab data is moved into blocks first if necessary, as for
+        `snapshot`.
+
+        Parameters
+        ----------
+        name : str
+            The name of the section, which must not already be in use
+        start : int
+            The index of the first chord of the section
+        end : int
+            One past the index of the final chord of the section
+
+        Returns
+        -------
+        None
+        """
+
+        if type(name) != str or name == '':
+            raise TypeError('name argument must be a non-empty str. name = {}'.format(name))
+        self._block_storage().define_section(name, start, end)
+        self._record(history.pack(history.SECTION, self.i, self.i, len(self._storage),
+                                  len(self._storage), start, end - start, name.encode('utf-8')))
+
+    def repeat_section(self, name, index=None):
+        """Insert a repeat of a named section into the Tab object, moving
+        later chords forward
+
+        Parameters
+        ----------
+        name : str
+            The name of a section defined with `define_section`
+        index : int, optional
+            The index that the first chord of the repeat will have. Default is
+            the current index, self.i, which is unchanged by the insertion.
+
+        Returns
+        -------
+        None
+        """
+
+        if name not in self.sections:
+            raise TypeError('No section is defined with the name: {}'.format(name))
+        if index is None:
+            index = self.i
+        if not 0 <= index <= self.imax + 1:
+            raise IndexError('Requested insertion is out of range. Index = {}, and imax = {:d}'.format(
+                index, self.imax))
+
+        length = len(self._storage)
+        i = self.i
+        links = self._unlinked(index)
+        self._invalidate(index)
+        count = self._storage.repeat(name, index)
+        self._search = None
+        self._shift(index, count)
+        if index < self.i:
+            self.i += count
+        self._record(history.pack(history.REPEAT, i, self.i, length, len(self._storage), index,
+                                  count, links + name.encode('utf-8')))
+
+    @property
+    def bars(self):
+        """The index of the first chord after each bar line of the tab, in
+        increasing order. The first bar starts at index 0 and has no bar line
+        before it."""
+        return list(self._bars)
+
+    def _bar_index(self, index):
+        """Check the index of a bar line, defaulting to the current index"""
+        if index is None:
+            index = self.i
+        if type(index) != int:
+            raise TypeError('index argument must be an integer. index = {}'.format(index))
+        if not 0 < index <= self.imax:
+            raise IndexError('A bar line must be between two chords of the tab. Index = {}, and imax = {:d}'
+                             .format(index, self.imax))
+        return index
+
+    def add_bar(self, index=None):
+        """Add a bar line before a chord of the Tab object
+
+        Bar lines move with the chords after them when chords are inserted or
+        deleted.
+
+        Parameters
+        ----------
+        index : int, optional
+            The index of the first chord of the new bar. Default is the
+            current index, self.i.
+
+        Returns
+        -------
+        None
+        """
+
+        index = self._bar_index(index)
+        k = bisect_left(self._bars, index)
+        if self._bars[k:k + 1] == [index]:
+            return
+        self._bars = self._bars[:k] + [index] + self._bars[k:]
+        self._record(history.pack(history.BAR, self.i, self.i, len(self._storage), len(self._storage),
+                                  index, 1))
 
-        # Add the chord to the tab data and print what we have
-        self.tab_data[index] = chord
+    def remove_bar(self, index=None):
+        """Remove the bar line before a chord of the Tab object
+
+        Parameters
+        ----------
+        index : int, optional
+            The index of the chord after the bar line. Default is the current
+            index, self.i.
+
+        Returns
+        -------
+        None
+        """
+
+        index = self._bar_index(index)
+        k = bisect_left(self._bars, index)
+        if self._bars[k:k + 1] != [index]:
+            raise IndexError('There is no bar line before index {:d}'.format(index))
+        self._bars = self._bars[:k] + self._bars[k + 1:]
+        self._record(history.pack(history.BAR, self.i, self.i, len(self._storage), len(self._storage),
+                                  index, 0))
+
+    def bar_index(self, bar):
+        """Return the index of the first chord of a bar
+
+        Parameters
+        ----------
+        bar : int
+            The number of the bar, counting from 1
+
+        Returns
+        -------
+        int
+            The index of the first chord of the bar
+        """
+
+        if type(bar) != int:
+            raise TypeError('bar argument must be an integer. bar = {}'.format(bar))
+        if not 1 <= bar <= len(self._bars) + 1:
+            raise IndexError('Requested bar is out of range. Bar = {:d}, and the tab has {:d} bars'.format(
+                bar, len(self._bars) + 1))
+        return self._bars[bar - 2] if bar > 1 else 0
+
+    def bar_number(self, index=None):
+        """Return the number of the bar that holds a chord, counting from 1
+
+        Parameters
+        ----------
+        index : int, optional
+            The index of the chord. Default is the current index, self.i.
+
+        Returns
+        -------
+        int
+            The number of the bar
+        """
+
+        if index is None:
+            index = self.i
+        return bisect_right(self._bars, index) + 1
+
+    @property
+    def bookmarks(self):
+        """The index of each named bookmark of the tab, by name"""
+        return dict(self._bookmarks)
+
+    def bookmark(self, name, index=None):
+        """Name a chord of the Tab object, to return to it with `goto`
+
+        Bookmarks move with their chords when chords are inserted or deleted
+        before them. A bookmark that already has the name is replaced.
+
+        Parameters
+        ----------
+        name : str
+            The name of the bookmark
+        index : int, optional
+            The index of the chord. Default is the current index, self.i.
+
+        Returns
+        -------
+        None
+        """
+
+        if type(name) != str or name == '':
+            raise TypeError('name argument must be a non-empty str. name = {}'.format(name))
+        if index is None:
+            index = self.i
+        if not 0 <= index <= self.imax:
+            raise IndexError('Requested bookmark is out of range. Index = {}, and imax = {:d}'.format(
+                index, self.imax))
+        bookmarks = dict(self._bookmarks)
+        bookmarks[name] = index
+        self._bookmarks = bookmarks
+
+    def find(self, pattern, start=0):
+        """Find the next occurrence of a sequence of chords in the Tab object
+
+        Parameters
+        ----------
+        pattern : sequence of list of str
+            The chords to search for, each in the format accepted by `write`.
+            A '-' entry is a wildcard that matches any entry on its string.
+        start : int, optional
+            The first index at which a match may begin. Default is 0.
+
+        Returns
+        -------
+        int or None
+            The index of the first chord of the first match at or after
+            `start`, or None if there is no such match
+        """
+
+        codes = self._encode_many(pattern)
+        if not codes:
+            raise TypeError('The pattern to find must contain at least one chord')
+        if self._search is None:
+            self._search = ChordIndex(self._storage)
+        pattern = [[None if code == BLANK else code for code in chord] for chord in codes]
+        return self._search.find(pattern, start)
+
+    def read(self, index=None):
+        """Read the chord at an index of the Tab object
+
+        Parameters
+        ----------
+        index : int, optional
+            The index of the chord to read. Default is the current index,
+            self.i
+
+        Returns
+        -------
+        Chord
+            The interned chord at the index
+        """
+
+        if index is None:
+            index = self.i
+        codes = self._storage.get(index)
+        chord = self._code_chords.get(codes)
+        if chord is None:
+            chord = Chord(self.allowed[code] for code in codes)
+            self._code_chords[codes] = chord
+        return chord
 
     def backward(self, num=1):
         """Place the chord position back `num` places from where it currently
@@ -222,6 +1092,8 @@ class Tab(object):
 
         else:
             self.i -= num
+            self._record(history.pack(history.MOVE, self.i + num, self.i, len(self._storage),
+                                      len(self._storage)))
 
     def forward(self, num=1):
         """Place the chord position forward `num` places from where it
@@ -249,9 +1121,39 @@ class Tab(object):
 
         # Check if the new index is greater than the previous maximum. If so,
         # the tab needs to be expanded
+        length = len(self._storage)
         if self.i > self.imax:
-            self.tab_data += [self._blank for x in range(self.i - self.imax)]
-            self.imax = self.i
+            self._invalidate(self.imax)
+            self._storage.resize(self.i + 1)
+        self._record(history.pack(history.MOVE, self.i - num, self.i, length, len(self._storage)))
+
+    def goto(self, index):
+        """Place the chord position at an index of the tab, expanding the tab
+        as `forward` does if the index is past the end of it.
+
+        Parameters
+        ----------
+        index : int
+            The new index. Use `bar_index` or `bookmarks` to find the index of
+            a bar or a bookmark.
+
+        Returns
+        -------
+        None
+        """
+
+        if type(index) != int:
+            raise TypeError('index argument must be an integer. index = {}'.format(index))
+        if index < 0:
+            raise IndexError('Requested move is out of range. Index = {:d}'.format(index))
+
+        i = self.i
+        length = len(self._storage)
+        self.i = index
+        if self.i > self.imax:
+            self._invalidate(self.imax)
+            self._storage.resize(self.i + 1)
+        self._record(history.pack(history.MOVE, i, self.i, length, len(self._storage)))
 
     # TODO check that this functions properly
     def set_info(self, **kwargs):
@@ -271,7 +1173,17 @@ class Tab(object):
 
         """
 
-        for i in kwargs:
+        old, new = self._update_info(kwargs)
+        if new:
+            self._record((history.INFO, old, new))
+
+    def _update_info(self, info):
+        """Set the fields of the tab information, see `set_info`, and return
+        the old and new values of the fields that changed"""
+
+        old = {}
+        new = {}
+        for i in info:
 
             if not self.info.__contains__(i):
                 message = 'The field requested, "{}", is not valid for tab '\
@@ -279,16 +1191,171 @@ class Tab(object):
                 warnings.warn(message)
                 continue
             else:
-                if type(kwargs[i]) is not str:
+                if type(info[i]) is not str:
                     message = 'The input for field, "{}", is not of type '\
                             'str. All tab information must be str.'.format(i)
                     warnings.warn(message)
-                else:
-                    self.info[i] = kwargs[i]
+                elif info[i] != self.info[i]:
+                    old[i] = self.info[i]
+                    new[i] = self.info[i] = info[i]
+        return old, new
+
+    def undo(self):
+        """Undo the most recent change to the Tab object that has not been
+        undone
+
+        Writes, insertions, deletions, transpositions, moves of the current
+        position, changes to the tab information and loading tab data from a
+        file can all be undone, up to the history size of the tab.
+        """
+
+        delta = self._history.undo()
+        self._apply(delta, undo=True)
+        if self._observers:
+            self._notify(delta, undo=True)
+
+    def redo(self):
+        """Redo the most recent change to the Tab object that was undone,
+        provided that nothing else has changed since"""
+
+        delta = self._history.redo()
+        self._apply(delta, undo=False)
+        if self._observers:
+            self._notify(delta, undo=False)
+
+    def snapshot(self):
+        """Take a snapshot of the Tab object
+
+        The snapshot is a new Tab object with the same tab data, information
+        and current position, which can then be changed independently of the
+        original. The snapshot starts with an empty undo history and no
+        observers.
+
+        How much the snapshot costs depends on the storage backend. Tab data
+        held in blocks, as it is once a tab has been loaded lazily or has
+        sections, is shared copy-on-write block by block, so only the blocks
+        that are changed afterwards take up extra memory. The first snapshot
+        of a lazily loaded tab finishes reading it. The 'sparse' backend
+        shares its chords until either tab is changed, which then copies them
+        all. The 'array' and 'numpy' backends keep the tab in the layout they
+        are fastest with, at the price of copying its data into blocks for
+        every snapshot; snapshots of that snapshot are then shared.
+
+        Returns
+        -------
+        Tab
+            The snapshot
+        """
+
+        snapshot = copy.copy(self)
+        snapshot._storage = self._shared_storage()
+        snapshot.info = dict(self.info)
+        snapshot._row_cache = {}
+        snapshot._search = None
+        snapshot._history = history.History(self._history.size)
+        snapshot._observers = []
+        return snapshot
+
+    def restore(self, snapshot):
+        """Replace the tab data, information and current position of the Tab
+        object with those of a snapshot
+
+        The snapshot itself is unchanged by later edits of the tab. The
+        restore is a single change that can be undone.
+
+        Parameters
+        ----------
+        snapshot : Tab
+            A snapshot taken with `snapshot`, or any other Tab object with the
+            same number of strings and allowed entries
+        """
+
+        if snapshot.clength != self.clength or snapshot.allowed != self.allowed:
+            raise TypeError('The snapshot has a different number of strings or allowed entries')
+        self._replace(snapshot._shared_storage(), snapshot.info, snapshot.i, snapshot._bars)
+
+    def _apply(self, delta, undo):
+        """Undo or redo the change recorded in a delta of the history"""
+
+        kind = delta[0]
+        if kind == history.INFO:
+            kind, old, new = delta
+            self.info.update(old if undo else new)
+            return
+        if kind == history.LOAD:
+            kind, old_i, new_i, old, new, old_info, new_info, old_bars, new_bars = delta
+            self._use(old if undo else new)
+            self.info.update(old_info if undo else new_info)
+            self.i = old_i if undo else new_i
+            self._bars = old_bars if undo else new_bars
+            return
+
+        kind, old_i, new_i, old_length, new_length, index, count, payload = history.unpack(delta)
+        size = count * self.clength
+        if kind == history.WRITE:
+            if undo:
+                self._put(index, self._columns(payload[:size], count))
+                self._resize(old_length)
+            else:
+                self._resize(new_length)
+                self._put(index, self._columns(payload[size:], count))
+        elif kind in (history.INSERT, history.DELETE):
+            self._invalidate(index)
+            self._search = None
+            if (kind == history.INSERT) != undo:
+                if kind == history.DELETE:
+                    self._bars = [bar for bar in self._bars if bar != index]
+                self._storage.insert(index, self._columns(payload[:size], count))
+                self._shift(index, count)
+                if kind == history.DELETE:
+                    # put back the repeats and bar lines that were in the
+                    # deleted chords
+                    bars = self._relink(payload[size:])
+                    self._bars = sorted(self._bars + history.unpack_bars(bars))
+            else:
+                self._storage.delete(index, count)
+                self._shift(index, -count)
+                if kind == history.INSERT:
+                    self._relink(payload[size:])
+            self._resize(old_length if undo else new_length)
+        elif kind in (history.REMAP, history.REMAP_ROWS):
+            self._search = None
+            if not undo:
+                self._storage.remap(bytes(payload[:256]), index, index + count)
+            elif kind == history.REMAP:
+                self._storage.remap(bytes(payload[256:]), index, index + count)
+            else:
+                self._storage.set_many(index, self._columns(payload[256:], count))
+            self._changed(index, index + count)
+        elif kind == history.SECTION:
+            name = bytes(payload).decode('utf-8')
+            if undo:
+                self._storage.remove_section(name)
+            else:
+                self._block_storage().define_section(name, index, index + count)
+        elif kind == history.REPEAT:
+            self._invalidate(index)
+            self._search = None
+            if undo:
+                self._storage.delete(index, count)
+                self._shift(index, -count)
+                self._relink(payload)
+            else:
+                name = history.unpack_links(payload)[1]
+                self._block_storage().repeat(bytes(name).decode('utf-8'), index)
+                self._shift(index, count)
+        elif kind == history.BAR:
+            if (count == 1) != undo:
+                self._bars = sorted(self._bars + [index])
+            else:
+                self._bars = [bar for bar in self._bars if bar != index]
+        else:
+            self._resize(old_length if undo else new_length)
+        self.i = old_i if undo else new_i
 
     # TODO object IO should be handled in a separate module
     # TODO this should probably raise an exception if the file doesn't exist!
-    def get_tab(self, filename, overwrite_info=True, overwrite_data=True):
+    def get_tab(self, filename, overwrite_info=True, overwrite_data=True, trusted=False, lazy=False):
         """Open a guitab text file and extract the tab data from it.
 
         Parameters
@@ -304,17 +1371,27 @@ class Tab(object):
             If there is tab data held by the tab object instance, then this
             boolean flag determines if that data is overwritten by the data in
             the file.
+        trusted: bool, optional
+            If True, the file is assumed to be well formed and the checks on
+            the layout of each row block of the tab are skipped, which speeds
+            up the loading of large files. Entries that are not allowed are
+            still rejected. Default is False.
+        lazy: bool, optional
+            If True, the file is memory-mapped and only an index of its row
+            blocks is built, checking their layout. Each row block is decoded,
+            and its entries checked, the first time a chord in it is accessed,
+            so an entry that is not allowed only raises RuntimeError then. The
+            tab data is held in a `LazyStorage` in place of the storage backend
+            of the tab. Default is False.
 
         Returns
         -------
-        data : list of list of str
-            The tab data read from filename in a two-dimensional list object
-            that is the internal storage format of the Tab object
+        data : sequence of Chord or None
+            The tab data read from filename as a sequence of interned chords,
+            which are built as they are accessed. None if the file is loaded
+            lazily.
         """
 
-        error1 = 'Tab file incorrectly formatted: {}'
-        error2 = 'Tab file incorrectly formatted or has mismatched tuning: {}'
-
         if type(overwrite_info) != bool:
             raise TypeError("overwrite_info argument in get_tab must be of "
                             "type bool. Type given: {}".format(overwrite_info.__class__))
@@ -323,97 +1400,90 @@ class Tab(object):
                             "type bool. Type given: "
                             "{}".format(overwrite_data.__class__))
 
-        with open(filename, 'r') as tabfile:
-
-            if tabfile.readline() != (80 * '=' + '\n'):
-                raise RuntimeError(error1.format(filename))
-
-            # Get the tab information stored in this file
-            info = {}
-            for i in info_order:
-                match = info_tests[i].search(tabfile.readline())
-                if match:
-                    info[i] = match.group(1)
-                else:
-                    raise RuntimeError(error1.format(filename))
-
-            # Save the tab information in the tab instance if requested
-            if overwrite_info:
-                info['filename'] = filename
+        if lazy:
+            mapped = tabio.MappedText(filename, self._leader[:self.clength], self._text_codes)
+            info = dict(mapped.info, filename=filename) if overwrite_info else {}
+            if overwrite_data:
+                self._replace(LazyStorage(self.clength, mapped.sizes, mapped), info, bars=mapped.bars)
+            else:
+                mapped.close()
                 self.set_info(**info)
+            return None
 
-            # Discard anything until the end of the header (allows for user
-            # notes)
-            while(True):
-                line = tabfile.readline()
-                if line == (80 * '=' + '\n'):
-                    break
-                elif line == '':
-                    raise EOFError('EOF reached before finished reading header.')
-
-            # Collect the tab data contained in the file
-            data = []
-            imax = 0
-            while(True):
-
-                line = tabfile.readline()
+        info, strings, bars = tabio.read_text(filename, self._leader[:self.clength], trusted=trusted, bars=True)
 
-                if line == '\n':
-                    continue
+        # Translate each string of the tab to codes in a single pass
+        try:
+            codes = [string.encode('ascii').translate(self._text_codes) for string in strings]
+        except UnicodeEncodeError:
+            codes = [b'\xff']
+        if any(b'\xff' in string for string in codes):
+            raise RuntimeError(tabio.error1.format(filename))
 
-                elif line[0:2] == self._leader[0]:
-                    rows = []
-                    rows.append(line)
-                    for i in range(1, self.clength):
-                        line = tabfile.readline()
-                        if line[0:2] == self._leader[i]:
-                            rows.append(line)
-                        else:
-                            raise RuntimeError(error2.format(filename))
-                    imax += len(rows[0]) - 3
-                    for i in range(2, len(rows[0])-1):
-                        chord = []
-                        for j in range(self.clength):
-                            chord.append(rows[j][i])
-                        data.append(chord)
-
-                elif line == '':
-                    break
+        # Save the tab information in the tab instance if requested
+        if overwrite_info:
+            info['filename'] = filename
+        else:
+            info = {}
 
-            if overwrite_data:
-                self.tab_data = data
-                self.imax = imax - 1
+        if overwrite_data:
+            self._load(codes, info, bars)
+        else:
+            self.set_info(**info)
 
-            return data
+        return tabio.Columns(strings)
 
     # TODO think about encoding here? Current is 'us-ascii'
-    def save_tab(self, filename=None, **kwargs):
+    def save_tab(self, filename=None, overwrite=False, **kwargs):
         """Write the current tab data to a text file.
 
+        Text files hold one character per entry, so a tab with entries wider
+        than that, such as fret numbers above 9, raises a RuntimeError before
+        anything is written. Such tabs can be saved with `save_binary`.
 
         Parameters
         ----------
         filename : str, optional
             The name of the file to write to. If not provided, the filename
             currently in the Tab object info is used.
+        overwrite : bool, optional
+            If True, an existing file is overwritten without asking. Default
+            is False, which asks on the terminal first.
         **kwargs : dict, optional
             title : the title of the tab (str)
             author : the author of the tab (str)
             date  : the date the tab was written (str)
         """
 
-        # set the relevant tab info that has been passed to this function
-        if filename is None:
-            self.set_info(**kwargs)
-        else:
-            self.set_info(filename=filename, **kwargs)
+        # the text format has one character per entry, so a tab holding wider
+        # entries, such as two digit fret numbers, cannot be saved in it
+        for j in range(self.clength):
+            text = self._storage.row(j, 0, len(self._storage)).translate(self._glyphs)
+            if 0 in text:
+                index = text.index(0)
+                raise RuntimeError("Tab text files only hold entries of one character, so this tab can only be "
+                                   "saved as a binary tab file. Found: {} (chord {:d}, string {:d})".format(
+                                       self.allowed[self._storage.get(index)[j]], index, j + 1))
+
+        # set the relevant tab info that has been passed to this function.
+        # Saving is not a change that can be undone
+        if filename is not None:
+            kwargs['filename'] = filename
+        old, new = self._update_info(kwargs)
+        if new and self._observers:
+            # saving is not undoable, but observers still see the change
+            self._notify((history.INFO, old, new), undo=False)
+
+        # make sure the tab data no longer depends on the file it may have
+        # been loaded from, which could be the file that is overwritten here
+        self._detach()
 
         # check if the file already exists and give options
         # TODO move this to main CLI program, see NOTE for 2019-04-09
         tabfilename = self.info['filename']
         while(True):
             try:
-                tabfile = open(tabfilename, 'x')
+                tabfile = open(tabfilename, 'w' if overwrite else 'x')
             except FileExistsError:
                 message = "File already exists: '{}'\nOverwrite? [Y/n] ".format(tabfilename)
                 inp = input(message)
@@ -437,13 +1507,90 @@ class Tab(object):
             'Title : {title}\n' + \
             'Author: {author}\n' + \
             'Date  : {date}\n' + \
-            80 * '=' + '\n\n' + \
-            '{tabdata}'
-
-        # remove the current position character from the output of str(self)
-        tabdata = rm_position.sub(r'\1 \2', str(self))
+            80 * '=' + '\n\n'
 
-        # finally, write all relevant information to the file
-        tabfile.write(fileformat.format(tabdata=tabdata, **self.info))
+        # finally, write all relevant information to the file, streaming the
+        # tab data line by line with the position cursor blanked out
+        tabfile.write(fileformat.format(**self.info))
+        tabfile.writelines(self.iter_lines(cursor=False, cache=False))
 
         tabfile.close()
+
+    def save_binary(self, filename=None, compress=True, **kwargs):
+        """Write the current tab data to a binary tab file.
+
+        The binary format (see `guitab.tabio`) holds the same tab data and
+        information as a text file, but is smaller and much faster to read
+        and write. Unlike `save_tab`, an existing file is overwritten without
+        asking.
+
+        Parameters
+        ----------
+        filename : str, optional
+            The name of the file to write to. If not provided, the filename
+            currently in the Tab object info is used.
+        compress : bool, optional
+            If True (default), the tab data is compressed.
+        **kwargs : dict, optional
+            title : the title of the tab (str)
+            author : the author of the tab (str)
+            date  : the date the tab was written (str)
+        """
+
+        if filename is not None:
+            kwargs['filename'] = filename
+        old, new = self._update_info(kwargs)
+        if new and self._observers:
+            # saving is not undoable, but observers still see the change
+            self._notify((history.INFO, old, new), undo=False)
+
+        self._detach()
+        info = {key: value for key, value in self.info.items() if key != 'filename'}
+        if self.sections:
+            # the sections are saved once, rather than once per repeat
+            strings, sections, layout = self._storage.layout()
+            tabio.write_binary(self.info['filename'], info, self.allowed, strings, compress=compress,
+                               sections=sections, layout=layout, bars=self._bars)
+        else:
+            strings = [self._storage.row(j, 0, len(self._storage)) for j in range(self.clength)]
+            tabio.write_binary(self.info['filename'], info, self.allowed, strings, compress=compress,
+                               bars=self._bars)
+
+    def load_binary(self, filename, overwrite_info=True, overwrite_data=True):
+        """Open a binary tab file and extract the tab data from it.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file to read from
+        overwrite_info: bool, optional
+            A flag to decide if the current tab information should be
+            overwritten with that contained in the file.
+        overwrite_data: bool, optional
+            A flag to decide if the current tab data should be overwritten
+            with that contained in the file.
+        """
+
+        info, entries, strings, sections, layout, bars = tabio.read_binary(filename, layout=True)
+        if len(strings) != self.clength:
+            raise RuntimeError(tabio.error2.format(filename))
+
+        # Map the codes of the file to the codes of this tab, in case the
+        # allowed entries differ
+        table = bytearray(range(256))
+        for code, entry in enumerate(entries):
+            if entry not in self._codes:
+                raise RuntimeError("Tab file contains an entry that is not allowed: {}".format(entry))
+            table[code] = self._codes[entry]
+        if entries != self.allowed:
+            strings = [string.translate(table) for string in strings]
+            sections = {name: [string.translate(table) for string in section]
+                        for name, section in sections.items()}
+
+        info = dict(info, filename=filename) if overwrite_info else {}
+        if overwrite_data and sections:
+            self._replace(LazyStorage.from_layout(self.clength, strings, sections, layout), info, bars=bars)
+        elif overwrite_data:
+            self._load(strings, info, bars)
+        else:
+            self.set_info(**info)
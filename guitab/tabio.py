@@ -0,0 +1,548 @@
+"""Reading and writing of guitab files
+
+A guitab text file starts with a header enclosed by two 80 character rulers of
+'=' characters, which holds the title, author and date of the tab followed by
+any notes. After the header come the rows of the tab: blocks of one line per
+string, each line starting with the tuning indicator of its string. The line
+after each block marks the position cursor with '*' and the first chord of
+each bar with '|'.
+
+A guitab binary file holds the same information in a compact form that needs
+no parsing. All integers are little-endian. The file consists of
+
+* a fixed header: the magic bytes ``GTAB``, the format version (uint16), a
+  flags byte, the number of strings (uint8) and the number of columns
+  (uint64)
+* the entry table: the number of entries (uint8) followed by each allowed
+  entry, in code order, as a length-prefixed ASCII string
+* the metadata table: the number of fields (uint16) followed by each key and
+  value as length-prefixed UTF-8 strings (uint16 lengths)
+* if flag bit 1 is set, the section table: the number of sections (uint16)
+  followed by the name (length-prefixed UTF-8 as above) and number of columns
+  (uint64) of each section; then the number of runs (uint64) followed by the
+  section (uint16, or 0xFFFF for columns that are not in a section) and number
+  of columns (uint64) of each run, which lay out the tab from start to end
+* if flag bit 2 is set, the bar table: the number of bar lines (uint64)
+  followed by the column of the first chord after each bar line (uint64), in
+  increasing order
+* the payload: one code byte per column for the first string, then for the
+  second string, and so on, compressed with zlib if flag bit 0 is set. If there
+  is a section table, the payload holds the codes of each section in turn,
+  laid out in the same way, followed by those of the columns that are not in a
+  section
+"""
+
+import mmap
+import re
+import struct
+import zlib
+from collections.abc import Sequence
+
+from .chord import Chord
+
+
+"""The ruler line that opens and closes the header of a tab text file"""
+ruler = 80 * '='
+
+"""Compiled regex search to find title field in tab text file"""
+title = re.compile(r'^title\s*:\s*(.*)\s*$', flags=re.IGNORECASE)
+"""Compiled regex search to find author field in tab text file"""
+author = re.compile(r'^author\s*:\s*(.*)\s*$', flags=re.IGNORECASE)
+"""Compiled regex search to find date field in tab text file"""
+date = re.compile(r'^date\s*:\s*(.*)\s*$', flags=re.IGNORECASE)
+
+info_tests = {'title': title, 'author': author, 'date': date}
+"""Define the order for reading metadata from a tab file"""
+info_order = ['title', 'author', 'date']
+
+error1 = 'Tab file incorrectly formatted: {}'
+error2 = 'Tab file incorrectly formatted or has mismatched tuning: {}'
+
+"""The magic bytes, version and fixed header layout of binary tab files"""
+binary_magic = b'GTAB'
+binary_version = 1
+binary_header = struct.Struct('<4sHBBQ')
+"""Flag bit set in binary tab files with a zlib compressed payload"""
+COMPRESSED = 0x01
+"""Flag bit set in binary tab files with a section table"""
+SECTIONS = 0x02
+"""Flag bit set in binary tab files with a bar table"""
+BARS = 0x04
+"""The section number of runs of columns that are not in a section"""
+NO_SECTION = 0xFFFF
+
+
+def read_header(lines, filename):
+    """Extract the tab information from the header of a tab text file.
+
+    Parameters
+    ----------
+    lines : list of str
+        The lines of the file, without line endings
+    filename : str
+        The name of the file, used in error messages
+
+    Returns
+    -------
+    info : dict
+        The title, author and date of the tab
+    end : int
+        The index of the first line after the header
+    """
+
+    if not lines or lines[0] != ruler:
+        raise RuntimeError(error1.format(filename))
+
+    info = {}
+    for n, field in enumerate(info_order, 1):
+        match = info_tests[field].search(lines[n]) if n < len(lines) else None
+        if match:
+            info[field] = match.group(1)
+        else:
+            raise RuntimeError(error1.format(filename))
+
+    # Discard anything until the end of the header (allows for user notes)
+    try:
+        end = lines.index(ruler, len(info_order) + 1) + 1
+    except ValueError:
+        raise EOFError('EOF reached before finished reading header.')
+
+    return info, end
+
+
+def read_bars(line, start):
+    """Return the columns of the bar lines marked in the line after a row
+    block of a tab text file, given the column of the first chord of the
+    block"""
+    return [start + pos - 2 for pos, char in enumerate(line) if char == '|' and pos >= 2]
+
+
+def read_text(filename, leaders, trusted=False, bars=False):
+    """Read the header and tab data of a tab text file.
+
+    The whole file is read at once and each row block of the tab is taken as
+    a slice of lines. The lines belonging to each string are then joined, so
+    that the tab data is returned as one string of entries per string of the
+    instrument without any per-character processing.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file to read from
+    leaders : sequence of str
+        The tuning indicator expected at the start of the line of each string
+    trusted : bool, optional
+        If True, the file is assumed to be well formed and the checks on the
+        tuning indicators and line lengths of each row block are skipped.
+        Default is False.
+    bars : bool, optional
+        If True, the columns of the bar lines of the tab are also returned.
+        Default is False.
+
+    Returns
+    -------
+    info : dict
+        The title, author and date of the tab
+    strings : list of str
+        The entries of each string of the tab, one character per column
+    columns : list of int
+        Only returned if `bars` is True. The column of the first chord after
+        each bar line.
+    """
+
+    with open(filename, 'r') as tabfile:
+        lines = tabfile.read().split('\n')
+
+    info, n = read_header(lines, filename)
+
+    clength = len(leaders)
+    leaders = list(leaders)
+    parts = [[] for x in range(clength)]
+    columns = []
+    start = 0
+    while n < len(lines):
+        line = lines[n]
+        if not line.startswith(leaders[0]):
+            # blank lines and cursor lines between row blocks
+            n += 1
+            continue
+
+        block = lines[n:n + clength]
+        width = len(line)
+        if not trusted:
+            if [row[:2] for row in block] != leaders:
+                raise RuntimeError(error2.format(filename))
+            if any(len(row) != width for row in block):
+                raise RuntimeError(error1.format(filename))
+        for part, row in zip(parts, block):
+            part.append(row[2:width])
+        n += clength
+        if bars and n < len(lines) and '|' in lines[n] and not lines[n].startswith(leaders[0]):
+            columns += read_bars(lines[n], start)
+        start += width - 2
+
+    if bars:
+        return info, [''.join(part) for part in parts], columns
+    return info, [''.join(part) for part in parts]
+
+
+def write_binary(filename, info, entries, strings, compress=True, sections=None, layout=None, bars=None):
+    """Write tab data and metadata to a binary tab file.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file to write to
+    info : dict
+        The metadata of the tab, with str keys and values
+    entries : sequence of str
+        The allowed entries of the tab, in code order
+    strings : sequence of bytes-like
+        The codes of each string of the tab, all of the same length. If
+        `layout` is given, only the codes of the columns that are not in a
+        section.
+    compress : bool, optional
+        If True (default), the payload is compressed with zlib
+    sections : dict, optional
+        The codes of each string of each named section of the tab, by name
+    layout : sequence of tuple, optional
+        The name of the section of each consecutive run of columns of the tab,
+        or None for runs taken in turn from `strings`, and the number of
+        columns in the run. Required if `sections` is given.
+    bars : sequence of int, optional
+        The column of the first chord after each bar line of the tab, in
+        increasing order
+    """
+
+    flags = COMPRESSED if compress else 0
+    columns = len(strings[0]) if strings else 0
+    if sections:
+        flags |= SECTIONS
+        columns = sum(size for name, size in layout)
+    if bars:
+        flags |= BARS
+    parts = [binary_header.pack(binary_magic, binary_version, flags, len(strings), columns),
+             bytes([len(entries)])]
+    for entry in entries:
+        entry = entry.encode('ascii')
+        parts += [bytes([len(entry)]), entry]
+    parts.append(struct.pack('<H', len(info)))
+    for item in info.items():
+        for text in item:
+            text = text.encode('utf-8')
+            parts += [struct.pack('<H', len(text)), text]
+
+    payload = []
+    if sections:
+        numbers = {}
+        parts.append(struct.pack('<H', len(sections)))
+        for n, (name, section) in enumerate(sections.items()):
+            numbers[name] = n
+            name = name.encode('utf-8')
+            parts += [struct.pack('<H', len(name)), name, struct.pack('<Q', len(section[0]))]
+            payload += section
+        parts.append(struct.pack('<Q', len(layout)))
+        for name, size in layout:
+            parts.append(struct.pack('<HQ', NO_SECTION if name is None else numbers[name], size))
+    if bars:
+        parts.append(struct.pack('<Q{:d}Q'.format(len(bars)), len(bars), *bars))
+
+    payload = b''.join(payload + list(strings))
+    if compress:
+        # favour speed: the codes of a tab compress well at any level
+        payload = zlib.compress(payload, 1)
+    parts.append(payload)
+
+    with open(filename, 'wb') as tabfile:
+        tabfile.write(b''.join(parts))
+
+
+def read_binary(filename, layout=False):
+    """Read tab data and metadata from a binary tab file.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file to read from
+    layout : bool, optional
+        If True, the sections and bar lines of the tab are also returned, see
+        below. Otherwise (default), the codes of every column are returned in
+        `strings`.
+
+    Returns
+    -------
+    info : dict
+        The metadata of the tab
+    entries : list of str
+        The allowed entries of the tab, in code order
+    strings : list of bytes
+        The codes of each string of the tab, or only of the columns that are
+        not in a section if `layout` is True
+    sections : dict
+        Only returned if `layout` is True. The codes of each string of each
+        named section of the tab, by name.
+    runs : list of tuple
+        Only returned if `layout` is True. The name of the section of each
+        consecutive run of columns of the tab, or None for runs taken in turn
+        from `strings`, and the number of columns in the run.
+    bars : list of int
+        Only returned if `layout` is True. The column of the first chord after
+        each bar line of the tab.
+    """
+
+    with open(filename, 'rb') as tabfile:
+        data = tabfile.read()
+
+    try:
+        magic, version, flags, clength, columns = binary_header.unpack_from(data)
+        if magic != binary_magic or version != binary_version:
+            raise RuntimeError(error1.format(filename))
+        pos = binary_header.size
+
+        entries = []
+        for x in range(data[pos]):
+            size = data[pos + 1]
+            entries.append(data[pos + 2:pos + 2 + size].decode('ascii'))
+            pos += 1 + size
+        pos += 1
+
+        info = {}
+        count, = struct.unpack_from('<H', data, pos)
+        pos += 2
+        for x in range(count):
+            item = []
+            for y in range(2):
+                size, = struct.unpack_from('<H', data, pos)
+                item.append(data[pos + 2:pos + 2 + size].decode('utf-8'))
+                pos += 2 + size
+            info[item[0]] = item[1]
+
+        names = []
+        sizes = []
+        runs = [(None, columns)]
+        if flags & SECTIONS:
+            count, = struct.unpack_from('<H', data, pos)
+            pos += 2
+            for x in range(count):
+                size, = struct.unpack_from('<H', data, pos)
+                names.append(data[pos + 2:pos + 2 + size].decode('utf-8'))
+                sizes += struct.unpack_from('<Q', data, pos + 2 + size)
+                pos += 10 + size
+            count, = struct.unpack_from('<Q', data, pos)
+            runs = [(None if n == NO_SECTION else names[n], size)
+                    for n, size in struct.iter_unpack('<HQ', data[pos + 8:pos + 8 + 10 * count])]
+            pos += 8 + 10 * count
+            if len(runs) != count:
+                raise IndexError
+        bars = []
+        if flags & BARS:
+            count, = struct.unpack_from('<Q', data, pos)
+            bars = list(struct.unpack_from('<{:d}Q'.format(count), data, pos + 8))
+            pos += 8 + 8 * count
+
+        payload = data[pos:]
+        if flags & COMPRESSED:
+            payload = zlib.decompress(payload)
+    except (struct.error, IndexError, UnicodeDecodeError, zlib.error):
+        raise RuntimeError(error1.format(filename))
+
+    # split the payload into the codes of each section and of the other
+    # columns, one bytes object per string
+    literal = sum(size for name, size in runs if name is None)
+    if (len(payload) != clength * (sum(sizes) + literal) or sum(size for name, size in runs) != columns or
+            any(name is not None and size != sizes[names.index(name)] for name, size in runs)):
+        raise RuntimeError(error1.format(filename))
+    pos = 0
+    sections = {}
+    for name, size in zip(names + [None], sizes + [literal]):
+        sections[name] = [payload[pos + j * size:pos + (j + 1) * size] for j in range(clength)]
+        pos += clength * size
+    strings = sections.pop(None)
+
+    if layout:
+        return info, entries, strings, sections, runs, bars
+    if sections:
+        strings = expand(strings, sections, runs)
+    return info, entries, strings
+
+
+def expand(strings, sections, runs):
+    """Put the columns of a tab back together from the parts returned by
+    `read_binary` with `layout` set, as one bytes object per string"""
+    parts = [[] for string in strings]
+    pos = 0
+    for name, size in runs:
+        if name is None:
+            source, start = strings, pos
+            pos += size
+        else:
+            source, start = sections[name], 0
+        for part, string in zip(parts, source):
+            part.append(string[start:start + size])
+    return [b''.join(part) for part in parts]
+
+
+class Columns(Sequence):
+    """Read-only view of tab data as a sequence of chords.
+
+    The chords are built on access from one string of entries per string of
+    the instrument, so that the tab data read from a file can be returned
+    without creating an object for every column up front. Each chord is
+    returned as an interned `Chord`.
+    """
+
+    def __init__(self, strings):
+        self._strings = strings
+
+    def __len__(self):
+        return len(self._strings[0]) if self._strings else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Chord(string[index] for string in self._strings)
+
+    def __eq__(self, other):
+        return [list(chord) for chord in self] == [list(chord) for chord in other]
+
+
+class MappedText(object):
+    """Memory-mapped tab text file that row blocks can be decoded from.
+
+    Opening the file reads its header and builds an index of the byte offset
+    and width of every row block of the tab, checking the tuning indicators
+    and line lengths of each block as it goes, so that a badly laid out file
+    is rejected straight away. The entries of a block are only read, and
+    checked, when the block is decoded. Line endings may be '\\n' or '\\r\\n'.
+    """
+
+    def __init__(self, filename, leaders, text_codes):
+        """Constructor for MappedText class object
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file to read from
+        leaders : sequence of str
+            The tuning indicator expected at the start of the line of each
+            string
+        text_codes : bytes
+            A translation table from the characters of the file to codes, in
+            which characters that are not allowed translate to 255
+        """
+
+        self.filename = filename
+        self._leaders = [leader.encode('ascii') for leader in leaders]
+        # the first and the second characters of the tuning indicators, and
+        # the line endings, down the lines of a row block
+        self._columns = [bytes(leader[k] for leader in self._leaders) for k in range(2)]
+        self._columns += [b'\n' * len(leaders), b'\r' * len(leaders)]
+        self._text_codes = text_codes
+
+        with open(filename, 'rb') as tabfile:
+            try:
+                self._map = mmap.mmap(tabfile.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # an empty file cannot be mapped
+                self._map = b''
+
+        # Parse the header from the text up to the closing ruler
+        rule = ruler.encode('ascii')
+        end = self._map.find(b'\n' + rule, len(rule))
+        if end == -1:
+            end = len(self._map)
+        else:
+            end += len(rule) + 1
+        try:
+            self.info, n = read_header(self._map[:end].decode().splitlines(), filename)
+            self.offsets, self.sizes, self.bars = self._index(end + 1)
+        except Exception:
+            self.close()
+            raise
+
+    def _index(self, pos):
+        """Find the byte offset and number of columns of each row block of the
+        tab, checking its layout, and the columns of the bar lines, starting
+        the search at byte `pos`"""
+        mapped = self._map
+        first = self._leaders[0]
+        offsets = []
+        sizes = []
+        bars = []
+        start = 0
+        while pos < len(mapped):
+            if mapped[pos:pos + len(first)] != first:
+                pos = mapped.find(b'\n' + first, pos)
+                if pos == -1:
+                    break
+                pos += 1
+            offsets.append(pos)
+            width, pos = self._layout(pos)
+            sizes.append(width)
+
+            # the line after the block may mark bar lines
+            end = mapped.find(b'\n', pos)
+            if end == -1:
+                end = len(mapped)
+            line = mapped[pos:end]
+            if b'|' in line and not line.startswith(first):
+                bars += read_bars(line.decode('ascii', 'replace'), start)
+            start += sizes[-1]
+        return offsets, sizes, bars
+
+    def _layout(self, pos):
+        """Check the tuning indicators and line lengths of the row block that
+        starts at byte `pos`, without reading its entries, and return its
+        number of columns and the byte offset after the block"""
+        mapped = self._map
+        end = mapped.find(b'\n', pos)
+        if end == -1:
+            end = len(mapped)
+        eol = 2 if mapped[end - 1] == 13 else 1
+
+        # every line of the block has the length of the first, so the line
+        # endings and the tuning indicators are each in a column of the block
+        # and can be checked with one slice
+        stride = end + 1 - pos
+        size = stride * len(self._leaders)
+        block = mapped[pos:pos + size]
+        if len(block) == size - eol:
+            # the final line of the file may have no line ending
+            block += b'\r\n'[2 - eol:]
+        first, second, newlines, returns = self._columns
+        if block[stride - 1::stride] != newlines or (eol == 2 and block[stride - 2::stride] != returns):
+            raise RuntimeError(error1.format(self.filename))
+        if block[0::stride] != first or block[1::stride] != second:
+            raise RuntimeError(error2.format(self.filename))
+        return stride - eol - 2, pos + size
+
+    def _read(self, pos):
+        """Check the lines of the row block that starts at byte `pos`, and
+        return their codes as one bytes object per string, and the byte offset
+        after the block"""
+        mapped = self._map
+        strings = []
+        for leader in self._leaders:
+            end = mapped.find(b'\n', pos)
+            if end == -1:
+                end = len(mapped)
+            line = mapped[pos:end]
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            if line[:2] != leader:
+                raise RuntimeError(error2.format(self.filename))
+            codes = line[2:].translate(self._text_codes)
+            if (strings and len(codes) != len(strings[0])) or 255 in codes:
+                raise RuntimeError(error1.format(self.filename))
+            strings.append(codes)
+            pos = end + 1
+        return strings, pos
+
+    def decode(self, n):
+        """Return the codes of row block `n` as one bytes object per string"""
+        return self._read(self.offsets[n])[0]
+
+    def close(self):
+        """Unmap the file"""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
@@ -0,0 +1,36 @@
+from ..chord import MAX_REPEAT, Chord, parse_compact
+import pytest
+
+
+def test_chord_interned():
+    """Check that chords with the same entries are the same object"""
+    chord = Chord(['-', '1', '-', '2', '3', 'x'])
+    assert Chord(('-', '1', '-', '2', '3', 'x')) is chord
+    assert Chord(iter(chord)) is chord
+    assert Chord(['-', '1', '-', '2', '3', '0']) is not chord
+
+
+def test_chord_immutable():
+    """Check that a chord behaves as an immutable tuple of entries"""
+    chord = Chord(['x', '3', '2', '0', '1', '0'])
+    assert chord == ('x', '3', '2', '0', '1', '0')
+    assert chord[1] == '3'
+    with pytest.raises(TypeError):
+        chord[1] = '2'
+    with pytest.raises(AttributeError):
+        chord.frets = 6
+
+
+def test_parse_compact():
+    """Check that chords in compact notation are parsed, with bracketed
+    frets and repeats"""
+    assert parse_compact('x32010 (10)(12)(12)(11)(10)(10)*2 --hp-(3)') == [
+        Chord(['x', '3', '2', '0', '1', '0'])] + [Chord(['10', '12', '12', '11', '10', '10'])] * 2 + [
+        Chord(['-', '-', 'h', 'p', '-', '3'])]
+    assert parse_compact('x 3 2') == [Chord(['x']), Chord(['3']), Chord(['2'])]
+    assert parse_compact('') == []
+    for text in ('x3201q', '(10', 'x32010*', '*4', 'x32010, 320003'):
+        assert parse_compact(text) is None
+    assert len(parse_compact('x32010*{:d}'.format(MAX_REPEAT))) == MAX_REPEAT
+    with pytest.raises(TypeError, match='x32010'):
+        parse_compact('x32010*{:d}'.format(MAX_REPEAT + 1))
@@ -0,0 +1,89 @@
+from ..editor import Editor
+from ..guitab import GuitabShell
+from ..tab import Tab
+import pytest
+
+curses = pytest.importorskip('curses')
+
+
+class FakeScreen(object):
+    """A stand-in for a curses window that records what is drawn on it and
+    returns predefined keys"""
+
+    def __init__(self, keys, height=25, width=100):
+        self.keys = [ord(key) if isinstance(key, str) else key for key in keys]
+        self.height = height
+        self.width = width
+        self.lines = {}
+        self.cursor = (0, 0)
+        # the screen lines drawn since each key was read
+        self.drawn = []
+        self.draws = []
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def move(self, y, x):
+        self.cursor = (y, x)
+
+    def clrtoeol(self):
+        self.lines[self.cursor[0]] = ''
+
+    def addnstr(self, y, x, text, n, attr=0):
+        self.lines[y] = text[:n]
+        self.drawn.append(y)
+
+    def refresh(self):
+        pass
+
+    def getch(self):
+        self.draws.append(self.drawn)
+        self.drawn = []
+        return self.keys.pop(0)
+
+
+def test_editor_entry():
+    """Check that typed entries are written to the chosen string, with two
+    digit frets"""
+    tab = Tab()
+    screen = FakeScreen(['x', curses.KEY_RIGHT, curses.KEY_DOWN, '1', '2', curses.KEY_RIGHT, '3', curses.KEY_LEFT,
+                         '2', '1', 'u', 'q'])
+    assert Editor(tab, screen).run() is False
+    assert tab.read(0) == ('x', '-', '-', '-', '-', '-')
+    assert tab.read(1) == ('-', '2', '-', '-', '-', '-')
+    assert tab.read(2) == ('-', '3', '-', '-', '-', '-')
+    assert screen.lines[1] == 'B|-23'
+    assert screen.cursor == (1, 3)
+    tab.redo()
+    assert tab.read(1)[1] == '21'
+    for n in range(3):
+        tab.undo()
+    assert tab.read(1)[1] == '12'
+    assert tab._observers == []
+
+
+def test_editor_redraws_changed_rows():
+    """Check that a keystroke only draws the rows of the screen that it
+    changed, however long the tab is"""
+    tab = Tab()
+    tab.forward(100000)
+    tab.goto(50000)
+    screen = FakeScreen(['5', curses.KEY_RIGHT, curses.KEY_UP] + [curses.KEY_PPAGE] * 3 + ['q'])
+    Editor(tab, screen).run()
+    first, write, move, string, page, page_again, scroll = [len(drawn) for drawn in screen.draws]
+    status = 1
+    assert first == scroll == 3 * 7 + status
+    assert write == move == 7 + status
+    assert string == status
+    assert page == page_again == 2 * 7 + status
+
+
+def test_editor_shell_commands():
+    """Check that shell commands are run after ':', and that BYE stops the
+    shell"""
+    shell = GuitabShell()
+    keys = [':'] + list('title song') + [10, ':'] + list('goto x') + [10] + [':'] + list('bye') + [10]
+    screen = FakeScreen(keys)
+    assert Editor(shell.user_tab, screen, shell).run() is True
+    assert shell.user_tab.info['title'] == 'song'
+    assert screen.lines[24].startswith(':bye')
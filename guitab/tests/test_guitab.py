@@ -1,4 +1,4 @@
-from ..guitab import GuitabShell
+from ..guitab import GuitabShell, main
 import re
 from . import global_test_data
 from pathlib import Path
@@ -126,9 +126,9 @@ def test_guitab_write_invalid_chord(capfd):
     guitab_shell.do_chord("")
     out, err = capfd.readouterr()
     assert out == "Invalid number of finger positions provided: 0. Expected 6.\n"
-    guitab_shell.do_chord("t t t t t t")
+    guitab_shell.do_chord("t 1 t 1 1 25")
     out, err = capfd.readouterr()
-    assert out == "Invalid finger position provided: t\n"
+    assert out == "Invalid finger position provided: t (string 1), t (string 3), 25 (string 6)\n"
 
 
 def test_guitab_load():
@@ -159,6 +159,34 @@ def test_guitab_loadall():
     assert guitab_shell.user_tab.info == global_test_data.file_info
 
 
+def test_guitab_load_errors(tmp_path, capfd):
+    """Confirm that the custom shell program reports a badly formatted tab
+    file on LOAD and LOADALL, keeping the tab it had, and an entry that is not
+    allowed when it is drawn"""
+
+    tab_file = tmp_path / "tab.txt"
+    tab_file.write_text(global_test_data.test_file.read_text().replace('B|-', 'B|--', 1))
+    guitab_shell = GuitabShell()
+    guitab_shell.user_tab.write(['3'] * 6)
+    for command in ("load", "loadall"):
+        guitab_shell.onecmd("{} {}".format(command, tab_file))
+        out, err = capfd.readouterr()
+        assert out == "Tab file incorrectly formatted: {}\n".format(tab_file)
+        assert guitab_shell.user_tab.tab_data == [['3'] * 6]
+    guitab_shell.onecmd("load {}".format(tmp_path / "missing.txt"))
+    out, err = capfd.readouterr()
+    assert out.startswith("[Errno 2] No such file or directory")
+
+    tab_file.write_text(global_test_data.test_file.read_text().replace('B|-', 'B|q', 1))
+    guitab_shell.onecmd("load {}".format(tab_file))
+    guitab_shell.onecmd("forward")
+    out, err = capfd.readouterr()
+    assert out == "Tab file incorrectly formatted: {}\n".format(tab_file)
+    # undo the move and then the load
+    guitab_shell.onecmd("undo; undo")
+    assert guitab_shell.user_tab.tab_data == [['3'] * 6]
+
+
 def test_guitab_save(tmp_path):
     """Confirm that the custom shell program can correctly save tab data"""
 
@@ -178,3 +206,273 @@ def test_guitab_incorrect_save(capfd):
     guitab_shell.do_save('')
     out, err = capfd.readouterr()
     assert out == "ERROR: The SAVE command requires an argument if a file hasn't been set previously\n"
+
+
+def test_guitab_savebin_loadbin(tmp_path):
+    """Confirm that the custom shell program can save and load binary tab
+    files"""
+
+    save_file = str(tmp_path / "tab.gtab")
+    guitab_shell = GuitabShell()
+    guitab_shell.do_load(str(global_test_data.test_file))
+    guitab_shell.do_savebin(save_file)
+    guitab_shell = GuitabShell()
+    guitab_shell.do_loadbin(save_file)
+    assert str(guitab_shell.user_tab) == global_test_data.str_tab_file_load
+
+
+def test_guitab_loadbin_errors(capfd):
+    """Confirm that the custom shell program reports LOADBIN errors"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.do_loadbin('')
+    out, err = capfd.readouterr()
+    assert out == "ERROR: The LOADBIN command requires an argument\n"
+    guitab_shell.do_loadbin(str(global_test_data.test_file))
+    out, err = capfd.readouterr()
+    assert out == "Tab file incorrectly formatted: {}\n".format(global_test_data.test_file)
+
+
+def test_guitab_savebin_errors(tmp_path, capfd):
+    """Confirm that the custom shell program reports SAVEBIN errors and keeps
+    running"""
+
+    guitab_shell = GuitabShell()
+    assert not guitab_shell.onecmd('savebin')
+    out, err = capfd.readouterr()
+    assert out == "ERROR: The SAVEBIN command requires an argument\n"
+    save_file = tmp_path / 'missing' / 'tab.gtab'
+    assert not guitab_shell.onecmd('savebin {}'.format(save_file))
+    out, err = capfd.readouterr()
+    assert str(save_file) in out
+    assert not save_file.exists()
+
+
+def test_guitab_insert_delete(capfd):
+    """Confirm that the custom shell program inserts and deletes counts"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.do_chord("- 1 - 2 3 x")
+    guitab_shell.do_insert("")
+    out, err = capfd.readouterr()
+    assert guitab_shell.user_tab.tab_data == [['-'] * 6, ['-', '1', '-', '2', '3', 'x']]
+    guitab_shell.do_delete("2")
+    out, err = capfd.readouterr()
+    assert out == global_test_data.print_blank_tab
+    guitab_shell.do_insert("x")
+    out, err = capfd.readouterr()
+    assert out == "INSERT requires a single integer input. Given: x\n"
+
+
+def test_guitab_write_chords(capfd):
+    """Confirm that the custom shell program writes several chords at once"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.do_chords("- 1 - 2 3 x, 3 3 - - 2 3")
+    out, err = capfd.readouterr()
+    assert out == 'e|-3-\nB|13-\nG|---\nD|2--\nA|32-\nE|x3-\n    *\n\n'
+    guitab_shell.do_chords("1 1 1 1 1 1, 1 1, 1 1 1 1 1 r")
+    out, err = capfd.readouterr()
+    assert out == "Chord 2: Invalid number of finger positions provided: 2. Expected 6.\n"\
+        "Chord 3: Invalid finger position provided: r (string 6)\n"
+
+
+def test_guitab_transpose(capfd):
+    """Confirm that the custom shell program transposes the tab"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.do_chord("- 1 - 2 3 x")
+    guitab_shell.do_transpose("2")
+    out, err = capfd.readouterr()
+    assert guitab_shell.user_tab.read(0) == ('-', '3', '-', '4', '5', 'x')
+    guitab_shell.do_transpose("-5")
+    out, err = capfd.readouterr()
+    assert out.startswith("Transposing by -5 moves notes outside of the fret range")
+    guitab_shell.do_transpose("-5 fold")
+    assert guitab_shell.user_tab.read(0) == ('-', '10', '-', '11', '0', 'x')
+    guitab_shell.do_transpose("up")
+    out, err = capfd.readouterr()
+    assert out.endswith("TRANSPOSE requires an integer input and an optional FOLD. Given: up\n")
+
+
+def test_guitab_find(capfd):
+    """Confirm that the custom shell program moves to the next match"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.do_chords("- 1 - 2 3 x, 3 3 - - 2 3, - 1 - 2 3 x")
+    guitab_shell.do_find("- 1 - 2 3 x")
+    assert guitab_shell.user_tab.i == 0
+    guitab_shell.do_find("- 1 - 2 3 x")
+    assert guitab_shell.user_tab.i == 2
+    out, err = capfd.readouterr()
+    guitab_shell.do_find("5 - - - - -")
+    out, err = capfd.readouterr()
+    assert out == "No match found\n"
+
+
+def test_guitab_undo_redo(capfd):
+    """Confirm that the custom shell program undoes and redoes changes"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.onecmd("chord x 3 2 0 1 0")
+    guitab_shell.onecmd("forward 2")
+    guitab_shell.onecmd("undo")
+    assert guitab_shell.user_tab.i == 0
+    guitab_shell.onecmd("undo")
+    assert guitab_shell.user_tab.read(0) == ('-',) * 6
+    out, err = capfd.readouterr()
+    guitab_shell.onecmd("undo")
+    out, err = capfd.readouterr()
+    assert out == "Nothing to undo\n"
+    guitab_shell.onecmd("redo")
+    assert guitab_shell.user_tab.read(0) == ('x', '3', '2', '0', '1', '0')
+
+
+def test_guitab_snapshot_checkout(capfd):
+    """Confirm that the custom shell program switches between snapshots"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.onecmd("chord x 3 2 0 1 0")
+    guitab_shell.onecmd("snapshot c")
+    guitab_shell.onecmd("chord 3 3 0 0 2 3")
+    guitab_shell.onecmd("snapshot g")
+    guitab_shell.onecmd("checkout c")
+    assert guitab_shell.user_tab.read(0) == ('x', '3', '2', '0', '1', '0')
+    guitab_shell.onecmd("checkout g")
+    assert guitab_shell.user_tab.read(0) == ('3', '3', '0', '0', '2', '3')
+    out, err = capfd.readouterr()
+    guitab_shell.onecmd("checkout a")
+    guitab_shell.onecmd("snapshot")
+    out, err = capfd.readouterr()
+    assert out == "ERROR: No snapshot named: a\nERROR: The SNAPSHOT command requires an argument\n"
+
+
+def test_guitab_section_repeat(capfd):
+    """Confirm that the custom shell program repeats named sections"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.onecmd("chords x 3 2 0 1 0, 3 3 0 0 2 3")
+    guitab_shell.onecmd("section verse 0 2")
+    guitab_shell.onecmd("repeat verse")
+    assert guitab_shell.user_tab.imax == 4
+    guitab_shell.onecmd("chord 5 5 5 5 5 5")
+    assert guitab_shell.user_tab.read(0) == ('5',) * 6
+    out, err = capfd.readouterr()
+    guitab_shell.onecmd("section chorus 1")
+    guitab_shell.onecmd("repeat chorus")
+    out, err = capfd.readouterr()
+    assert out == ("SECTION requires a name and two integer inputs. Given: chorus 1\n"
+                   "No section is defined with the name: chorus\n")
+
+
+def test_guitab_goto(capfd):
+    """Confirm that the custom shell program moves to counts, bars and
+    bookmarks"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.onecmd("goto 8")
+    guitab_shell.onecmd("bar")
+    guitab_shell.onecmd("mark end")
+    guitab_shell.onecmd("goto 0")
+    assert guitab_shell.user_tab.i == 0
+    guitab_shell.onecmd("goto bar 2")
+    assert guitab_shell.user_tab.i == 8
+    guitab_shell.onecmd("goto 3")
+    guitab_shell.onecmd("goto end")
+    assert guitab_shell.user_tab.i == 8
+    out, err = capfd.readouterr()
+    guitab_shell.onecmd("goto intro")
+    guitab_shell.onecmd("goto bar 3")
+    out, err = capfd.readouterr()
+    assert out == ("GOTO requires an integer, BAR and an integer, or a bookmark name. Given: intro\n"
+                   "Requested bar is out of range. Bar = 3, and the tab has 2 bars\n")
+
+
+def test_guitab_run_script(capfd):
+    """Confirm that the custom shell program runs a script without redraws,
+    reporting errors by line number"""
+
+    script = ["# a short riff", "chord x 3 2 0 1 0", "", "forward 2", "chord 3 3 0 0 q 3", "forward x",
+              "undo", "chord 3 3 0 0 2 3", "bye", "forward 5"]
+    guitab_shell = GuitabShell()
+    assert guitab_shell.run_script(script) == 2
+    assert guitab_shell.user_tab.read(0) == ('3', '3', '0', '0', '2', '3')
+    assert guitab_shell.user_tab.imax == 0
+    out, err = capfd.readouterr()
+    assert out == ("Line 5: Invalid finger position provided: q (string 5)\n"
+                   "Line 6: FORWARD requires a single integer input. Given: x\n" +
+                   guitab_shell.user_tab.view() + "\n")
+
+
+def test_guitab_main_script(tmp_path, capfd):
+    """Confirm that the command line program runs a script file and prints
+    the whole tab on PRINT"""
+
+    script = tmp_path / 'riff.gt'
+    script.write_text("forward 78\nprint\n")
+    assert main(['--script', str(script)]) == 0
+    out, err = capfd.readouterr()
+    assert out.startswith(global_test_data.str_tab_2_rows)
+    script.write_text("goto -1\n")
+    assert main(['--script', str(script)]) == 1
+
+
+def test_guitab_script_save(tmp_path, monkeypatch):
+    """Confirm that the custom shell program overwrites an existing file on
+    SAVE in a script, without a prompt that would read the next lines"""
+
+    def no_input(prompt):
+        raise AssertionError('Unexpected prompt: ' + prompt)
+
+    monkeypatch.setattr('builtins.input', no_input)
+    tabfile = tmp_path / 'riff.txt'
+    tabfile.write_text('old contents\n')
+    guitab_shell = GuitabShell()
+    assert guitab_shell.run_script(["chord x 3 2 0 1 0", "save {}".format(tabfile), "forward 2",
+                                    "chord 3 2 0 0 0 3", "save"]) == 0
+    assert guitab_shell.user_tab.imax == 2
+    saved = GuitabShell()
+    saved.do_load(str(tabfile))
+    assert saved.user_tab.imax == 2
+    assert saved.user_tab.read(2) == ('3', '2', '0', '0', '0', '3')
+
+
+def test_guitab_deferred_redraw(monkeypatch):
+    """Confirm that the custom shell program draws the tab once after a burst
+    of commands, unless the redraw interval has passed"""
+
+    draws = []
+    monkeypatch.setattr('builtins.input', lambda _: 'bye')
+    # a clock that has been running for longer than the redraw interval
+    monkeypatch.setattr('time.monotonic', lambda: 10.0 ** 7)
+    for interval, expected in ((3600, 1), (0, 50)):
+        guitab_shell = GuitabShell()
+        monkeypatch.setattr(guitab_shell.user_tab, 'print', lambda: draws.append(guitab_shell.user_tab.i))
+        guitab_shell.redraw_interval = interval
+        guitab_shell.cmdqueue = ['forward'] * 50
+        del draws[:]
+        guitab_shell.cmdloop()
+        assert len(draws) == expected
+        assert draws[-1] == 50
+
+
+def test_guitab_compact_chords(capfd):
+    """Confirm that the custom shell program runs several commands on a line
+    and reads chords in compact notation"""
+
+    guitab_shell = GuitabShell()
+    guitab_shell.onecmd("chords x32010*2 (10)(12)(12)(11)(10)(10); forward; x32010; chord 320003")
+    assert guitab_shell.user_tab.tab_data == [['x', '3', '2', '0', '1', '0']] * 2 + [
+        ['10', '12', '12', '11', '10', '10'], ['-'] * 6, ['x', '3', '2', '0', '1', '0'],
+        ['3', '2', '0', '0', '0', '3']]
+    out, err = capfd.readouterr()
+    assert out == guitab_shell.user_tab.view() + "\n"
+    guitab_shell.onecmd("chord 10 12 12 11 10 10; chord x32010*2; x3201q")
+    assert guitab_shell.user_tab.read() == ('10', '12', '12', '11', '10', '10')
+    out, err = capfd.readouterr()
+    assert out == ("ERROR: CHORD writes a single chord; use CHORDS for more. Given: x32010*2\n"
+                   "*** Unknown syntax: x3201q\n" + guitab_shell.user_tab.view() + "\n")
+    guitab_shell.onecmd("chords x32010*99999999999; chord x32010*99999999999; x32010*99999999999")
+    assert guitab_shell.user_tab.read() == ('10', '12', '12', '11', '10', '10')
+    out, err = capfd.readouterr()
+    assert out == "Chord repeated too many times: x32010*99999999999. The most is 10000\n" * 3
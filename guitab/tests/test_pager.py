@@ -0,0 +1,58 @@
+from ..pager import Pager
+from ..tab import Tab
+import io
+import pytest
+from . import global_test_data
+
+
+@pytest.fixture
+def long_tab():
+    tab = Tab()
+    tab.forward(100000)
+    tab.write(['x', '3', '2', '0', '1', '0'], index=50000)
+    tab.write(['x', '3', '2', '0', '1', '0'], index=60)
+    return tab
+
+
+def run_pager(tab, commands, height=25):
+    """Run a pager on `tab` with the given command lines, and return it and
+    its output"""
+    stdout = io.StringIO()
+    pager = Pager(tab, stdin=io.StringIO(''.join(line + '\n' for line in commands)), stdout=stdout,
+                  height=height)
+    pager.run(interactive=True)
+    return pager, stdout.getvalue()
+
+
+def test_pager_streams_when_not_interactive():
+    """Check that the whole tab is written out when not paging"""
+    stdout = io.StringIO()
+    Pager(Tab(), stdout=stdout).run(interactive=False)
+    assert stdout.getvalue() == global_test_data.print_blank_tab
+
+
+def test_pager_pages(long_tab, monkeypatch):
+    """Check that only the rows of each page are rendered, and that the pager
+    moves between pages"""
+    rendered = []
+    iter_lines = long_tab.iter_lines
+    monkeypatch.setattr(long_tab, 'iter_lines', lambda start_row=0, end_row=None, cursor=True, cache=True:
+                        rendered.append(end_row - start_row) or iter_lines(start_row, end_row, cursor, cache))
+    pager, out = run_pager(long_tab, ['', 'f', 'b', 'G', 'g', 'q', 'f'])
+    assert pager.page_rows == 3
+    assert rendered == [3] * 6
+    assert out.startswith(''.join(iter_lines(0, 3)) + '\nrows 1-3 of 1283 (')
+    assert pager.top == 0
+    assert 'rows 1281-1283 of 1283' in out
+
+
+def test_pager_search_and_cursor(long_tab):
+    """Check that the pager finds text on the strings, wrapping around, and
+    jumps to the current position"""
+    pager, out = run_pager(long_tab, ['/-x-', 'n', 'n', 'c', '/5', 'h'])
+    assert pager.top == long_tab.num_rows - 3
+    assert 'rows 1-3 of' in out
+    assert 'rows 642-644 of' in out
+    assert out.count('rows 1-3 of') == 2
+    assert 'Pattern not found: 5\n' in out
+    assert 'Unknown pager command: h' in out
@@ -0,0 +1,244 @@
+from ..storage import BACKENDS, BLANK, LazyStorage
+import pytest
+
+
+class BlockSource(object):
+    """A source of blocks for LazyStorage that records what is decoded"""
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.decoded = []
+        self.closed = False
+
+    def decode(self, n):
+        self.decoded.append(n)
+        return self.blocks[n]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def storage(request):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    return BACKENDS[request.param](6)
+
+
+def test_new_storage_is_one_blank_column(storage):
+    """Check that a new storage holds a single blank chord"""
+    assert len(storage) == 1
+    assert storage.get(0) == (BLANK,) * 6
+
+
+def test_set_and_get(storage):
+    """Check that a chord written to a column can be read back"""
+    storage.resize(5)
+    storage.set(3, (1, 2, 3, 4, 5, 6))
+    assert storage.get(3) == (1, 2, 3, 4, 5, 6)
+    assert storage.get(4) == (BLANK,) * 6
+
+
+def test_resize(storage):
+    """Check that resizing pads with blank columns and truncates"""
+    storage.resize(100)
+    assert len(storage) == 100
+    storage.set(99, (7,) * 6)
+    storage.resize(10)
+    assert len(storage) == 10
+    assert storage.row(0, 0, 10) == bytes(10)
+
+
+def test_row_slice(storage):
+    """Check that a row slice returns the codes of a single string"""
+    storage.load([bytes([j, j + 1, j + 2]) for j in range(6)])
+    assert len(storage) == 3
+    assert storage.row(2, 1, 3) == bytes([3, 4])
+
+
+def test_set_many(storage):
+    """Check that a sequence of chords is written to consecutive columns"""
+    storage.resize(4)
+    storage.set_many(1, [(1,) * 6, (2,) * 6])
+    assert [storage.get(i) for i in range(4)] == [(0,) * 6, (1,) * 6, (2,) * 6, (0,) * 6]
+
+
+def test_blank_columns(storage):
+    """Check that only the columns with every string blank are reported"""
+    storage.resize(6)
+    storage.set(1, (0, 0, 0, 0, 0, 3))
+    storage.set(4, (5, 0, 0, 0, 0, 0))
+    assert storage.blank_columns() == [0, 2, 3, 5]
+
+
+def test_remap(storage):
+    """Check that codes in a column range are translated through a table"""
+    storage.resize(3)
+    for i in range(3):
+        storage.set(i, (4, 5, 0, 0, 0, 0))
+    table = bytes(range(1, 256)) + bytes(1)
+    storage.remap(table, 1, 2)
+    assert storage.get(0) == (4, 5, 0, 0, 0, 0)
+    assert storage.get(1) == (5, 6, 1, 1, 1, 1)
+    assert storage.get(2) == (4, 5, 0, 0, 0, 0)
+
+
+def test_insert_delete(storage):
+    """Check that columns can be inserted and deleted anywhere"""
+    storage.resize(5)
+    for i in range(5):
+        storage.set(i, (i,) * 6)
+    storage.insert(2, [(7,) * 6, (8,) * 6])
+    assert storage.row(0, 0, 10) == bytes([0, 1, 7, 8, 2, 3, 4])
+    storage.insert(7, [(9,) * 6])
+    storage.insert(0, [(6,) * 6])
+    storage.delete(3, 3)
+    assert len(storage) == 6
+    assert storage.row(5, 0, 10) == bytes([6, 0, 1, 3, 4, 9])
+    assert [storage.get(i)[2] for i in range(6)] == [6, 0, 1, 3, 4, 9]
+    storage.resize(8)
+    storage.delete(0, 2)
+    assert storage.row(1, 0, 10) == bytes([1, 3, 4, 9, 0, 0])
+
+
+def test_gap_buffer_repeated_insertion():
+    """Check that repeated insertion at one place grows the gap rather than
+    moving the rest of the columns each time"""
+    storage = BACKENDS['array'](6, 1000)
+    for i in range(100):
+        storage.insert(500 + i, [(1,) * 6])
+    assert len(storage) == 1100
+    assert storage.row(0, 499, 602) == bytes([0]) + bytes([1]) * 100 + bytes([0, 0])
+    assert storage.blank_columns() == list(range(500)) + list(range(600, 1100))
+
+
+@pytest.fixture
+def lazy_source():
+    return BlockSource([[bytes([n]) * 3 for j in range(6)] for n in range(1, 5)])
+
+
+def test_lazy_decodes_on_demand(lazy_source):
+    """Check that lazy storage only decodes the blocks that are accessed"""
+    storage = LazyStorage(6, [3, 3, 3, 3], lazy_source)
+    assert len(storage) == 12
+    assert lazy_source.decoded == []
+    assert storage.get(7) == (3,) * 6
+    assert storage.row(0, 2, 4) == bytes([1, 2])
+    assert sorted(lazy_source.decoded) == [0, 1, 2]
+
+
+def test_lazy_edits(lazy_source):
+    """Check that lazy storage can be written to, grown and truncated"""
+    storage = LazyStorage(6, [3, 3, 3, 3], lazy_source)
+    storage.set(4, (9,) * 6)
+    storage.resize(14)
+    assert storage.row(5, 0, 14) == bytes([1, 1, 1, 2, 9, 2, 3, 3, 3, 4, 4, 4, 0, 0])
+    storage.resize(5)
+    assert len(storage) == 5
+    assert storage.row(5, 0, 14) == bytes([1, 1, 1, 2, 9])
+
+
+def test_lazy_detach(lazy_source):
+    """Check that detaching decodes every block and closes the source"""
+    storage = LazyStorage(6, [3, 3, 3, 3], lazy_source)
+    storage.detach()
+    assert lazy_source.closed
+    assert sorted(lazy_source.decoded) == [0, 1, 2, 3]
+    assert storage.row(0, 0, 12) == bytes([1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4])
+
+
+def test_lazy_insert_delete(lazy_source):
+    """Check that columns can be inserted into and deleted across the blocks
+    of lazy storage"""
+    storage = LazyStorage(6, [3, 3, 3, 3], lazy_source)
+    storage.insert(4, [(7,) * 6])
+    storage.insert(13, [(8,) * 6])
+    assert storage.row(0, 0, 14) == bytes([1, 1, 1, 2, 7, 2, 2, 3, 3, 3, 4, 4, 4, 8])
+    storage.delete(2, 7)
+    assert storage.row(0, 0, 14) == bytes([1, 1, 3, 4, 4, 4, 8])
+    assert storage.get(2) == (3,) * 6
+
+
+def test_lazy_remap(lazy_source):
+    """Check that lazy storage remaps codes across block boundaries"""
+    storage = LazyStorage(6, [3, 3, 3, 3], lazy_source)
+    storage.remap(bytes(range(1, 256)) + bytes(1), 2, 7)
+    assert storage.row(0, 0, 12) == bytes([1, 1, 2, 3, 3, 3, 4, 3, 3, 4, 4, 4])
+
+
+def test_lazy_snapshot(lazy_source):
+    """Check that snapshots share blocks until either copy edits them"""
+    storage = LazyStorage(6, [3, 3, 3, 3], lazy_source)
+    snapshot = storage.snapshot()
+    assert lazy_source.closed
+    storage.set(4, (9,) * 6)
+    storage.insert(0, [(7,) * 6])
+    snapshot.delete(9, 3)
+    assert storage.row(0, 0, 13) == bytes([7, 1, 1, 1, 2, 9, 2, 3, 3, 3, 4, 4, 4])
+    assert snapshot.row(0, 0, 12) == bytes([1, 1, 1, 2, 2, 2, 3, 3, 3])
+    assert storage._blocks[2] is snapshot._blocks[2]
+    again = snapshot.snapshot()
+    snapshot.resize(0)
+    again.remap(bytes(range(1, 256)) + bytes(1))
+    assert len(snapshot) == 0
+    assert again.row(0, 0, 12) == bytes([2, 2, 2, 3, 3, 3, 4, 4, 4])
+    assert storage.row(0, 0, 13) == bytes([7, 1, 1, 1, 2, 9, 2, 3, 3, 3, 4, 4, 4])
+
+
+def test_snapshot(storage):
+    """Check that a snapshot of any backend is independent of the storage"""
+    storage.resize(10)
+    storage.set(7, (5,) * 6)
+    snapshot = storage.snapshot()
+    storage.set(2, (4,) * 6)
+    storage.delete(0, 1)
+    snapshot.insert(0, [(3,) * 6])
+    assert storage.row(0, 0, 10) == bytes([0, 4, 0, 0, 0, 0, 5, 0, 0])
+    assert snapshot.row(0, 0, 11) == bytes([3, 0, 0, 0, 0, 0, 0, 0, 5, 0, 0])
+
+
+def test_lazy_from_storage(storage):
+    """Check that another storage is copied into blocks of the given size"""
+    storage.resize(10)
+    storage.set(7, (5,) * 6)
+    blocks = LazyStorage.from_storage(storage, block_size=4)
+    assert blocks._sizes == [4, 4, 2]
+    assert blocks.row(3, 0, 10) == storage.row(3, 0, 10)
+
+
+def test_lazy_sections():
+    """Check that repeats of a section share its chords until columns are
+    inserted into or deleted from them"""
+    storage = LazyStorage.from_storage(BACKENDS['array'](6, 6), block_size=4)
+    storage.set(1, (1,) * 6)
+    storage.define_section('verse', 1, 3)
+    assert storage.repeat('verse', 6) == 2
+    assert storage.repeat('verse', 0) == 2
+    assert storage.row(0, 0, 10) == bytes([1, 0, 0, 1, 0, 0, 0, 0, 1, 0])
+    assert storage.linked(0, 2) and storage.linked(4, 6) and not storage.linked(5, 8)
+    storage.set(8, (2,) * 6)
+    storage.set(9, (1,) * 6)
+    # each section is remapped once, however many of its repeats are in range
+    storage.remap(bytes(range(1, 256)) + bytes(1), 0, 10)
+    assert storage.row(0, 0, 10) == bytes([3, 2, 1, 3, 2, 1, 1, 1, 3, 2])
+    storage.insert(2, [(9,) * 6])
+    storage.insert(4, [(8,) * 6])
+    storage.delete(9, 2)
+    storage.set(5, (7,) * 6)
+    assert storage.row(0, 0, 10) == bytes([7, 2, 9, 1, 8, 7, 2, 1, 1, 2])
+    assert storage.section_sizes() == {'verse': 2}
+
+    strings, sections, layout = storage.layout()
+    assert layout == [('verse', 2), (None, 3), ('verse', 2), (None, 3)]
+    assert strings == [bytes([9, 1, 8, 1, 1, 2])] * 6
+    assert sections == {'verse': [bytes([7, 2])] * 6}
+    copy = LazyStorage.from_layout(6, strings, sections, layout)
+    assert copy.row(3, 0, 10) == storage.row(3, 0, 10)
+    storage.remove_section('verse')
+    copy.set(6, (5,) * 6)
+    storage.set(6, (5,) * 6)
+    assert copy.row(3, 0, 10) == bytes([7, 5, 9, 1, 8, 7, 5, 1, 1, 2])
+    assert storage.row(3, 0, 10) == bytes([7, 2, 9, 1, 8, 7, 5, 1, 1, 2])
+    assert not storage.linked(0, 10)
+    with pytest.raises(TypeError):
+        storage.repeat('verse', 0)
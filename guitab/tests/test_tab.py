@@ -1,4 +1,8 @@
+from .. import events, history
+from ..chord import Chord
+from ..search import ChordIndex
 from ..tab import Tab
+from ..storage import BACKENDS
 import pytest
 import datetime as dt
 from . import global_test_data
@@ -12,8 +16,7 @@ def blank_tab():
 
 @pytest.fixture
 def filled_tab_dict():
-    return {'_MAX': 78, 'clength': 6, '_blank':
-            ['-', '-', '-', '-', '-', '-'],
+    return {'_MAX': 78, 'clength': 6,
             'tab_data':
             [['-', '-', '-', '-', '-', '-'],
              ['-', '-', '-', '-', '-', '-'],
@@ -34,10 +37,52 @@ def filled_tab(filled_tab_dict):
     filled_tab = Tab()
     filled_tab.tab_data = filled_tab_dict['tab_data']
     filled_tab.i = filled_tab_dict['i']
-    filled_tab.imax = filled_tab_dict['imax']
     return filled_tab
 
 
+def tab_state(tab, expected):
+    """Collect the attributes of `tab` named by the keys of `expected`"""
+    return {key: getattr(tab, key) for key in expected}
+
+
+def test_unknown_backend():
+    """Check that requesting an unknown storage backend yields TypeError"""
+    with pytest.raises(TypeError):
+        Tab(backend='punchcards')
+
+
+def test_numpy_backend_matches_array_backend(blank_tab):
+    """Check that the numpy backend renders the same tab as the default"""
+    pytest.importorskip('numpy')
+    numpy_tab = Tab(backend='numpy')
+    for tab in (blank_tab, numpy_tab):
+        tab.forward(100)
+        tab.write(['-', '1', '-', '2', '3', 'x'], index=90)
+    assert str(numpy_tab) == str(blank_tab)
+    assert numpy_tab.blank_columns() == blank_tab.blank_columns()
+
+
+def test_sparse_backend_long_tab():
+    """Check that the sparse backend only stores the chords that are not blank
+    and renders the same tab as the default"""
+    sparse_tab = Tab(backend='sparse')
+    sparse_tab.forward(100000)
+    sparse_tab.write(['-', '1', '-', '2', '3', 'x'], index=10**6)
+    sparse_tab.write(['3', '3', '-', '-', '2', '3'], index=5)
+    assert sparse_tab.imax == 10**6
+    assert sorted(sparse_tab._storage._chords) == [5, 10**6]
+    sparse_tab.i = 10**6
+    assert 'B|' + 40 * '-' + '1\n' in sparse_tab.view()
+
+    array_tab = Tab()
+    array_tab.forward(300)
+    sparse_tab.tab_data = array_tab.tab_data
+    sparse_tab.i = array_tab.i
+    sparse_tab.write(['-', '1', '-', '2', '3', 'x'], index=150)
+    array_tab.write(['-', '1', '-', '2', '3', 'x'], index=150)
+    assert str(sparse_tab) == str(array_tab)
+
+
 def test_backward_out_of_bounds(blank_tab):
     """Check that going out of bounds with a `backward` operation yields
     IndexError."""
@@ -56,13 +101,13 @@ def test_backward_valid(filled_tab, filled_tab_dict):
     """Check that valid `backward` operation yields expected tab state."""
     filled_tab.backward()
     filled_tab_dict['i'] = 2
-    assert filled_tab.__dict__ == filled_tab_dict
+    assert tab_state(filled_tab, filled_tab_dict) == filled_tab_dict
 
 
 def test_forward_valid(blank_tab, filled_tab_dict):
     """Check that valid `forward` operation yields expected tab state."""
     blank_tab.forward(3)
-    assert blank_tab.__dict__ == filled_tab_dict
+    assert tab_state(blank_tab, filled_tab_dict) == filled_tab_dict
 
 
 def test_forward_negative_input(blank_tab):
@@ -78,7 +123,7 @@ def test_write_current(filled_tab, filled_tab_dict):
     chord = ['-', '1', '-', '2', '3', 'x']
     filled_tab_dict['tab_data'][filled_tab_dict['i']] = chord
     filled_tab.write(chord)
-    assert filled_tab.__dict__ == filled_tab_dict
+    assert tab_state(filled_tab, filled_tab_dict) == filled_tab_dict
 
 
 def test_write_lower_index(filled_tab, filled_tab_dict):
@@ -88,7 +133,7 @@ def test_write_lower_index(filled_tab, filled_tab_dict):
     index = 1
     filled_tab_dict['tab_data'][index] = chord
     filled_tab.write(chord, index=index)
-    assert filled_tab.__dict__ == filled_tab_dict
+    assert tab_state(filled_tab, filled_tab_dict) == filled_tab_dict
 
 
 def test_write_higher_index(filled_tab, filled_tab_dict):
@@ -96,12 +141,11 @@ def test_write_higher_index(filled_tab, filled_tab_dict):
     the correct tab"""
     chord = ['-', '1', '-', '2', '3', 'x']
     index = 10
-    [filled_tab_dict['tab_data'].append(filled_tab_dict['_blank']) for x in
-     range(7)]
+    [filled_tab_dict['tab_data'].append(['-'] * 6) for x in range(7)]
     filled_tab_dict['tab_data'][index] = chord
     filled_tab_dict['imax'] = index
     filled_tab.write(chord, index=index)
-    assert filled_tab.__dict__ == filled_tab_dict
+    assert tab_state(filled_tab, filled_tab_dict) == filled_tab_dict
 
 
 @pytest.mark.parametrize('invalid_chord', [
@@ -114,6 +158,545 @@ def test_write_invalid_chord(invalid_chord, filled_tab):
         filled_tab.write(invalid_chord)
 
 
+def test_write_read_shared_chord(blank_tab):
+    """Check that chords read back from the tab are interned, so repeated
+    chord shapes share one object"""
+    blank_tab.write(['-', '1', '-', '2', '3', 'x'], index=3)
+    blank_tab.write(('-', '1', '-', '2', '3', 'x'), index=7)
+    assert blank_tab.read(3) is blank_tab.read(7)
+    assert blank_tab.read(3) is Chord(['-', '1', '-', '2', '3', 'x'])
+    assert blank_tab.read() == ('-',) * 6
+
+
+def test_insert_columns(blank_tab):
+    """Check that chords are inserted at the cursor, moving later chords
+    forward"""
+    c_chord = ['-', '1', '-', '2', '3', 'x']
+    g_chord = ['3', '3', '-', '-', '2', '3']
+    blank_tab.forward(3)
+    blank_tab.write(c_chord)
+    blank_tab.insert_columns([g_chord, g_chord])
+    assert blank_tab.i == 3
+    assert blank_tab.imax == 5
+    assert blank_tab.tab_data[3:] == [g_chord, g_chord, c_chord]
+    blank_tab.insert_columns(2, index=0)
+    assert blank_tab.i == 5
+    assert blank_tab.tab_data[5:] == [g_chord, g_chord, c_chord]
+    with pytest.raises(IndexError):
+        blank_tab.insert_columns(1, index=9)
+
+
+def test_delete_columns(blank_tab):
+    """Check that chords are deleted at the cursor, moving later chords
+    back"""
+    c_chord = ['-', '1', '-', '2', '3', 'x']
+    blank_tab.forward(100)
+    blank_tab.write(c_chord, index=90)
+    blank_tab.delete_columns(10, index=50)
+    assert blank_tab.i == 90
+    assert blank_tab.read(80) == tuple(c_chord)
+    blank_tab.delete_columns(85, index=0)
+    assert blank_tab.i == 5
+    assert blank_tab.tab_data == [['-'] * 6] * 6
+    with pytest.raises(IndexError):
+        blank_tab.delete_columns(7)
+    blank_tab.delete_columns(6, index=0)
+    assert blank_tab.tab_data == [['-'] * 6]
+    assert blank_tab.i == 0
+
+
+def test_write_many(blank_tab):
+    """Check that writing a sequence of chords matches writing them one at a
+    time and moving forward after each"""
+    chords = [['-', '1', '-', '2', '3', 'x'], ['3', '3', '-', '-', '2', '3']] * 50
+    single_tab = Tab()
+    for chord in chords:
+        single_tab.write(chord)
+        single_tab.forward()
+    str(blank_tab)
+    blank_tab.write_many(chords)
+    assert blank_tab.i == single_tab.i == 100
+    assert str(blank_tab) == str(single_tab)
+    blank_tab.write_many(chords[:2], start=20, advance=False)
+    assert blank_tab.i == 100
+    assert blank_tab.imax == 100
+
+
+def test_write_many_invalid_chord(blank_tab):
+    """Check that nothing is written if any of the chords is invalid"""
+    with pytest.raises(TypeError):
+        blank_tab.write_many([['1'] * 6, ['r'] * 6])
+    assert blank_tab.tab_data == [['-'] * 6]
+    assert blank_tab.i == 0
+
+
+def test_write_reports_all_invalid_positions(blank_tab):
+    """Check that every invalid entry of a chord is reported at once"""
+    with pytest.raises(TypeError, match=r'r \(string 1\), z \(string 2\), 25 \(string 6\)'):
+        blank_tab.write(['r', 'z', '-', '-', '-', '25'])
+
+
+def test_extended_fret_range():
+    """Check that the range of allowed fret numbers can be configured"""
+    extended_tab = Tab(frets=27)
+    extended_tab.write(['27', '-', '-', '-', '-', '-'])
+    assert extended_tab.read() == ('27', '-', '-', '-', '-', '-')
+    with pytest.raises(TypeError):
+        extended_tab.write(['28', '-', '-', '-', '-', '-'])
+    with pytest.raises(TypeError):
+        Tab(frets=300)
+
+
+@pytest.mark.parametrize('backend', ['array', 'sparse', 'numpy'])
+def test_transpose(backend):
+    """Check that fret numbers in a range are shifted and other entries are
+    unchanged"""
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    tab = Tab(backend=backend)
+    tab.write_many([['-', '1', '-', '2', '3', 'x'], ['3', '3', 'h', '-', '2', '3']] * 2)
+    tab.transpose(2, start=1, end=3)
+    assert tab.tab_data == [['-', '1', '-', '2', '3', 'x'], ['5', '5', 'h', '-', '4', '5'],
+                            ['-', '3', '-', '4', '5', 'x'], ['3', '3', 'h', '-', '2', '3'],
+                            ['-', '-', '-', '-', '-', '-']]
+    tab.transpose(-1)
+    assert tab.read(0) == ('-', '0', '-', '1', '2', 'x')
+
+
+def test_transpose_out_of_range(blank_tab):
+    """Check that notes moved outside of the fret range are reported without
+    changing the tab, or folded by octaves if requested"""
+    blank_tab.write_many([['-', '1', '-', '2', '3', 'x'], ['24', '3', '-', '-', '2', '3']])
+    with pytest.raises(IndexError, match='indices: 0$'):
+        blank_tab.transpose(-2)
+    assert blank_tab.read(0) == ('-', '1', '-', '2', '3', 'x')
+    blank_tab.transpose(-2, fold=True)
+    assert blank_tab.tab_data[:2] == [['-', '11', '-', '0', '1', 'x'], ['22', '1', '-', '-', '0', '1']]
+
+
+@pytest.mark.parametrize('scan_ratio', [0, 100])
+def test_find(blank_tab, monkeypatch, scan_ratio):
+    """Check that chord sequences are found, with '-' matching any entry, and
+    that the search follows later writes, both when scanning the strings and
+    when walking the columns of a note"""
+    monkeypatch.setattr(ChordIndex, 'scan_ratio', scan_ratio)
+    c_chord = ['-', '1', '-', '2', '3', 'x']
+    g_chord = ['3', '3', '-', '-', '2', '3']
+    blank_tab.write_many([c_chord, g_chord, ['-'] * 6, c_chord, g_chord, c_chord])
+    assert blank_tab.find([c_chord, g_chord]) == 0
+    assert blank_tab.find([c_chord, g_chord], start=1) == 3
+    assert blank_tab.find([c_chord, g_chord], start=4) is None
+    assert blank_tab.find([['-', '-', '-', '-', '3', '-'], ['-'] * 6, c_chord]) == 3
+    assert blank_tab.find([['-'] * 6], start=6) == 6
+    blank_tab.write(g_chord, index=6)
+    assert blank_tab.find([c_chord, g_chord], start=4) == 5
+    blank_tab.write(['-'] * 6, index=3)
+    assert blank_tab.find([c_chord, g_chord], start=1) == 5
+    blank_tab.insert_columns(1, index=0)
+    assert blank_tab.find([c_chord, g_chord]) == 1
+    with pytest.raises(TypeError):
+        blank_tab.find([])
+
+
+def tab_snapshot(tab):
+    """Collect the visible state of `tab`"""
+    return str(tab), tab.i, dict(tab.info)
+
+
+@pytest.mark.parametrize('backend', ['array', 'sparse', 'numpy'])
+def test_undo_redo(backend):
+    """Check that every kind of change is undone and redone in order"""
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    tab = Tab(backend=backend)
+    test_file = str(Path(__file__).parent / "test_guitab_file.txt")
+    changes = [lambda: tab.write(['-', '1', '-', '2', '3', 'x']),
+               lambda: tab.forward(80),
+               lambda: tab.write(['3', '3', '-', '-', '2', '3'], index=90),
+               lambda: tab.write_many([['0'] * 6, ['20'] * 6], start=3),
+               lambda: tab.backward(2),
+               lambda: tab.insert_columns([['5'] * 6, ['x'] * 6], index=1),
+               lambda: tab.delete_columns(4, index=0),
+               lambda: tab.transpose(2),
+               lambda: tab.transpose(-5, fold=True),
+               lambda: tab.set_info(title='Undone'),
+               lambda: tab.get_tab(test_file),
+               lambda: tab.write(['7'] * 6),
+               lambda: tab.get_tab(test_file, lazy=True, overwrite_info=False),
+               lambda: tab.delete_columns(tab.imax + 1, index=0),
+               lambda: tab.write(['9'] * 6)]
+    states = [tab_snapshot(tab)]
+    for change in changes:
+        change()
+        states.append(tab_snapshot(tab))
+
+    for state in reversed(states[:-1]):
+        tab.undo()
+        assert tab_snapshot(tab) == state
+    with pytest.raises(IndexError):
+        tab.undo()
+    for state in states[1:]:
+        tab.redo()
+        assert tab_snapshot(tab) == state
+    with pytest.raises(IndexError):
+        tab.redo()
+
+    # a new change discards the changes that could be redone
+    tab.undo()
+    tab.forward()
+    with pytest.raises(IndexError):
+        tab.redo()
+
+
+def test_undo_find(blank_tab):
+    """Check that the search index follows undone writes"""
+    c_chord = ['-', '1', '-', '2', '3', 'x']
+    blank_tab.write(c_chord, index=4)
+    assert blank_tab.find([c_chord]) == 4
+    blank_tab.undo()
+    assert blank_tab.find([c_chord]) is None
+    blank_tab.redo()
+    assert blank_tab.find([c_chord]) == 4
+
+
+def test_history_size():
+    """Check that the history is bounded and that its memory does not depend
+    on the length of the tab"""
+    tab = Tab(history_size=10000)
+    tab.forward(10 ** 6)
+    for n in range(20000):
+        tab.write([str(n % 25)] * 6, index=n * 50)
+    assert len(tab._history) == 10000
+    assert tab._history.nbytes() < 300000
+    for n in range(10000):
+        tab.undo()
+    with pytest.raises(IndexError):
+        tab.undo()
+    assert tab.read(10000 * 50) == ('-',) * 6
+    assert tab.read(9999 * 50) == ('24',) * 6
+
+    # a move takes a few bytes, even far into the tab
+    for n in range(10000):
+        tab.forward()
+    assert tab._history.nbytes() < 120000
+
+
+def test_history_log():
+    """Check that packed and unpacked deltas come back out of the history
+    log in order from either end"""
+    deltas = [history.pack(history.WRITE, 5, 3, 2 ** 40, 4, 2 ** 40 + 1, 130, bytes(range(256)) * 3),
+              (history.INFO, {'title': 'A'}, {'title': 'B'}),
+              history.pack(history.MOVE, 200, 0, 7, 7)]
+    assert history.unpack(deltas[0])[:7] == (history.WRITE, 5, 3, 2 ** 40, 4, 2 ** 40 + 1, 130)
+    assert history.unpack(deltas[0])[7] == bytes(range(256)) * 3
+    assert history.unpack(deltas[2])[:7] == (history.MOVE, 200, 0, 7, 7, 200, 0)
+    log = history.Log(maxlen=4)
+    for delta in deltas * 2:
+        log.append(delta)
+    assert len(log) == 4
+    assert list(log) == deltas[2:] + deltas
+    assert log.pop() == deltas[2]
+    assert log.popleft() == deltas[2]
+    assert list(log) == deltas[:2]
+    assert log.pop() == deltas[1]
+    assert log.pop() == deltas[0]
+    assert log.nbytes == 0
+    with pytest.raises(IndexError):
+        log.pop()
+
+
+@pytest.mark.parametrize('backend', ['array', 'sparse', 'numpy'])
+def test_snapshot_restore(backend):
+    """Check that snapshots are independent of the tab and can be restored"""
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    tab = Tab(backend=backend)
+    tab.write_many([['-', '1', '-', '2', '3', 'x']] * 5000)
+    snapshot = tab.snapshot()
+    before = tab_snapshot(tab)
+    assert tab_snapshot(snapshot) == before
+    tab.write(['3', '3', '-', '-', '2', '3'], index=2)
+    tab.set_info(title='Variant')
+    snapshot.delete_columns(10, index=0)
+    assert tab.read(2) == ('3', '3', '-', '-', '2', '3')
+    assert snapshot.imax == 4990
+    variant = tab_snapshot(tab)
+
+    # the tab keeps its storage backend
+    assert type(tab._storage) is BACKENDS[backend]
+
+    tab.restore(snapshot)
+    assert tab.imax == 4990
+    assert tab.info['title'] == 'My Tab'
+    tab.write(['5'] * 6, index=0)
+    assert snapshot.read(0) == ('-', '1', '-', '2', '3', 'x')
+    tab.undo()
+    tab.undo()
+    assert tab_snapshot(tab) == variant
+    with pytest.raises(TypeError):
+        tab.restore(Tab(frets=12))
+
+
+def test_snapshot_sparse():
+    """Check that a snapshot of a long sparse tab shares its chords instead of
+    converting the tab into blocks"""
+    tab = Tab(backend='sparse')
+    tab.write(['3', '3', '-', '-', '2', '3'], index=10 ** 6 - 1)
+    snapshot = tab.snapshot()
+    assert type(tab._storage) is type(snapshot._storage) is BACKENDS['sparse']
+    assert snapshot._storage._chords is tab._storage._chords
+    snapshot.write(['5'] * 6, index=0)
+    assert tab.read(0) == ('-',) * 6
+    assert snapshot.read(10 ** 6 - 1) == ('3', '3', '-', '-', '2', '3')
+    tab.define_section('verse', 0, 10)
+    assert type(snapshot._storage) is BACKENDS['sparse']
+
+
+def test_snapshot_lazy_load(blank_tab):
+    """Check that a snapshot of a lazily loaded tab holds all of its data"""
+    test_file = Path(__file__).parent / "test_guitab_file.txt"
+    blank_tab.get_tab(str(test_file), lazy=True)
+    snapshot = blank_tab.snapshot()
+    assert str(snapshot) == global_test_data.str_tab_file_load
+    assert snapshot.info == global_test_data.file_info
+
+
+def test_sections(blank_tab, tmp_path):
+    """Check that chords written to a repeat of a section appear in every
+    repeat, and that sections survive a binary file round trip"""
+    verse = [['-', '1', '-', '2', '3', 'x'], ['3', '3', '-', '-', '2', '3']] * 50
+    blank_tab.write_many(verse)
+    blank_tab.define_section('verse', 0, 100)
+    blank_tab.forward(4)
+    blank_tab.repeat_section('verse')
+    blank_tab.repeat_section('verse', index=0)
+    assert blank_tab.sections == {'verse': 100}
+    assert blank_tab.imax == 304
+    str(blank_tab)
+    blank_tab.write(['5'] * 6, index=205)
+    assert [blank_tab.read(index) for index in (1, 101, 205)] == [('5',) * 6] * 3
+    assert blank_tab.find([['5'] * 6]) == 1
+    expected = str(blank_tab)
+    fresh = Tab()
+    fresh.tab_data = blank_tab.tab_data
+    fresh.i = blank_tab.i
+    assert str(fresh) == expected
+    with pytest.raises(TypeError):
+        blank_tab.define_section('verse', 0, 10)
+    with pytest.raises(TypeError):
+        blank_tab.define_section('chorus', 50, 150)
+    with pytest.raises(TypeError):
+        blank_tab.repeat_section('chorus')
+
+    blank_tab.save_binary(str(tmp_path / 'sections.gtab'))
+    fresh.save_binary(str(tmp_path / 'expanded.gtab'), compress=False)
+    blank_tab.save_binary(str(tmp_path / 'sections_raw.gtab'), compress=False)
+    assert (tmp_path / 'sections_raw.gtab').stat().st_size < (tmp_path / 'expanded.gtab').stat().st_size / 2
+    loaded = Tab()
+    loaded.load_binary(str(tmp_path / 'sections.gtab'))
+    assert loaded.sections == {'verse': 100}
+    loaded.write(['7'] * 6, index=0)
+    assert loaded.read(100) == ('7',) * 6
+
+    # undo the write, the repeats and the section definition
+    for n in range(4):
+        blank_tab.undo()
+    assert blank_tab.sections == {'verse': 100}
+    blank_tab.undo()
+    assert blank_tab.sections == {}
+    assert blank_tab.tab_data[:100] == verse
+    for n in range(5):
+        blank_tab.redo()
+    assert str(blank_tab) == expected
+
+
+def test_undo_unlinked_repeats(blank_tab):
+    """Check that undoing a change that turned a repeat of a section into a
+    copy makes it a repeat again, so earlier writes are undone in every repeat"""
+    blank_tab.forward(9)
+    blank_tab.define_section('riff', 2, 5)
+    blank_tab.repeat_section('riff', index=8)
+    start = tab_snapshot(blank_tab)
+    blank_tab.write(['9'] * 6, index=3)
+    changes = [lambda: blank_tab.insert_columns(1, index=9), lambda: blank_tab.delete_columns(1, index=9),
+               lambda: blank_tab.delete_columns(3, index=8), lambda: blank_tab.delete_columns(6, index=4),
+               lambda: blank_tab.repeat_section('riff', index=9)]
+    for change in changes:
+        state = tab_snapshot(blank_tab), blank_tab._storage.layout()
+        change()
+        blank_tab.undo()
+        assert (tab_snapshot(blank_tab), blank_tab._storage.layout()) == state
+        blank_tab.redo()
+        blank_tab.undo()
+        assert (tab_snapshot(blank_tab), blank_tab._storage.layout()) == state
+    blank_tab.undo()
+    assert tab_snapshot(blank_tab) == start
+    assert blank_tab.read(9) == ('-',) * 6
+
+
+def test_undo_across_block_conversion(blank_tab):
+    """Check that changes made before and after the tab data is moved into
+    blocks are undone and redone in order"""
+    test_file = Path(__file__).parent / "test_guitab_file.txt"
+    blank_tab.get_tab(str(test_file))
+    blank_tab.insert_columns([['7'] * 6], index=0)
+    states = [tab_snapshot(blank_tab)]
+    blank_tab.define_section('intro', 0, 3)
+    blank_tab.repeat_section('intro', index=10)
+    states.append(tab_snapshot(blank_tab))
+    for n in range(4):
+        blank_tab.undo()
+    for n in range(2):
+        blank_tab.redo()
+    assert tab_snapshot(blank_tab) == states[0]
+    for n in range(2):
+        blank_tab.redo()
+    assert tab_snapshot(blank_tab) == states[1]
+
+
+def test_bars(blank_tab, tmp_path):
+    """Check that bar lines move with inserted and deleted chords, are undone
+    and redone, are rendered and survive text and binary file round trips"""
+    blank_tab.forward(11)
+    for index in (4, 8):
+        blank_tab.add_bar(index)
+    assert blank_tab.bars == [4, 8]
+    assert [blank_tab.bar_number(index) for index in (0, 3, 4, 11)] == [1, 1, 2, 3]
+    assert blank_tab.bar_index(3) == 8
+    with pytest.raises(IndexError):
+        blank_tab.add_bar(0)
+    with pytest.raises(IndexError):
+        blank_tab.bar_index(4)
+    blank_tab.insert_columns(2, index=4)
+    assert blank_tab.bars == [4, 10]
+    blank_tab.delete_columns(6, index=3)
+    assert blank_tab.bars == [3, 4]
+    blank_tab.delete_columns(2, index=2)
+    assert blank_tab.bars == [2]
+    for n in range(3):
+        blank_tab.undo()
+    assert blank_tab.bars == [4, 8]
+    for n in range(3):
+        blank_tab.redo()
+    assert blank_tab.bars == [2]
+    blank_tab.undo()
+    blank_tab.remove_bar(4)
+    with pytest.raises(IndexError):
+        blank_tab.remove_bar(4)
+    assert blank_tab.bars == [3]
+
+    # bar lines in chords deleted up to the end of the tab are dropped, and
+    # come back when the deletion is undone
+    blank_tab.delete_columns(blank_tab.imax - 2, index=3)
+    assert blank_tab.bars == []
+    assert blank_tab.imax == 2
+    blank_tab.undo()
+    assert blank_tab.bars == [3]
+
+    blank_tab.i = 1
+    assert list(blank_tab.iter_lines())[6] == '   * |\n'
+    assert list(blank_tab.iter_lines(cursor=False))[6] == '     |\n'
+    blank_tab.save_tab(str(tmp_path / 'bars.txt'))
+    blank_tab.save_binary(str(tmp_path / 'bars.gtab'))
+    for lazy in (False, True):
+        loaded = Tab()
+        loaded.get_tab(str(tmp_path / 'bars.txt'), lazy=lazy)
+        assert loaded.bars == [3]
+    loaded = Tab()
+    loaded.load_binary(str(tmp_path / 'bars.gtab'))
+    assert loaded.bars == [3]
+    loaded.undo()
+    assert loaded.bars == []
+
+
+def test_goto_bookmarks(blank_tab):
+    """Check that goto moves to an index, expanding the tab, and that
+    bookmarks move with inserted chords"""
+    blank_tab.goto(10)
+    assert blank_tab.imax == 10
+    blank_tab.bookmark('chorus', 6)
+    blank_tab.goto(2)
+    blank_tab.insert_columns(3)
+    assert blank_tab.bookmarks == {'chorus': 9}
+    blank_tab.goto(blank_tab.bookmarks['chorus'])
+    assert blank_tab.i == 9
+    blank_tab.undo()
+    assert blank_tab.i == 2
+    with pytest.raises(IndexError):
+        blank_tab.goto(-1)
+    with pytest.raises(IndexError):
+        blank_tab.bookmark('end', 100)
+    blank_tab.bookmark('end', 13)
+    blank_tab.delete_columns(5, index=9)
+    assert blank_tab.bookmarks == {'chorus': 8, 'end': 8}
+
+
+def test_events(blank_tab):
+    """Check that observers are sent the events of each change, and can
+    follow the tab data with them through undo and redo"""
+    received = []
+    blank_tab.subscribe(received.append)
+    blank_tab.write(['x', '3', '2', '0', '1', '0'])
+    blank_tab.forward(2)
+    blank_tab.set_info(title='Song')
+    assert received == [events.Written(0, 1), events.Inserted(1, 2), events.Moved(0, 2),
+                        events.InfoChanged({'title': 'My Tab'}, {'title': 'Song'})]
+    del received[:]
+    blank_tab.undo()
+    blank_tab.undo()
+    assert received == [events.InfoChanged({'title': 'Song'}, {'title': 'My Tab'}), events.Deleted(1, 2),
+                        events.Moved(2, 0)]
+
+    # keep a copy of the tab data up to date with the events alone, reading
+    # back only the chords that they mark as changed
+    mirror = [blank_tab.read(0)]
+
+    def follow(event):
+        if isinstance(event, events.Written):
+            mirror[event.start:event.end] = [None] * (event.end - event.start)
+        elif isinstance(event, events.Inserted):
+            mirror[event.index:event.index] = [None] * event.count
+        elif isinstance(event, events.Deleted):
+            del mirror[event.index:event.index + event.count]
+        elif isinstance(event, events.Loaded):
+            mirror[:] = [None] * event.length
+
+    blank_tab.subscribe(follow)
+    changes = [lambda: blank_tab.write(['5'] * 6, index=8), lambda: blank_tab.forward(12),
+               lambda: blank_tab.insert_columns([['7'] * 6] * 3, index=2), lambda: blank_tab.delete_columns(4, 1),
+               lambda: blank_tab.write_many([['1'] * 6] * 20), lambda: blank_tab.transpose(2),
+               lambda: blank_tab.define_section('riff', 0, 4), lambda: blank_tab.repeat_section('riff', 6),
+               lambda: blank_tab.write(['9'] * 6, index=1),
+               lambda: blank_tab.delete_columns(blank_tab.imax + 1, 0),
+               lambda: blank_tab.get_tab(str(global_test_data.test_file))]
+    states = []
+    for change in changes + [blank_tab.undo] * len(changes) + [blank_tab.redo] * len(changes):
+        change()
+        mirror[:] = [blank_tab.read(index) if chord is None else chord for index, chord in enumerate(mirror)]
+        states.append(blank_tab.tab_data)
+        assert [list(chord) for chord in mirror] == states[-1]
+        assert len(mirror) == blank_tab.imax + 1
+
+    # undoing a write that grew a tab with sections
+    sections_tab = Tab()
+    sections_tab.forward(9)
+    sections_tab.define_section('a', 2, 5)
+    sections_tab.subscribe(received.append)
+    sections_tab.write(['0'] * 6, index=15)
+    del received[:]
+    sections_tab.undo()
+    assert received == [events.Written(15, 16), events.Deleted(10, 6)]
+    assert sections_tab.imax == 9
+
+    blank_tab.unsubscribe(received.append)
+    blank_tab.unsubscribe(follow)
+    del received[:]
+    blank_tab.write(['0'] * 6)
+    assert received == []
+    with pytest.raises(TypeError):
+        blank_tab.subscribe(None)
+
+
 def test_str_blank_tab(blank_tab):
     """Confirm that the string representation of a blank tab is correct"""
     assert str(blank_tab) == global_test_data.str_blank_tab
@@ -141,6 +724,52 @@ def test_str_tab_cursor_back_row_1(blank_tab):
     assert str(blank_tab) == global_test_data.str_tab_2_rows_cursor_1st_row
 
 
+def test_iter_lines_matches_str(blank_tab):
+    """Confirm that the lines generated by `iter_lines` join to the string
+    representation of the tab"""
+    blank_tab.forward(200)
+    blank_tab.write(['-', '1', '-', '2', '3', 'x'], index=100)
+    lines = list(blank_tab.iter_lines())
+    assert all(line.endswith('\n') for line in lines)
+    assert ''.join(lines) == str(blank_tab)
+
+
+def test_full_render_not_cached(blank_tab, tmp_path):
+    """Confirm that rendering or saving the whole tab leaves only the rows
+    around the cursor in the row cache"""
+    blank_tab.forward(7800)
+    blank_tab.view()
+    assert sorted(blank_tab._row_cache) == [98, 99, 100]
+    expected = str(blank_tab)
+    blank_tab.save_tab(str(tmp_path / 'tab.txt'))
+    assert sorted(blank_tab._row_cache) == [98, 99, 100]
+    assert str(blank_tab) == expected
+
+
+def test_iter_lines_row_range(blank_tab):
+    """Confirm that `iter_lines` only renders the requested rows and can blank
+    out the position cursor"""
+    blank_tab.forward(78)
+    blank_tab.backward(1)
+    lines = list(blank_tab.iter_lines(start_row=0, end_row=1, cursor=False))
+    assert len(lines) == 7
+    assert lines[-1] == 80 * ' ' + '\n'
+
+
+def test_str_double_digit_fret(blank_tab):
+    """Confirm that double digit fret numbers are rendered in full"""
+    blank_tab.write(['12', '-', '-', '-', '-', '-'])
+    assert str(blank_tab).startswith('e|12\nB|-\n')
+
+
+def test_tab_data_round_trip(filled_tab, filled_tab_dict):
+    """Confirm that assigning the tab data replaces the stored chords"""
+    data = [['-', '1', '-', '2', '3', 'x'], ['3', '3', '-', '-', '2', '3']]
+    filled_tab.tab_data = data
+    assert filled_tab.tab_data == data
+    assert filled_tab.imax == 1
+
+
 def test_print_tab_blank(blank_tab, capfd):
     """Confirm the internal print method for blank tab"""
     blank_tab.print()
@@ -167,6 +796,55 @@ def test_print_tab_3_total_rows(blank_tab, capfd):
     assert out == global_test_data.print_tab_3_rows
 
 
+def test_render_cache_rerenders_changed_row_only(blank_tab, monkeypatch):
+    """Confirm that after a single chord edit only the edited row is rendered
+    again, and that cursor moves re-render nothing"""
+    def render():
+        return ''.join(blank_tab.iter_lines())
+
+    blank_tab.forward(300)
+    render()
+    calls = []
+    row = blank_tab._storage.row
+    monkeypatch.setattr(blank_tab._storage, 'row', lambda *args: calls.append(args) or row(*args))
+    blank_tab.backward(200)
+    render()
+    assert calls == []
+    blank_tab.write(['-', '1', '-', '2', '3', 'x'], index=100)
+    assert render().split('\n')[8:14] == [
+        leader + '-' * 22 + entry + '-' * 55
+        for leader, entry in zip(('e|', 'B|', 'G|', 'D|', 'A|', 'E|'), ['-', '1', '-', '2', '3', 'x'])]
+    assert sorted(call[1:] for call in calls) == [(78, 156)] * 6
+
+
+def test_render_cache_tab_growth(blank_tab):
+    """Confirm that the cached final row is refreshed when the tab grows"""
+    blank_tab.forward(10)
+    str(blank_tab)
+    blank_tab.forward(100)
+    str(blank_tab)
+    blank_tab.write(['1'] * 6, index=200)
+    fresh_tab = Tab()
+    fresh_tab.tab_data = blank_tab.tab_data
+    fresh_tab.i = blank_tab.i
+    assert str(blank_tab) == str(fresh_tab)
+
+
+@pytest.mark.parametrize('position, window', [
+    (0, (0, 3)),
+    (100, (0, 3)),
+    (200, (1, 4)),
+    (389, (2, 5)),
+])
+def test_window_always_three_rows(blank_tab, position, window):
+    """Confirm that the print window holds three rows whenever the tab has
+    them, including at the beginning and end of the tab"""
+    blank_tab.forward(389)  # create 5 rows
+    blank_tab.i = position
+    assert blank_tab.window() == window
+    assert blank_tab.view() == ''.join(blank_tab.iter_lines(*window))
+
+
 def test_load_from_file(blank_tab, capfd):
     """Confirm that the class object can read just the tab data from a compatible file"""
     test_file = Path(__file__).parent / "test_guitab_file.txt"
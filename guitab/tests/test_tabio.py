@@ -0,0 +1,209 @@
+from .. import tabio
+from ..chord import Chord
+from ..tab import Tab
+import pytest
+from . import global_test_data
+
+leaders = ('e|', 'B|', 'G|', 'D|', 'A|', 'E|')
+header = tabio.ruler + '\nTitle : A\nAuthor: B\nDate  : 2021-11-07\nsome notes\n' + tabio.ruler + '\n\n'
+
+
+def test_read_text():
+    """Check that the header and the strings of the test file are read"""
+    info, strings = tabio.read_text(global_test_data.test_file, leaders)
+    assert info == {key: global_test_data.file_info[key] for key in tabio.info_order}
+    assert len(strings) == 6
+    assert all(len(string) == 82 for string in strings)
+    assert strings[1] == '1' + 80 * '-' + '3'
+
+
+def test_read_text_mismatched_tuning(tmp_path):
+    """Check that a row block with the wrong tuning indicators is rejected
+    unless the input is trusted"""
+    tab_file = tmp_path / 'tab.txt'
+    tab_file.write_text(header + 'e|--\nB|--\nG|--\nD|--\nE|--\nA|--\n')
+    with pytest.raises(RuntimeError):
+        tabio.read_text(tab_file, leaders)
+    info, strings = tabio.read_text(tab_file, leaders, trusted=True)
+    assert strings == ['--'] * 6
+
+
+def test_read_text_bars(tmp_path):
+    """Check that bar lines marked under each row block are read as columns,
+    both by read_text and by MappedText"""
+    tab_file = tmp_path / 'tab.txt'
+    block = ''.join(leader + '----\n' for leader in leaders)
+    tab_file.write_text(header + block + '   | *\n\n' + block + '   |\n')
+    info, strings, bars = tabio.read_text(tab_file, leaders, bars=True)
+    assert strings == ['--------'] * 6
+    assert bars == [1, 5]
+    mapped = tabio.MappedText(tab_file, leaders, Tab()._text_codes)
+    assert mapped.bars == [1, 5]
+    mapped.close()
+
+
+def test_read_text_missing_header_end(tmp_path):
+    """Check that a header without a closing ruler yields EOFError"""
+    tab_file = tmp_path / 'tab.txt'
+    tab_file.write_text(tabio.ruler + '\nTitle : A\nAuthor: B\nDate  : C\n')
+    with pytest.raises(EOFError):
+        tabio.read_text(tab_file, leaders)
+
+
+def test_get_tab_invalid_entry(tmp_path):
+    """Check that a tab file holding an entry that is not allowed is
+    rejected"""
+    tab_file = tmp_path / 'tab.txt'
+    tab_file.write_text(header + 'e|-q\nB|--\nG|--\nD|--\nA|--\nE|--\n')
+    with pytest.raises(RuntimeError):
+        Tab().get_tab(str(tab_file), trusted=True)
+
+
+def test_get_tab_returns_columns():
+    """Check that the tab data returned by get_tab can be used as a list of
+    chords"""
+    data = Tab().get_tab(str(global_test_data.test_file))
+    assert len(data) == 82
+    assert data[0] is Chord(['-', '1', '-', '2', '3', 'x'])
+    assert data[-1] is Chord(['3', '3', '-', '-', '2', '3'])
+    assert data[:2] == [data[0], data[1]]
+
+
+def test_mapped_text_index():
+    """Check that a memory-mapped tab file is indexed by row block"""
+    mapped = tabio.MappedText(global_test_data.test_file, leaders, Tab()._text_codes)
+    assert mapped.info == {key: global_test_data.file_info[key] for key in tabio.info_order}
+    assert mapped.sizes == [78, 4]
+    assert mapped.decode(1)[0] == bytes([0, 0, 0, 7])
+    mapped.close()
+
+
+def test_get_tab_lazy():
+    """Check that a lazily loaded tab matches a fully loaded one"""
+    lazy_tab = Tab()
+    assert lazy_tab.get_tab(str(global_test_data.test_file), lazy=True) is None
+    assert str(lazy_tab) == global_test_data.str_tab_file_load
+    assert lazy_tab.info == global_test_data.file_info
+
+
+def test_get_tab_lazy_invalid_layout(tmp_path):
+    """Check that a mismatched tuning or line length in a lazily loaded tab
+    is reported when the file is opened, leaving the tab unchanged"""
+    tab_file = tmp_path / 'tab.txt'
+    block = 'e|--\nB|--\nG|--\nD|--\nA|--\nE|--\n'
+    lazy_tab = Tab()
+    expected = str(lazy_tab)
+    for text in ('e|--\nB|--\nG|--\nD|--\nE|--\nA|--\n', 'e|--\nB|---\nG|--\nD|--\nA|--\nE|--\n',
+                 'e|--\nB|--\nG|--\nD|-\nA|---\nE|--'):
+        tab_file.write_text(header + block + '\n' + text)
+        with pytest.raises(RuntimeError):
+            lazy_tab.get_tab(str(tab_file), lazy=True)
+        assert str(lazy_tab) == expected
+
+
+def test_get_tab_lazy_invalid_entry(tmp_path):
+    """Check that an invalid entry in a lazily loaded tab is reported when
+    its row block is decoded"""
+    tab_file = tmp_path / 'tab.txt'
+    tab_file.write_text(header + 'e|-q\nB|--\nG|--\nD|--\nA|--\nE|--')
+    lazy_tab = Tab()
+    lazy_tab.get_tab(str(tab_file), lazy=True)
+    assert lazy_tab.imax == 1
+    with pytest.raises(RuntimeError):
+        str(lazy_tab)
+
+
+def test_get_tab_lazy_crlf(tmp_path):
+    """Check that a lazily loaded tab file may have '\\r\\n' line endings"""
+    tab_file = tmp_path / 'tab.txt'
+    tab_file.write_bytes(global_test_data.test_file.read_bytes().replace(b'\n', b'\r\n'))
+    lazy_tab = Tab()
+    lazy_tab.get_tab(str(tab_file), lazy=True)
+    assert str(lazy_tab) == global_test_data.str_tab_file_load
+    assert lazy_tab.info == dict(global_test_data.file_info, filename=str(tab_file))
+
+
+def test_save_tab_over_lazy_source(tmp_path, monkeypatch):
+    """Check that a lazily loaded tab can be saved over the file it was
+    loaded from"""
+    tab_file = tmp_path / 'tab.txt'
+    tab_file.write_text(global_test_data.test_file.read_text())
+    lazy_tab = Tab()
+    lazy_tab.get_tab(str(tab_file), lazy=True)
+    lazy_tab.write(['5'] * 6, index=2)
+    monkeypatch.setattr('builtins.input', lambda _: 'y')
+    lazy_tab.save_tab()
+    reloaded_tab = Tab()
+    reloaded_tab.get_tab(str(tab_file))
+    assert reloaded_tab.tab_data == lazy_tab.tab_data
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_binary_round_trip(tmp_path, compress):
+    """Check that tab data and metadata survive a binary file round trip"""
+    tab_file = tmp_path / 'tab.gtab'
+    info = {'title': 'Título', 'author': 'B'}
+    strings = [bytes([j, 0, 1, 28]) for j in range(6)]
+    tabio.write_binary(tab_file, info, ['-', 'x'], strings, compress=compress)
+    assert tabio.read_binary(tab_file) == (info, ['-', 'x'], strings)
+
+
+def test_binary_sections_round_trip(tmp_path):
+    """Check that sections are saved once in a binary file and can be read
+    back separately or expanded"""
+    tab_file = tmp_path / 'tab.gtab'
+    strings = [bytes([j, 1]) for j in range(6)]
+    sections = {'verse': [bytes([2, 3, j]) for j in range(6)]}
+    layout = [('verse', 3), (None, 1), ('verse', 3), (None, 1)]
+    tabio.write_binary(tab_file, {}, ['-'], strings, sections=sections, layout=layout)
+    assert tabio.read_binary(tab_file, layout=True) == ({}, ['-'], strings, sections, layout, [])
+    assert tabio.read_binary(tab_file)[2] == [bytes([2, 3, j, j, 2, 3, j, 1]) for j in range(6)]
+    tabio.write_binary(tab_file, {}, ['-'], strings, bars=[1])
+    assert tabio.read_binary(tab_file, layout=True) == ({}, ['-'], strings, {}, [(None, 2)], [1])
+
+
+def test_binary_corrupt_file(tmp_path):
+    """Check that a truncated binary file is rejected"""
+    tab_file = tmp_path / 'tab.gtab'
+    tabio.write_binary(tab_file, {}, ['-'], [bytes(10)] * 6)
+    tab_file.write_bytes(tab_file.read_bytes()[:-3])
+    with pytest.raises(RuntimeError):
+        tabio.read_binary(tab_file)
+    tab_file.write_bytes(b'not a tab')
+    with pytest.raises(RuntimeError):
+        tabio.read_binary(tab_file)
+
+
+def test_text_binary_conversion_lossless(tmp_path):
+    """Check that converting a text tab file to binary and back reproduces
+    the original file"""
+    binary_tab = Tab()
+    binary_tab.get_tab(str(global_test_data.test_file))
+    binary_tab.save_binary(str(tmp_path / 'tab.gtab'))
+    text_tab = Tab()
+    text_tab.load_binary(str(tmp_path / 'tab.gtab'))
+    assert text_tab.tab_data == binary_tab.tab_data
+    text_tab.save_tab(str(tmp_path / 'tab.txt'))
+    assert (tmp_path / 'tab.txt').read_text() == global_test_data.test_file.read_text()
+
+
+def test_binary_text_conversion_wide_entries(tmp_path):
+    """Check that a tab with two digit fret numbers converts from binary to
+    text and back without loss, or is refused by the text format before the
+    file is written"""
+    binary_tab = Tab(frets=250)
+    binary_tab.write_many([['x', '3', '2', '0', '1', '0'], ['12', '10', '0', '0', '0', '3']])
+    binary_tab.save_binary(str(tmp_path / 'tab.gtab'))
+    text_tab = Tab(frets=250)
+    text_tab.load_binary(str(tmp_path / 'tab.gtab'))
+    with pytest.raises(RuntimeError, match=r'Found: 12 \(chord 1, string 1\)'):
+        text_tab.save_tab(str(tmp_path / 'tab.txt'))
+    assert not (tmp_path / 'tab.txt').exists()
+
+    text_tab.write(['x', '3', '2', '0', '1', '0'], index=1)
+    text_tab.save_tab(str(tmp_path / 'tab.txt'))
+    reloaded = Tab(frets=250)
+    reloaded.get_tab(str(tmp_path / 'tab.txt'))
+    reloaded.save_binary(str(tmp_path / 'reloaded.gtab'))
+    text_tab.save_binary(str(tmp_path / 'edited.gtab'))
+    assert tabio.read_binary(tmp_path / 'reloaded.gtab')[2] == tabio.read_binary(tmp_path / 'edited.gtab')[2]
@@ -58,6 +58,10 @@ setup(
         ]
     },
     install_requires=requirements,
+    extras_require={
+        # optional NumPy storage backend for the Tab class
+        'numpy': ['numpy'],
+    },
     license="BSD (3-clause)",
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',